@@ -0,0 +1,118 @@
+"""
+Benchmark the set-based normalization engine against the old row-by-row loop.
+
+For each normalizer (against, affiliations, complaint type, decision) the column is
+copied `--scale` times into a scratch table of an in-memory database, then rewritten
+twice: once the old way (SELECT every row, canonicalize per row, one UPDATE per
+changed row) and once with normalization_engine.apply_mapping. Both results must be
+identical; the script prints rows, distinct values and the two timings.
+
+Run: python bench_normalization.py [path/to/complaints.db] [--scale 50]
+"""
+import argparse
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from clean_decision_specific import clean_decision_specific
+from normalise_complaintType import canonical_stored_value
+from normalization_engine import apply_mapping
+from normalize_affiliations import canonicalize_value as canonical_affiliation
+from normalize_against import canonicalize_value as canonical_against, load_mapping
+
+HERE = Path(__file__).resolve().parent
+DB_PATH = HERE / "complaints.db"
+
+
+def normalizers():
+    against_map = load_mapping(HERE / "against_mappings.csv")
+    aff_map = load_mapping(HERE / "affiliation_mappings.csv")
+    return [
+        ("normalize_against", "Against",
+         lambda v: canonical_against(v, against_map) if v is not None else v),
+        ("normalize_affiliations", "c_aff_resolved",
+         lambda v: canonical_affiliation(v, aff_map) if v is not None else v),
+        ("normalise_complaintType", "ComplaintType_Normalized", canonical_stored_value),
+        ("clean_decision_specific", "Decision_Specific", clean_decision_specific),
+    ]
+
+
+def load_scratch(src, column, scale):
+    """In-memory table bench(value) holding `column` of both tables, repeated `scale` times."""
+    values = []
+    for table in ("against", "by"):
+        cols = {r[1] for r in src.execute(f'PRAGMA table_info("{table}")')}
+        if column in cols:
+            values.extend(r[0] for r in src.execute(f'SELECT "{column}" FROM "{table}"'))
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE bench (value)")
+    conn.executemany("INSERT INTO bench VALUES (?)", ((v,) for _ in range(scale) for v in values))
+    conn.commit()
+    return conn
+
+
+def rowwise(conn, canonicalize):
+    """The loop the normalizers used before normalization_engine."""
+    cur = conn.cursor()
+    rows = cur.execute("SELECT rowid, value FROM bench").fetchall()
+    changed = 0
+    for rowid, value in rows:
+        new = canonicalize(value)
+        if new != value:
+            cur.execute("UPDATE bench SET value = ? WHERE rowid = ?", (new, rowid))
+            changed += 1
+    conn.commit()
+    return changed
+
+
+def set_based(conn, canonicalize):
+    with conn:
+        return apply_mapping(conn, "bench", "value", canonicalize)
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("db", nargs="?", type=Path, default=DB_PATH)
+    parser.add_argument("--scale", type=int, default=50, help="copies of every row")
+    args = parser.parse_args()
+    if not args.db.exists():
+        print("DB not found:", args.db)
+        sys.exit(1)
+
+    src = sqlite3.connect(args.db)
+    print(f"{'normalizer':26} {'rows':>9} {'distinct':>9} {'changed':>9} {'row-by-row':>11} {'set-based':>10} {'speedup':>8}")
+    mismatches = 0
+    for name, column, canonicalize in normalizers():
+        old_conn = load_scratch(src, column, args.scale)
+        new_conn = load_scratch(src, column, args.scale)
+        rows = old_conn.execute("SELECT COUNT(*) FROM bench").fetchone()[0]
+        distinct = old_conn.execute("SELECT COUNT(DISTINCT value) FROM bench").fetchone()[0]
+
+        changed_old, t_old = timed(rowwise, old_conn, canonicalize)
+        changed_new, t_new = timed(set_based, new_conn, canonicalize)
+
+        same = (
+            old_conn.execute("SELECT value FROM bench ORDER BY rowid").fetchall()
+            == new_conn.execute("SELECT value FROM bench ORDER BY rowid").fetchall()
+        )
+        if not same or changed_old != changed_new:
+            mismatches += 1
+        print(f"{name:26} {rows:9d} {distinct:9d} {changed_new:9d} {t_old:10.3f}s {t_new:9.3f}s "
+              f"{t_old / max(t_new, 1e-9):7.1f}x{'' if same else '  MISMATCH'}")
+        old_conn.close()
+        new_conn.close()
+    src.close()
+    if mismatches:
+        print(f"{mismatches} normalizer(s) produced different results")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
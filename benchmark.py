@@ -0,0 +1,412 @@
+"""
+End-to-end HTTP benchmark for every router (complaints, locations, media,
+visualizations, research).
+
+The API is started either in-process (uvicorn in a background thread) or as a
+separate `uvicorn main:app` process. Every endpoint is then driven with a
+realistic parameter mix at the requested concurrency. Per endpoint it records
+p50/p95/p99 latency, throughput and the peak RSS of the server process and its
+children (the uvicorn workers with --workers > 1), and writes everything to a JSON
+report.
+
+Run:
+    python benchmark.py --db synthetic/complaints_x10.db --requests 50 --concurrency 8
+    python benchmark.py --baseline bench_results/baseline.json --threshold 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_OUT_DIR = HERE / "bench_results"
+TABLES = ["against", "by"]
+RESEARCH_COLUMNS = ["ComplaintType_Normalized", "Decision_Parent", "State"]
+
+# --- Parameter mixes ---
+
+
+def year_range(rng, years):
+    if not years or rng.random() < 0.3:
+        return {}
+    a, b = sorted(rng.sample(years, 2)) if len(years) > 1 else (years[0], years[0])
+    return {"start_year": a, "end_year": b}
+
+
+def build_scenarios(ctx):
+    """
+    Each scenario is (name, path, params_fn). params_fn(rng) returns the query
+    parameters of one request, drawn from the real filter values in `ctx`;
+    `{name}` placeholders in the path are filled from those parameters.
+    """
+    years, states, types = ctx["years"], ctx["states"], ctx["complaint_types"]
+    decisions, presses = ctx["decisions"], ctx["presses"]
+
+    def table(rng):
+        return rng.choice(TABLES)
+
+    def pick(rng, values):
+        return rng.choice(values) if values else None
+
+    def clean(params):
+        return {k: v for k, v in params.items() if v is not None}
+
+    return [
+        ("complaints.list", "/complaints/list", lambda r: clean({
+            "table": table(r),
+            "state": pick(r, states) if r.random() < 0.6 else None,
+            "complaint_type": pick(r, types) if r.random() < 0.3 else None,
+            "decision": pick(r, decisions) if r.random() < 0.2 else None,
+            **year_range(r, years),
+        })),
+        ("complaints.stats", "/complaints/stats", lambda r: {"table": table(r), **year_range(r, years)}),
+        ("complaints.filters", "/complaints/filters", lambda r: {}),
+        ("locations.states", "/locations/states", lambda r: {"table": table(r), **year_range(r, years)}),
+        ("media.top", "/media/top", lambda r: {"table": table(r), "top_k": r.choice([5, 10, 20])}),
+        ("media.trends", "/media/trends", lambda r: {"table": table(r), "press_name": pick(r, presses) or ""}),
+        ("media.profile", "/media/{press}/profile", lambda r: (lambda t: {
+            "table": t, "press": pick(r, ctx["presses_by_table"].get(t)) or "unknown",
+        })(table(r))),
+        ("visualizations.wordcloud", "/visualizations/wordcloud", lambda r: {
+            "table": table(r), "column": r.choice(["Complaint", "ComplaintType_Normalized"]),
+            "limit": 100, **year_range(r, years),
+        }),
+        ("visualizations.network", "/visualizations/network", lambda r: {"table": table(r), "limit": r.choice([50, 100, 500])}),
+        ("research.cases_per_state_year", "/research/cases_per_state_year", lambda r: clean({
+            "table": table(r), "state": pick(r, states), **year_range(r, years),
+        })),
+        ("research.cases_per_state", "/research/cases_per_state", lambda r: {
+            "table": table(r), **(year_range(r, years) or {"start_year": min(years), "end_year": max(years)}),
+        }),
+        ("research.wordcloud", "/research/wordcloud", lambda r: {"table": table(r), **year_range(r, years)}),
+        ("research.india_map", "/research/india_map", lambda r: {"table": table(r), **year_range(r, years)}),
+        ("research.stacked_histogram", "/research/stacked_histogram", lambda r: {
+            "table": table(r), "column": r.choice(RESEARCH_COLUMNS), **year_range(r, years),
+        }),
+        ("research.cdf_lineplot", "/research/cdf_lineplot", lambda r: {
+            "table": table(r), "column": r.choice(RESEARCH_COLUMNS), **year_range(r, years),
+        }),
+        ("research.freq_line_plot", "/research/freq_line_plot", lambda r: {
+            "table": table(r), "column": r.choice(RESEARCH_COLUMNS), **year_range(r, years),
+        }),
+        ("research.visualize_press", "/research/visualize_press", lambda r: {
+            "table": table(r), "chart_type": r.choice(["bar", "bubble", "wordcloud", "line"]),
+            "group_col": r.choice(RESEARCH_COLUMNS), "top_k": r.choice([5, 10]),
+        }),
+        ("research.bubble_topk_press", "/research/bubble_topk_press", lambda r: {
+            "table": table(r), "state": pick(r, states) or "", "topk": 5,
+        }),
+    ]
+
+
+# --- HTTP / process helpers ---
+
+
+def http_get(base_url, path, params, timeout):
+    if params and "{" in path:
+        params = dict(params)
+        path = re.sub(r"\{(\w+)\}", lambda m: urllib.parse.quote(str(params.pop(m.group(1))), safe=""), path)
+    url = f"{base_url}{path}"
+    if params:
+        url += "?" + urllib.parse.urlencode(params)
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            body = resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        body, status = b"", 0
+    return time.perf_counter() - t0, status, body
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_bytes(pid):
+    """Current resident set size of `pid` (Linux /proc; falls back to getrusage peak for self)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if pid == os.getpid():
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    return 0
+
+
+def descendants(pid):
+    """PIDs of all children of `pid`, recursively (Linux /proc; empty elsewhere)."""
+    children = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces: fields start after its ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    found, stack = [], [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def tree_rss_bytes(pid):
+    """RSS of `pid` plus all its descendants (uvicorn's supervisor and its workers)."""
+    return rss_bytes(pid) + sum(rss_bytes(child) for child in descendants(pid))
+
+
+class RssSampler:
+    """Samples the RSS of the server's process tree in the background and keeps the maximum seen."""
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = tree_rss_bytes(self.pid)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, tree_rss_bytes(self.pid))
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, tree_rss_bytes(self.pid))
+
+
+class InProcessServer:
+    def __init__(self, port):
+        import uvicorn
+        from main import app
+
+        self.pid = os.getpid()
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+class UvicornProcess:
+    def __init__(self, port, workers):
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--log-level", "warning"]
+        if workers > 1:
+            cmd += ["--workers", str(workers)]
+        self.cmd = cmd
+        self.proc = None
+        self.pid = None
+
+    def start(self):
+        self.proc = subprocess.Popen(self.cmd, cwd=HERE, env=os.environ.copy())
+        self.pid = self.proc.pid
+
+    def stop(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+def wait_ready(base_url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        _, status, _ = http_get(base_url, "/", None, timeout=2)
+        if status == 200:
+            return
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+# --- Measurement ---
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def load_context(base_url, timeout):
+    _, status, body = http_get(base_url, "/complaints/filters", None, timeout)
+    filters = json.loads(body) if status == 200 else {}
+    presses_by_table = {}
+    for t in TABLES:
+        _, status, body = http_get(base_url, "/media/top", {"table": t, "top_k": 20}, timeout)
+        if status == 200:
+            presses_by_table[t] = [row["press"] for row in json.loads(body) if row.get("press")]
+    presses = [p for names in presses_by_table.values() for p in names]
+    return {
+        "years": filters.get("years") or [2000, 2020],
+        "states": filters.get("states") or [],
+        "complaint_types": filters.get("complaint_types") or [],
+        "decisions": filters.get("decisions") or [],
+        "presses": presses,
+        "presses_by_table": presses_by_table,
+    }
+
+
+def run_endpoint(base_url, pid, path, params_fn, rng, n_requests, concurrency, timeout):
+    params = [params_fn(rng) for _ in range(n_requests)]
+    results = []
+    with RssSampler(pid) as sampler:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for latency, status, body in pool.map(lambda p: http_get(base_url, path, p, timeout), params):
+                results.append((latency, status, len(body)))
+        wall = time.perf_counter() - t0
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    errors = sum(1 for r in results if not 200 <= r[1] < 400)
+    return {
+        "requests": n_requests,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "mean_ms": sum(latencies) / len(latencies) if latencies else None,
+        "throughput_rps": n_requests / wall if wall > 0 else None,
+        "mean_bytes": sum(r[2] for r in results) / len(results) if results else 0,
+        "peak_rss_mb": sampler.peak / 1e6,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Return a list of human-readable regressions of `report` against `baseline`."""
+    regressions = []
+    for name, cur in report["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms", "peak_rss_mb"):
+            if base.get(key) and cur.get(key) and cur[key] > base[key] * (1 + threshold):
+                regressions.append(f"{name}: {key} {base[key]:.1f} -> {cur[key]:.1f} (+{cur[key] / base[key] - 1:.0%})")
+        b, c = base.get("throughput_rps"), cur.get("throughput_rps")
+        if b and c and c < b * (1 - threshold):
+            regressions.append(f"{name}: throughput_rps {b:.1f} -> {c:.1f} ({c / b - 1:.0%})")
+        if cur.get("errors", 0) > base.get("errors", 0):
+            regressions.append(f"{name}: errors {base.get('errors', 0)} -> {cur['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every API endpoint")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (uvicorn mode only)")
+    parser.add_argument("--db", type=Path, help="Database to serve (sets PCI_DB_PATH)")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests per endpoint")
+    parser.add_argument("--only", nargs="*", help="Endpoint names to run (default: all)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--out", type=Path, help="Report path (default: bench_results/<timestamp>.json)")
+    parser.add_argument("--baseline", type=Path, help="Previous report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    if args.db:
+        os.environ["PCI_DB_PATH"] = str(args.db.resolve())
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = InProcessServer(port) if args.mode == "inprocess" else UvicornProcess(port, args.workers)
+    server.start()
+
+    rng = random.Random(args.seed)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "mode": args.mode,
+            "workers": args.workers,
+            "db": os.environ.get("PCI_DB_PATH", "complaints.db"),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "endpoints": {},
+    }
+    try:
+        wait_ready(base_url)
+        ctx = load_context(base_url, args.timeout)
+        for name, path, params_fn in build_scenarios(ctx):
+            if args.only and name not in args.only:
+                continue
+            for _ in range(args.warmup):
+                http_get(base_url, path, params_fn(rng), args.timeout)
+            stats = run_endpoint(base_url, server.pid, path, params_fn, rng,
+                                 args.requests, args.concurrency, args.timeout)
+            report["endpoints"][name] = stats
+            print(f"{name:32s} p50={stats['p50_ms']:8.1f}ms p95={stats['p95_ms']:8.1f}ms "
+                  f"p99={stats['p99_ms']:8.1f}ms {stats['throughput_rps']:7.1f} req/s "
+                  f"rss={stats['peak_rss_mb']:7.1f}MB errors={stats['errors']}")
+    finally:
+        server.stop()
+
+    out = args.out or DEFAULT_OUT_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"\nReport written to {out}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for r in regressions:
+                print("  " + r)
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
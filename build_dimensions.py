@@ -0,0 +1,164 @@
+"""
+Star-schema dimensions for the serving tables.
+
+Builds one table per dimension, shared by `against` and `by`:
+
+    dim_state(id, label)                <- State
+    dim_type(id, label)                 <- ComplaintType_Normalized
+    dim_decision(id, parent, specific)  <- (Decision_Parent, Decision_Specific)
+    dim_category(id, label)             <- Complainant_Category, Accused_Category
+    dim_press(id, label)                <- press_name (canonical press, build_press.py)
+
+and stores the integer ids in the fact tables (state_id, type_id, ...), so the API
+groups and filters on ints. Ids are stable across runs: existing labels keep their id,
+new labels are appended, and labels no longer referenced are deleted.
+
+Runs as part of build_serving_schema.py; the API side lives in dimensions.py.
+
+Run: python build_dimensions.py [path/to/complaints.db]
+"""
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from build_indexes import build_indexes, quote, table_columns
+
+DB_PATH = Path(__file__).resolve().parent / "complaints.db"
+TABLES = ["against", "by"]
+
+# name -> dimension table, its attribute columns, and per fact table {fk column: source columns}
+DIMENSIONS = {
+    "state": {
+        "table": "dim_state",
+        "attrs": ["label"],
+        "facts": {"against": {"state_id": ["State"]}, "by": {"state_id": ["State"]}},
+    },
+    "type": {
+        "table": "dim_type",
+        "attrs": ["label"],
+        "facts": {
+            "against": {"type_id": ["ComplaintType_Normalized"]},
+            "by": {"type_id": ["ComplaintType_Normalized"]},
+        },
+    },
+    "decision": {
+        "table": "dim_decision",
+        "attrs": ["parent", "specific"],
+        "facts": {
+            "against": {"decision_id": ["Decision_Parent", "Decision_Specific"]},
+            "by": {"decision_id": ["Decision_Parent", "Decision_Specific"]},
+        },
+    },
+    "category": {
+        "table": "dim_category",
+        "attrs": ["label"],
+        "facts": {
+            "against": {
+                "complainant_category_id": ["Complainant_Category"],
+                "accused_category_id": ["Accused_Category"],
+            },
+            "by": {
+                "complainant_category_id": ["Complainant_Category"],
+                "accused_category_id": ["Accused_Category"],
+            },
+        },
+    },
+    "press": {
+        "table": "dim_press",
+        "attrs": ["label"],
+        "facts": {"against": {"press_id": ["press_name"]}, "by": {"press_id": ["press_name"]}},
+    },
+}
+
+
+def fk_columns():
+    """Every foreign key column added to the fact tables (kept in the serving schema)."""
+    cols = []
+    for dim in DIMENSIONS.values():
+        for fks in dim["facts"].values():
+            cols.extend(c for c in fks if c not in cols)
+    return cols
+
+
+def _ensure_dim_table(conn, dim):
+    attrs = ", ".join(f"{a} TEXT" for a in dim["attrs"])
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {dim['table']} (id INTEGER PRIMARY KEY, {attrs})")
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS ix_{dim['table']}__attrs ON {dim['table']} ({', '.join(dim['attrs'])})"
+    )
+
+
+def _match(dim, alias, sources):
+    # IS so that NULL matches NULL in multi-attribute dimensions (a decision with no specific)
+    return " AND ".join(f"d.{a} IS {alias}.{quote(s)}" for a, s in zip(dim["attrs"], sources))
+
+
+def build_dimension(conn, name, tables=TABLES):
+    dim = DIMENSIONS[name]
+    _ensure_dim_table(conn, dim)
+    attrs = ", ".join(dim["attrs"])
+    updated = []
+
+    for table in tables:
+        cols = table_columns(conn, table)
+        for fk, sources in dim["facts"].get(table, {}).items():
+            if not all(s in cols for s in sources):
+                continue
+            src = ", ".join(quote(s) for s in sources)
+            not_all_null = " OR ".join(f"{quote(s)} IS NOT NULL" for s in sources)
+            # Append new labels; existing ones keep their id
+            conn.execute(f"""
+                INSERT INTO {dim['table']} ({attrs})
+                SELECT DISTINCT {src} FROM {quote(table)} t
+                WHERE ({not_all_null})
+                  AND NOT EXISTS (SELECT 1 FROM {dim['table']} d WHERE {_match(dim, 't', sources)})
+                ORDER BY {src}
+            """)
+            if fk not in cols:
+                conn.execute(f"ALTER TABLE {quote(table)} ADD COLUMN {fk} INTEGER")
+            conn.execute(f"""
+                UPDATE {quote(table)} AS t
+                SET {fk} = (SELECT d.id FROM {dim['table']} d WHERE {_match(dim, 't', sources)})
+            """)
+            updated.append((table, fk))
+
+    # Drop labels that no fact row references any more (checking every fact table,
+    # not only the ones refreshed now)
+    referencing = [
+        (table, fk) for table, fks in dim["facts"].items()
+        for fk in fks if fk in table_columns(conn, table)
+    ]
+    if updated and referencing:
+        referenced = " UNION ".join(
+            f"SELECT {fk} FROM {quote(table)} WHERE {fk} IS NOT NULL" for table, fk in referencing
+        )
+        conn.execute(f"DELETE FROM {dim['table']} WHERE id NOT IN ({referenced})")
+    return updated
+
+
+def build_dimensions(conn, tables=TABLES):
+    """Refresh every dimension and the fact table foreign keys in one transaction."""
+    with conn:
+        for name in DIMENSIONS:
+            build_dimension(conn, name, tables)
+    for dim in DIMENSIONS.values():
+        count = conn.execute(f"SELECT COUNT(*) FROM {dim['table']}").fetchone()[0]
+        print(f"  {dim['table']}: {count} rows")
+
+
+def main():
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else DB_PATH
+    if not db_path.exists():
+        print("DB not found:", db_path)
+        return
+    conn = sqlite3.connect(db_path)
+    t0 = time.perf_counter()
+    build_dimensions(conn)
+    build_indexes(conn)
+    conn.close()
+    print(f"Done in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
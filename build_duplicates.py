@@ -0,0 +1,314 @@
+"""
+Near-duplicate complaints: the same case listed in several annual reports, or in
+both `against` and `by`, with slightly different wording.
+
+Every row of both tables gets a `duplicate_group` (serving column); rows describing
+the same case share it, so `COUNT(DISTINCT duplicate_group)` counts cases instead of
+report entries (GET /complaints/stats?distinct_cases=true). The stage is vectorized
+with NumPy end to end:
+
+    1. documents are the distinct (Complaint text, accused_entity_id) pairs: only rows
+       naming the same resolved respondent (build_entities.py) can be the same case
+    2. shingles: word bigrams of the lower-cased ASCII words, from one split of all
+       texts, pandas.factorize and a 64-bit hash per distinct word
+    3. MinHash: NUM_PERM multiply-shift hashes per shingle, minimum per text with
+       np.minimum.reduceat, CHUNK_SHINGLES shingles at a time (cache-sized)
+    4. LSH: BANDS bands of ROWS_PER_BAND signature values; documents with the same
+       respondent and band share a bucket. Every pair of a bucket of up to MAX_BUCKET
+       documents (neighbours in signature-hash order in larger ones) is linked if the
+       signatures agree on >= THRESHOLD of the positions (estimated Jaccard
+       similarity). Nothing depends on row order, so an appended table is grouped
+       exactly like a full rebuild of it
+    5. groups are the connected components (root hooking with pointer jumping)
+
+Work is linear in the number of shingles; no two documents are compared unless they
+share a bucket. Rows without text are their own group. Runs as part of
+build_serving_schema.py.
+
+Run: python build_duplicates.py [path/to/complaints.db]
+"""
+import sqlite3
+import string
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from build_indexes import build_indexes, quote, table_columns
+
+HERE = Path(__file__).resolve().parent
+DB_PATH = HERE / "complaints.db"
+TABLES = ["against", "by"]
+TEXT_COLUMN = "Complaint"
+GROUP_COLUMN = "duplicate_group"
+RESPONDENT_COLUMN = "accused_entity_id"
+ROW_ID = "row_id"
+MAP_TABLE = "temp.duplicate_map"
+
+NUM_PERM = 64
+BANDS = 8
+ROWS_PER_BAND = NUM_PERM // BANDS
+# Minimum share of equal MinHash values (estimated Jaccard similarity) for a duplicate
+THRESHOLD = 0.8
+# Shingles hashed per MinHash step (x NUM_PERM uint64 values), kept within the CPU cache
+CHUNK_SHINGLES = 4096
+# Candidate pairs compared per step, bounds memory
+CHUNK_PAIRS = 1 << 16
+# Buckets up to this size compare all their pairs, larger ones only neighbours
+MAX_BUCKET = 16
+SEED = 20240501
+
+SEPARATOR = "\x00"
+# Combines the hashes of the two words of a shingle
+SHINGLE_MULT = np.uint64(0x9E3779B97F4A7C15)
+# Bytes kept by tokenize(): ASCII letters and digits (lower-cased first) and SEPARATOR
+_KEEP = (string.ascii_lowercase + string.digits + SEPARATOR).encode()
+_TRANSLATE = bytes(b if b in _KEEP else ord(" ") for b in range(256))
+
+
+def _rows_query(conn, table):
+    """(SELECT of row key, Complaint, respondent; key column) for `table`, None without Complaint."""
+    columns = table_columns(conn, table)
+    respondent = f"t.{RESPONDENT_COLUMN}" if RESPONDENT_COLUMN in columns else "NULL"
+    if ROW_ID in columns:
+        side = f"{table}_text"
+        if TEXT_COLUMN in table_columns(conn, side):
+            return (f"SELECT t.{ROW_ID}, x.{TEXT_COLUMN}, {respondent} FROM {quote(table)} t "
+                    f"LEFT JOIN {quote(side)} x ON x.{ROW_ID} = t.{ROW_ID} ORDER BY t.{ROW_ID}"), ROW_ID
+        key = ROW_ID
+    else:
+        key = "rowid"
+    if TEXT_COLUMN not in columns:
+        return None
+    return f"SELECT t.{key}, t.{TEXT_COLUMN}, {respondent} FROM {quote(table)} t ORDER BY t.{key}", key
+
+
+def tokenize(texts):
+    """(word hashes, text index per word) for the words of `texts`."""
+    joined = SEPARATOR.join("" if t is None else str(t).replace(SEPARATOR, " ") for t in texts)
+    words = joined.encode().lower().translate(_TRANSLATE).decode("ascii")
+    words = np.array(words.replace(SEPARATOR, f" {SEPARATOR} ").split(), dtype=object)
+    tokens, vocab = pd.factorize(words)
+    separators = np.isin(tokens, [i for i, word in enumerate(vocab) if word == SEPARATOR])
+    owners = np.cumsum(separators)
+    # Hashes of the words themselves, so a text's shingles do not depend on the other texts
+    hashes = pd.util.hash_array(np.asarray(vocab, dtype=object))
+    return hashes[tokens[~separators]], owners[~separators]
+
+
+def shingles(texts):
+    """
+    (shingle ids, start offsets, has_words) for `texts`: word bigrams, a one-word text
+    is its word. Shingles are grouped by text; texts without words have none.
+    """
+    tokens, owners = tokenize(texts)
+    counts = np.bincount(owners, minlength=len(texts))
+    next_same = np.r_[owners[1:] == owners[:-1], False]
+    following = np.where(next_same, np.r_[tokens[1:], np.uint64(0)], np.uint64(0))
+    keep = next_same | (counts[owners] == 1)
+    ids = (tokens * SHINGLE_MULT + following)[keep]
+    starts = np.searchsorted(owners[keep], np.arange(len(texts)))
+    return ids, starts, counts > 0
+
+
+def minhash(ids, starts, num_perm=NUM_PERM, seed=SEED):
+    """(texts, num_perm) uint32 signatures of the non-empty shingle groups starting at `starts`."""
+    rng = np.random.default_rng(seed)
+    a = (rng.integers(1, 1 << 63, num_perm, dtype=np.uint64) | np.uint64(1))[:, None]
+    b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)[:, None]
+    shift = np.uint64(32)
+    signatures = np.empty((len(starts), num_perm), dtype=np.uint32)
+    ends = np.append(starts[1:], len(ids))
+    # Whole texts per step, at least one
+    bounds = np.searchsorted(ends, starts + CHUNK_SHINGLES, side="right")
+    first = 0
+    while first < len(starts):
+        last = max(first + 1, int(bounds[first]))
+        lo = starts[first]
+        hashed = np.multiply(a, ids[lo:ends[last - 1]])
+        hashed += b
+        hashed >>= shift
+        signatures[first:last] = np.minimum.reduceat(hashed, starts[first:last] - lo, axis=1).T
+        first = last
+    return signatures
+
+
+def bucket_pairs(keys, tiebreak, max_bucket=MAX_BUCKET):
+    """
+    (u, v) arrays of documents sharing a key: every pair of a bucket of at most
+    `max_bucket` documents, consecutive documents in `tiebreak` order in larger ones.
+    """
+    order = np.lexsort((tiebreak, keys))
+    sorted_keys = keys[order]
+    new_bucket = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+    starts = np.flatnonzero(new_bucket)
+    bucket = np.cumsum(new_bucket) - 1
+    sizes = np.diff(np.r_[starts, len(keys)])
+    end = (starts + sizes)[bucket]
+    small = sizes[bucket] <= max_bucket
+    us, vs = [], []
+    pos = np.flatnonzero(end - np.arange(len(keys)) > 1)
+    offset = 1
+    while len(pos):
+        us.append(order[pos])
+        vs.append(order[pos + offset])
+        offset += 1
+        pos = pos[small[pos] & (pos + offset < end[pos])]
+    if not us:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(us), np.concatenate(vs)
+
+
+def candidate_edges(signatures, partition, bands=BANDS, threshold=THRESHOLD, seed=SEED):
+    """
+    (u, v) arrays of documents in the same `partition` (int per document) sharing a
+    band bucket, whose signatures agree on >= threshold of the positions.
+    """
+    rows = signatures.shape[1] // bands
+    rng = np.random.default_rng(seed + 1)
+    partition = partition.astype(np.uint64)
+    # Orders large buckets by content, not by document index
+    tiebreak = (signatures.astype(np.uint64)
+                * (rng.integers(1, 1 << 63, signatures.shape[1], dtype=np.uint64) | np.uint64(1))
+                ).sum(axis=1, dtype=np.uint64)
+    needed = int(np.ceil(threshold * signatures.shape[1]))
+    us, vs = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    for band in range(bands):
+        part = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        mult = rng.integers(1, 1 << 63, rows + 1, dtype=np.uint64) | np.uint64(1)
+        keys = (part * mult[:rows]).sum(axis=1, dtype=np.uint64) + partition * mult[rows]
+        u, v = bucket_pairs(keys, tiebreak)
+        for lo in range(0, len(u), CHUNK_PAIRS):
+            cu, cv = u[lo:lo + CHUNK_PAIRS], v[lo:lo + CHUNK_PAIRS]
+            agree = np.count_nonzero(signatures[cu] == signatures[cv], axis=1)
+            # Bucket keys are hashes: check the partition too
+            keep = (agree >= needed) & (partition[cu] == partition[cv])
+            us.append(cu[keep])
+            vs.append(cv[keep])
+    return np.concatenate(us), np.concatenate(vs)
+
+
+def components(n, u, v):
+    """Smallest member index of each node's connected component."""
+    labels = np.arange(n)
+    while len(u):
+        ru, rv = labels[u], labels[v]
+        low = np.minimum(ru, rv)
+        hooked = labels.copy()
+        # Hook the roots of both ends onto the smaller one
+        np.minimum.at(hooked, ru, low)
+        np.minimum.at(hooked, rv, low)
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, labels):
+            break
+        labels = hooked
+    return labels
+
+
+def duplicate_groups(texts, respondents=None, num_perm=NUM_PERM, bands=BANDS, threshold=THRESHOLD):
+    """
+    (group per row numbered 1.. in order of first appearance, stats dict) for the rows'
+    `texts` and `respondents` (any hashable per row, None for unknown).
+    """
+    text_codes, distinct = pd.factorize(pd.Series(texts, dtype=object))
+    if respondents is None:
+        respondent_codes = np.zeros(len(text_codes), dtype=np.int64)
+    else:
+        respondent_codes, _ = pd.factorize(pd.Series(respondents, dtype=object))
+    # A document is a distinct (text, respondent); unknown respondents (-1) match each other
+    width = np.int64(respondent_codes.max(initial=0) + 2)
+    doc_codes, doc_keys = pd.factorize(text_codes.astype(np.int64) * width + (respondent_codes + 1))
+    doc_text, doc_respondent = np.divmod(np.asarray(doc_keys), width)
+
+    ids, starts, has_words = shingles(distinct)
+    # Missing text (code -1) has no words
+    has_words = np.append(has_words, False)
+    with_words = np.flatnonzero(has_words)
+    text_rows = np.full(len(has_words), -1)
+    text_rows[with_words] = np.arange(len(with_words))
+    docs = np.flatnonzero(has_words[doc_text])
+
+    labels = np.arange(len(doc_keys))
+    pairs = 0
+    if len(docs):
+        signatures = minhash(ids, starts[with_words], num_perm)[text_rows[doc_text[docs]]]
+        u, v = candidate_edges(signatures, doc_respondent[docs], bands, threshold)
+        pairs = len(u)
+        labels[docs] = docs[components(len(docs), u, v)]
+
+    row_labels = labels[doc_codes]
+    # Rows without text are their own case
+    empty = ~has_words[text_codes]
+    row_labels[empty] = len(doc_keys) + np.arange(empty.sum())
+    groups, _ = pd.factorize(row_labels)
+    groups = groups + 1
+    sizes = np.bincount(groups)
+    return groups, {
+        "rows": len(text_codes),
+        "documents": len(docs),
+        "linked_pairs": pairs,
+        "groups": int(groups.max(initial=0)),
+        "duplicate_rows": int((sizes[groups] > 1).sum()),
+    }
+
+
+def build_duplicates(conn, tables=TABLES):
+    """Set duplicate_group on every row of `tables`, grouping across the tables."""
+    t0 = time.perf_counter()
+    queries = {table: _rows_query(conn, table) for table in tables}
+    queries = {table: query for table, query in queries.items() if query is not None}
+    if not queries:
+        print("  no Complaint text, skipping duplicate detection")
+        return None
+    keys, texts, respondents = [], [], []
+    for table, (query, key) in queries.items():
+        rows = conn.execute(query).fetchall()
+        keys.append((table, key, [r[0] for r in rows]))
+        texts.extend(r[1] for r in rows)
+        respondents.extend(r[2] for r in rows)
+    groups, stats = duplicate_groups(texts, respondents)
+
+    with conn:
+        offset = 0
+        for table, key, row_keys in keys:
+            if GROUP_COLUMN not in table_columns(conn, table):
+                conn.execute(f"ALTER TABLE {quote(table)} ADD COLUMN {GROUP_COLUMN} INTEGER")
+            conn.execute(f"DROP TABLE IF EXISTS {MAP_TABLE}")
+            conn.execute("CREATE TEMP TABLE duplicate_map (row_key INTEGER PRIMARY KEY, grp INTEGER)")
+            conn.executemany(
+                f"INSERT INTO {MAP_TABLE} VALUES (?, ?)",
+                zip(row_keys, groups[offset:offset + len(row_keys)].tolist()),
+            )
+            offset += len(row_keys)
+            conn.execute(f"""
+                UPDATE {quote(table)} SET {GROUP_COLUMN} = m.grp
+                FROM {MAP_TABLE} m WHERE m.row_key = {quote(table)}.{key}
+            """)
+        conn.execute(f"DROP TABLE IF EXISTS {MAP_TABLE}")
+    print(f"  {GROUP_COLUMN}: {stats['rows']} rows, {stats['documents']} documents, "
+          f"{stats['linked_pairs']} linked pairs -> {stats['groups']} cases, "
+          f"{stats['duplicate_rows']} rows in a duplicate group ({time.perf_counter() - t0:.2f}s)")
+    return stats
+
+
+def main():
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else DB_PATH
+    if not db_path.exists():
+        print("DB not found:", db_path)
+        return
+    conn = sqlite3.connect(db_path)
+    t0 = time.perf_counter()
+    build_duplicates(conn)
+    build_indexes(conn)
+    conn.close()
+    print(f"Done in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Entity resolution for complainants and accused across `against` and `by`.
+
+The same person or organization shows up under many spellings, in either table and
+on either side (a newspaper accused in `against` complains in `by`). This stage
+gives each one a stable integer id:
+
+    entity_aliases(key PRIMARY KEY, entity_id)   lookup key (simple_norm) -> entity
+    entities(id, name, complaints, as_complainant, as_accused, first_year, last_year)
+    <table>.complainant_entity_id, <table>.accused_entity_id   (serving columns, indexed)
+
+A row's name is its Complainant / Against value; generic titles ("Editor") are
+qualified with the side's resolved affiliation ("Editor, Dainik Jagran") as
+normalize_complainants.py does, and left without an entity when there is none or it
+is a generic title itself ("Editor, Editor" would lump unrelated editors). The
+distinct keys are clustered with fuzzy_cluster.py (word / 4-gram blocking,
+rapidfuzz cdist scoring, each key joining its most frequent match).
+
+Ids are stable across runs: entity_aliases is never rewritten, a known key keeps its
+entity, a new key takes the entity of the most frequent known key in its cluster,
+else its cluster gets a new id. `entities` is rebuilt every run from the referenced
+ids, so "all complaints involving entity X" is two indexed integer lookups
+(GET /complaints/entity/{id}).
+
+Runs as part of build_serving_schema.py.
+
+Run: python build_entities.py [path/to/complaints.db]
+"""
+import sqlite3
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from build_indexes import YEAR_EXPR, build_indexes, quote, table_columns
+from fuzzy_cluster import blocks, cluster, match_form, match_pairs
+from normalize_against import simple_norm
+
+HERE = Path(__file__).resolve().parent
+DB_PATH = HERE / "complaints.db"
+TABLES = ["against", "by"]
+ENTITIES_TABLE = "entities"
+ALIASES_TABLE = "entity_aliases"
+MAP_TABLE = "temp.entity_map"
+THRESHOLD = 92
+
+# entity id column -> (name column, affiliation column), the same in both tables
+SIDES = {
+    "complainant_entity_id": ("Complainant", "c_aff_resolved"),
+    "accused_entity_id": ("Against", "a_aff_resolved"),
+}
+
+# Titles that name a role, not a person (normalize_complainants.py qualifies them too)
+GENERIC_TITLES = [
+    "Editor", "Chief Editor", "Publisher", "President", "General Secretary",
+    "Manager", "editor", "Correspondent", "Reporter", "Journalist", "Secretary",
+    "Managing Editor", "Group Editor", "Resident Editor", "Executive Editor",
+    "Bureau Chief", "Staff Reporter", "City Editor", "News Editor", "Sub-Editor"
+]
+
+
+def entity_columns():
+    return list(SIDES)
+
+
+def name_expr(columns, side):
+    """SQL for the entity name of `side` on a row, NULL if it cannot identify anyone."""
+    name_col, aff_col = SIDES[side]
+    name = f"NULLIF(TRIM({quote(name_col)}), '')"
+    if aff_col not in columns:
+        return name
+    titles = ", ".join("'" + t.lower() + "'" for t in sorted(set(GENERIC_TITLES)))
+    aff = f"NULLIF(TRIM({quote(aff_col)}), '')"
+    return (f"CASE WHEN LOWER({name}) NOT IN ({titles}) THEN {name} "
+            f"WHEN LOWER({aff}) IN ({titles}) THEN NULL "
+            f"ELSE {name} || ', ' || {aff} END")
+
+
+def _sides(conn, tables):
+    """[(table, id column, name expression)] for the sides present in `tables`."""
+    found = []
+    for table in tables:
+        columns = table_columns(conn, table)
+        for side, (name_col, _) in SIDES.items():
+            if name_col in columns:
+                found.append((table, side, name_expr(columns, side)))
+    return found
+
+
+def ensure_tables(conn):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {ALIASES_TABLE} (key TEXT PRIMARY KEY, entity_id INTEGER NOT NULL)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{ALIASES_TABLE}__entity ON {ALIASES_TABLE} (entity_id)")
+
+
+def resolve(names, known, threshold=THRESHOLD):
+    """
+    {key: entity id} for the keys of `names` ({name: rows}), keeping the ids of
+    `known` ({key: entity id}) and numbering new clusters after the largest id.
+    """
+    rows = defaultdict(int)
+    for name, count in names.items():
+        key = simple_norm(name)
+        if key:
+            rows[key] += count
+    keys = sorted(rows, key=lambda k: (-rows[k], k))
+    forms = [match_form(k) for k in keys]
+    kept, _ = blocks(forms)
+    root = cluster([-i for i in range(len(keys))], match_pairs(forms, kept, threshold))
+
+    members = defaultdict(list)
+    for i, r in enumerate(root):
+        members[r].append(i)
+    next_id = max(known.values(), default=0) + 1
+    ids = {}
+    # Heaviest clusters first, so new ids follow frequency
+    for r in sorted(members):
+        group = members[r]
+        inherited = [known[keys[i]] for i in group if keys[i] in known]
+        if inherited:
+            cluster_id = inherited[0]
+        else:
+            cluster_id = next_id
+            next_id += 1
+        for i in group:
+            ids[keys[i]] = known.get(keys[i], cluster_id)
+    return ids
+
+
+def _assign(conn, table, side, expr):
+    """Write `side` of `table` from the entity map; returns the rows given an entity."""
+    if side not in table_columns(conn, table):
+        conn.execute(f"ALTER TABLE {quote(table)} ADD COLUMN {side} INTEGER")
+    conn.execute(f"UPDATE {quote(table)} SET {side} = NULL")
+    return conn.execute(f"""
+        UPDATE {quote(table)} SET {side} = m.entity_id
+        FROM {MAP_TABLE} m WHERE m.name = {expr}
+    """).rowcount
+
+
+def build_entity_summary(conn, sides):
+    conn.execute(f"DROP TABLE IF EXISTS {ENTITIES_TABLE}")
+    conn.execute(f"""
+        CREATE TABLE {ENTITIES_TABLE} (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            complaints INTEGER NOT NULL,
+            as_complainant INTEGER NOT NULL,
+            as_accused INTEGER NOT NULL,
+            first_year INTEGER,
+            last_year INTEGER
+        )
+    """)
+    if not sides:
+        return
+    occurrences = " UNION ALL ".join(
+        f"SELECT {side} AS id, {expr} AS name, {'1' if side == 'complainant_entity_id' else '0'} AS complainant, "
+        f"{YEAR_EXPR} AS year FROM {quote(table)} WHERE {side} IS NOT NULL"
+        for table, side, expr in sides
+    )
+    stats = {}
+    spellings = defaultdict(Counter)
+    for entity_id, name, complainant, year, n in conn.execute(f"""
+        SELECT id, name, complainant, year, COUNT(*) FROM ({occurrences}) GROUP BY 1, 2, 3, 4
+    """):
+        total, as_complainant, first, last = stats.get(entity_id, (0, 0, None, None))
+        stats[entity_id] = (
+            total + n,
+            as_complainant + (n if complainant else 0),
+            year if first is None or (year is not None and year < first) else first,
+            year if last is None or (year is not None and year > last) else last,
+        )
+        spellings[entity_id][name] += n
+    conn.executemany(
+        f"INSERT INTO {ENTITIES_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (entity_id, spellings[entity_id].most_common(1)[0][0], total, as_complainant,
+             total - as_complainant, first, last)
+            for entity_id, (total, as_complainant, first, last) in sorted(stats.items())
+        ],
+    )
+
+
+def build_entities(conn, tables=TABLES, threshold=THRESHOLD):
+    """Resolve entities and write the fact table ids and the entities table in one transaction."""
+    with conn:
+        ensure_tables(conn)
+        sides = _sides(conn, tables)
+        names = defaultdict(int)
+        for table, side, expr in sides:
+            for name, n in conn.execute(
+                f"SELECT {expr}, COUNT(*) FROM {quote(table)} WHERE {expr} IS NOT NULL GROUP BY 1"
+            ):
+                names[name] += n
+        known = dict(conn.execute(f"SELECT key, entity_id FROM {ALIASES_TABLE}"))
+        ids = resolve(names, known, threshold)
+        conn.executemany(
+            f"INSERT INTO {ALIASES_TABLE} VALUES (?, ?)",
+            [(key, entity_id) for key, entity_id in ids.items() if key not in known],
+        )
+
+        conn.execute(f"DROP TABLE IF EXISTS {MAP_TABLE}")
+        conn.execute("CREATE TEMP TABLE entity_map (name TEXT PRIMARY KEY, entity_id INTEGER)")
+        conn.executemany(
+            f"INSERT INTO {MAP_TABLE} VALUES (?, ?)",
+            [(name, ids[simple_norm(name)]) for name in names if simple_norm(name) in ids],
+        )
+        assigned = {}
+        for table, side, expr in sides:
+            assigned[(table, side)] = _assign(conn, table, side, expr)
+        conn.execute(f"DROP TABLE {MAP_TABLE}")
+        build_entity_summary(conn, sides)
+
+    for (table, side), n in assigned.items():
+        print(f"  {table}.{side}: {n} rows")
+    count = conn.execute(f"SELECT COUNT(*) FROM {ENTITIES_TABLE}").fetchone()[0]
+    print(f"  {ENTITIES_TABLE}: {count} rows from {len(ids)} name keys")
+
+
+def main():
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else DB_PATH
+    if not db_path.exists():
+        print("DB not found:", db_path)
+        return
+    conn = sqlite3.connect(db_path)
+    t0 = time.perf_counter()
+    build_entities(conn)
+    build_indexes(conn)
+    conn.close()
+    print(f"Done in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Post-load indexing stage.
+
+`to_sql(if_exists='replace')` in the loaders drops every index, and the normalization
+scripts leave the database without planner statistics. This stage recreates the
+declared index set for the API's filter/group columns, then runs ANALYZE and
+PRAGMA optimize.
+
+The year filters in the routers use the expression CAST(substr(ReportName, -4) AS INTEGER);
+SQLite only uses an expression index when the query repeats the exact expression,
+so keep YEAR_EXPR in sync with the routers.
+
+Run: python build_indexes.py [path/to/complaints.db]
+"""
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+DB_PATH = Path(__file__).resolve().parent / "complaints.db"
+TABLES = ["against", "by"]
+
+YEAR_EXPR = "CAST(substr(ReportName, -4) AS INTEGER)"
+YEAR_TEXT_EXPR = "substr(ReportName, -4)"
+
+# Per-table column roles (see routers/complaints.py and routers/research.py)
+PRESS_COL = {"against": "Against", "by": "Complainant"}
+CATEGORY_COL = {"against": "Complainant_Category", "by": "Accused_Category"}
+CATEGORY_ID_COL = {"against": "complainant_category_id", "by": "accused_category_id"}
+OCCUPATION_COL = {"against": "Complainant_Occupation", "by": "Accused_Occupation"}
+
+
+def declared_indexes(table):
+    """
+    (name, [column or expression, ...]) for `table`. Multi-column entries are
+    covering indexes for the hot count/group-by queries. Filters and group-bys on
+    the dimensions use the integer ids from build_dimensions.py.
+    """
+    return [
+        # /complaints/stats total with year range, /complaints/list year filter
+        ("year", [YEAR_EXPR]),
+        # /complaints/stats yearly distribution (GROUP BY substr(ReportName, -4))
+        ("report_year", [YEAR_TEXT_EXPR, "ReportName"]),
+        # /locations/states, /research/cases_per_state, /research/india_map, /research/bubble_topk_press
+        ("state_report_press", ["state_id", "ReportName", "press_id"]),
+        # /complaints/list filters
+        ("type_report", ["type_id", "ReportName"]),
+        ("decision_report", ["decision_id", "ReportName"]),
+        ("category", [CATEGORY_ID_COL[table]]),
+        ("occupation", [OCCUPATION_COL[table]]),
+        # /complaints/filters affiliations
+        ("c_aff", ["c_aff_resolved"]),
+        ("a_aff", ["a_aff_resolved"]),
+        # /research/visualize_press press groups (/media/* reads press_rollup, see build_press.py)
+        ("press_report", ["press_id", "ReportName"]),
+        # /complaints/entity/{id} (build_entities.py)
+        ("complainant_entity", ["complainant_entity_id"]),
+        ("accused_entity", ["accused_entity_id"]),
+        # /complaints/stats?distinct_cases yearly distribution (build_duplicates.py)
+        ("report_year_case", [YEAR_TEXT_EXPR, "ReportName", "duplicate_group"]),
+    ]
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def index_term(term, columns):
+    """Quote plain column names; leave expressions as written."""
+    return quote(term) if term in columns else term
+
+
+def table_columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({quote(table)})")}
+
+
+def build_indexes(conn, tables=TABLES, analyze=True):
+    """
+    Create the declared indexes on each of `tables` (skipping ones whose columns
+    the table does not have), then refresh planner statistics.
+    """
+    created = 0
+    for table in tables:
+        columns = table_columns(conn, table)
+        if not columns:
+            print(f"Table {table} not found, skipping indexes.")
+            continue
+        for name, terms in declared_indexes(table):
+            # Plain identifiers are column names; anything else is an expression
+            if any(t.isidentifier() and t not in columns for t in terms):
+                continue
+            cols_sql = ", ".join(index_term(t, columns) for t in terms)
+            index_name = f"ix_{table}__{name}"
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {quote(index_name)} ON {quote(table)} ({cols_sql})")
+            created += 1
+    conn.commit()
+
+    if analyze:
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+    return created
+
+
+def main():
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else DB_PATH
+    if not db_path.exists():
+        print("DB not found:", db_path)
+        return
+    conn = sqlite3.connect(db_path)
+    t0 = time.perf_counter()
+    created = build_indexes(conn)
+    conn.close()
+    print(f"Ensured {created} indexes and refreshed statistics in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Canonical press per row and the press x year x type rollup behind /media.
+
+Neither table has a clean press column: 'against' names the press in `Press`
+(falling back to `Against`), 'by' in `Complainant`. This stage:
+
+1. writes `press_name` on every serving row: the first non-empty source column,
+   canonicalized with against_mappings.csv (same rules as normalize_against.py),
+2. (build_dimensions.py then assigns `press_id` from dim_press over `press_name`),
+3. rebuilds `press_rollup(source, press_id, year, type_id, count)`, which
+   /media/top and /media/trends read instead of scanning the fact tables,
+4. rebuilds `press_profile`, one row per (source, press_id) with the yearly,
+   decision, complaint type, state and counterparty distributions as compact JSON,
+   served by /media/{press}/profile with a single primary-key read.
+
+Runs as part of build_serving_schema.py.
+
+Run: python build_press.py [path/to/complaints.db]
+"""
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from build_dimensions import build_dimensions
+from build_indexes import YEAR_EXPR, build_indexes, quote, table_columns
+from normalize_against import canonicalize_value, load_mapping
+
+HERE = Path(__file__).resolve().parent
+DB_PATH = HERE / "complaints.db"
+MAPPING_CSV = HERE / "against_mappings.csv"
+TABLES = ["against", "by"]
+
+# Columns naming the press house, in order of preference
+PRESS_SOURCES = {"against": ["Press", "Against"], "by": ["Complainant"]}
+ROLLUP_TABLE = "press_rollup"
+PROFILE_TABLE = "press_profile"
+# The other party of a complaint: who complained against the press / whom the press complained against
+COUNTERPARTY_COL = {"against": "Complainant", "by": "Against"}
+PROFILE_TOP_K = 10
+
+
+def press_source_expr(conn, table):
+    cols = table_columns(conn, table)
+    # NULLIF so an empty Press falls through to the next column
+    terms = [f"NULLIF(TRIM({quote(c)}), '')" for c in PRESS_SOURCES[table] if c in cols]
+    if not terms:
+        return None
+    return terms[0] if len(terms) == 1 else f"COALESCE({', '.join(terms)})"
+
+
+def canonical_press(raw, mapping):
+    name = canonicalize_value(raw, mapping)
+    return name or None
+
+
+def materialize_press_names(conn, tables=TABLES, mapping=None):
+    """Set `press_name` on every row of `tables`; canonicalizes each distinct raw value once."""
+    if mapping is None:
+        mapping = load_mapping(MAPPING_CSV)
+    with conn:
+        for table in tables:
+            source = press_source_expr(conn, table)
+            if source is None:
+                print(f"  {table}: no press column, skipping press names")
+                continue
+            cols = table_columns(conn, table)
+            if "press_name" not in cols:
+                conn.execute(f"ALTER TABLE {quote(table)} ADD COLUMN press_name TEXT")
+
+            raw_values = [r[0] for r in conn.execute(
+                f"SELECT DISTINCT {source} FROM {quote(table)} WHERE {source} IS NOT NULL"
+            )]
+            conn.execute("DROP TABLE IF EXISTS temp.press_map")
+            conn.execute("CREATE TEMP TABLE press_map (raw TEXT PRIMARY KEY, name TEXT)")
+            conn.executemany(
+                "INSERT INTO temp.press_map VALUES (?, ?)",
+                [(raw, canonical_press(raw, mapping)) for raw in raw_values],
+            )
+            conn.execute(f"UPDATE {quote(table)} SET press_name = NULL")
+            conn.execute(f"""
+                UPDATE {quote(table)} SET press_name = m.name
+                FROM temp.press_map m WHERE m.raw = {source}
+            """)
+            names = conn.execute(f"SELECT COUNT(DISTINCT press_name) FROM {quote(table)}").fetchone()[0]
+            print(f"  {table}: {len(raw_values)} raw press values -> {names} canonical names")
+        conn.execute("DROP TABLE IF EXISTS temp.press_map")
+
+
+def build_press_rollup(conn, tables=TABLES):
+    """Rebuild press_rollup from the fact tables' press_id/type_id (run after build_dimensions)."""
+    with conn:
+        conn.execute(f"DROP TABLE IF EXISTS {ROLLUP_TABLE}")
+        conn.execute(f"""
+            CREATE TABLE {ROLLUP_TABLE} (
+                source TEXT NOT NULL,
+                press_id INTEGER NOT NULL,
+                year INTEGER,
+                type_id INTEGER,
+                count INTEGER NOT NULL
+            )
+        """)
+        for table in tables:
+            cols = table_columns(conn, table)
+            if not {"press_id", "type_id"} <= cols:
+                continue
+            conn.execute(f"""
+                INSERT INTO {ROLLUP_TABLE} (source, press_id, year, type_id, count)
+                SELECT ?, press_id, {YEAR_EXPR}, type_id, COUNT(*)
+                FROM {quote(table)}
+                WHERE press_id IS NOT NULL
+                GROUP BY press_id, {YEAR_EXPR}, type_id
+            """, (table,))
+        conn.execute(
+            f"CREATE INDEX ix_{ROLLUP_TABLE}__source_press_year ON {ROLLUP_TABLE} (source, press_id, year)"
+        )
+    rows = conn.execute(f"SELECT COUNT(*) FROM {ROLLUP_TABLE}").fetchone()[0]
+    print(f"  {ROLLUP_TABLE}: {rows} rows")
+
+
+def _distribution(conn, table, expr, by_count=True, top_k=None):
+    """{press_id: [[value, count], ...]} ordered by count (or by value), optionally cut to top_k."""
+    rows = conn.execute(f"""
+        SELECT press_id, {expr} AS value, COUNT(*) AS n
+        FROM {quote(table)}
+        WHERE press_id IS NOT NULL AND {expr} IS NOT NULL
+        GROUP BY press_id, value
+    """)
+    dist = {}
+    for press_id, value, n in rows:
+        dist.setdefault(press_id, []).append([value, n])
+    for items in dist.values():
+        items.sort(key=(lambda item: (-item[1], item[0])) if by_count else (lambda item: item[0]))
+        if top_k is not None:
+            del items[top_k:]
+    return dist
+
+
+def _compact(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def build_press_profiles(conn, tables=TABLES, top_k=PROFILE_TOP_K):
+    """Rebuild press_profile (run after build_dimensions, needs press_id)."""
+    with conn:
+        conn.execute(f"DROP TABLE IF EXISTS {PROFILE_TABLE}")
+        conn.execute(f"""
+            CREATE TABLE {PROFILE_TABLE} (
+                source TEXT NOT NULL,
+                press_id INTEGER NOT NULL,
+                press_name TEXT,
+                total INTEGER NOT NULL,
+                first_year INTEGER,
+                last_year INTEGER,
+                yearly TEXT,
+                decisions TEXT,
+                types TEXT,
+                top_states TEXT,
+                top_counterparties TEXT,
+                PRIMARY KEY (source, press_id)
+            ) WITHOUT ROWID
+        """)
+        for table in tables:
+            cols = table_columns(conn, table)
+            if "press_id" not in cols:
+                continue
+            yearly = _distribution(conn, table, YEAR_EXPR, by_count=False)
+            decisions = _distribution(conn, table, "Decision_Parent")
+            types = _distribution(conn, table, "ComplaintType_Normalized")
+            states = _distribution(conn, table, "State", top_k=top_k)
+            counterparties = _distribution(conn, table, quote(COUNTERPARTY_COL[table]), top_k=top_k)
+
+            rows = []
+            for press_id, press_name, total in conn.execute(f"""
+                SELECT press_id, press_name, COUNT(*) FROM {quote(table)}
+                WHERE press_id IS NOT NULL GROUP BY press_id
+            """):
+                years = yearly.get(press_id, [])
+                rows.append((
+                    table, press_id, press_name, total,
+                    years[0][0] if years else None, years[-1][0] if years else None,
+                    _compact(years),
+                    _compact(decisions.get(press_id, [])),
+                    _compact(types.get(press_id, [])),
+                    _compact(states.get(press_id, [])),
+                    _compact(counterparties.get(press_id, [])),
+                ))
+            conn.executemany(f"INSERT INTO {PROFILE_TABLE} VALUES ({', '.join('?' * 11)})", rows)
+    rows = conn.execute(f"SELECT COUNT(*) FROM {PROFILE_TABLE}").fetchone()[0]
+    print(f"  {PROFILE_TABLE}: {rows} rows")
+
+
+def main():
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else DB_PATH
+    if not db_path.exists():
+        print("DB not found:", db_path)
+        return
+    conn = sqlite3.connect(db_path)
+    t0 = time.perf_counter()
+    materialize_press_names(conn)
+    # press_id comes from dim_press over the new names
+    build_dimensions(conn)
+    build_press_rollup(conn)
+    build_press_profiles(conn)
+    build_indexes(conn)
+    conn.close()
+    print(f"Done in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Split the loaded `against`/`by` tables into a narrow serving table plus side tables.
+
+The loaders write every CSV column into the hot tables, and the normalization
+scripts add `*_backup` columns on top. The API only reads a handful of columns, but
+every scan pays for the wide rows. This stage rebuilds, per table:
+
+    <table>        row_id INTEGER PRIMARY KEY + SERVING_COLUMNS    (API scans these)
+                   including press_name (build_press.py), the dimension ids (build_dimensions.py)
+                   the entity ids (build_entities.py) and duplicate_group (build_duplicates.py)
+    <table>_text   row_id + long free-text columns (Complaint)     (joined on demand)
+    <table>_raw    row_id + everything else: raw, resolved and *_backup columns
+
+`PrimaryKey` is not unique in the source data, so the side tables are keyed by
+`row_id` (the serving table's rowid). The stage is idempotent: run it again after a
+normalization script added columns and they are moved out of the serving table (a
+table that already has the serving layout is not rewritten).
+
+Run: python build_serving_schema.py [path/to/complaints.db]
+"""
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from build_dimensions import build_dimensions, fk_columns
+from build_duplicates import GROUP_COLUMN, build_duplicates
+from build_entities import build_entities, entity_columns
+from build_indexes import build_indexes, quote
+from build_press import build_press_profiles, build_press_rollup, materialize_press_names
+from csv_ingest import transaction
+
+DB_PATH = Path(__file__).resolve().parent / "complaints.db"
+TABLES = ["against", "by"]
+ROW_ID = "row_id"
+
+# Columns read by routers/ (filters, group-bys, list responses)
+SERVING_COLUMNS = [
+    "PrimaryKey", "ReportName", "State",
+    "Complainant", "Against", "Press",
+    "ComplaintType", "res_ComplaintType", "ComplaintType_Normalized",
+    "Decision_Parent", "Decision_Specific",
+    "Complainant_Category", "Complainant_Occupation", "Accused_Category", "Accused_Occupation",
+    "c_aff_resolved", "a_aff_resolved", "level", "press_name",
+] + fk_columns() + entity_columns() + [GROUP_COLUMN]
+TEXT_COLUMNS = ["Complaint"]
+
+
+def side_tables(table):
+    return {"text": f"{table}_text", "raw": f"{table}_raw"}
+
+
+def column_types(conn, table):
+    """Ordered {column: declared type}; empty if the table does not exist."""
+    return {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({quote(table)})")}
+
+
+def is_split(conn, table):
+    return ROW_ID in column_types(conn, table)
+
+
+def wide_source(conn, table):
+    """
+    FROM clause exposing every column of `table` (serving + side tables) plus row_id.
+    Unqualified column names stay valid because the joins are USING (row_id).
+    """
+    if not is_split(conn, table):
+        return f"(SELECT rowid AS {ROW_ID}, * FROM {quote(table)})"
+    source = quote(table)
+    for side in side_tables(table).values():
+        if column_types(conn, side):
+            source += f" LEFT JOIN {quote(side)} USING ({ROW_ID})"
+    return source
+
+
+def wide_columns(conn, table):
+    """Ordered {column: type} across the serving table and its side tables (row_id excluded)."""
+    cols = {c: t for c, t in column_types(conn, table).items() if c != ROW_ID}
+    if is_split(conn, table):
+        for side in side_tables(table).values():
+            cols.update({c: t for c, t in column_types(conn, side).items() if c != ROW_ID})
+    return cols
+
+
+def needs_split(conn, table):
+    """False if `table` already has exactly the serving layout split_table would build."""
+    if not is_split(conn, table):
+        return True
+    types = wide_columns(conn, table)
+    serving = [c for c in column_types(conn, table) if c != ROW_ID]
+    text = [c for c in column_types(conn, side_tables(table)["text"]) if c != ROW_ID]
+    return (
+        serving != [c for c in SERVING_COLUMNS if c in types]
+        or text != [c for c in TEXT_COLUMNS if c in types]
+    )
+
+
+def _create_and_fill(conn, target, columns, types, source):
+    col_defs = ", ".join(f"{quote(c)} {types[c] or ''}".rstrip() for c in columns)
+    conn.execute(f"DROP TABLE IF EXISTS {quote(target)}")
+    conn.execute(
+        f"CREATE TABLE {quote(target)} ({ROW_ID} INTEGER PRIMARY KEY"
+        + (f", {col_defs}" if col_defs else "") + ")"
+    )
+    select_cols = ", ".join([ROW_ID] + [quote(c) for c in columns])
+    conn.execute(
+        f"INSERT INTO {quote(target)} ({select_cols}) SELECT {select_cols} FROM {source} ORDER BY {ROW_ID}"
+    )
+
+
+def split_table(conn, table):
+    """Rebuild `table` as serving + side tables in one transaction."""
+    types = wide_columns(conn, table)
+    if not types:
+        print(f"Table {table} not found, skipping.")
+        return None
+    # A freshly loaded (wide) table supersedes any side tables left from the previous load
+    stale_sides = not is_split(conn, table)
+    source = wide_source(conn, table)
+
+    serving = [c for c in SERVING_COLUMNS if c in types]
+    text = [c for c in TEXT_COLUMNS if c in types]
+    raw = [c for c in types if c not in serving and c not in text]
+    sides = side_tables(table)
+
+    with transaction(conn):
+        _create_and_fill(conn, f"{table}__serving", serving, types, source)
+        _create_and_fill(conn, f"{sides['text']}__new", text, types, source)
+        _create_and_fill(conn, f"{sides['raw']}__new", raw, types, source)
+        for name in [table, sides["text"], sides["raw"]]:
+            conn.execute(f"DROP TABLE IF EXISTS {quote(name)}")
+        conn.execute(f"ALTER TABLE {quote(table + '__serving')} RENAME TO {quote(table)}")
+        conn.execute(f"ALTER TABLE {quote(sides['text'] + '__new')} RENAME TO {quote(sides['text'])}")
+        conn.execute(f"ALTER TABLE {quote(sides['raw'] + '__new')} RENAME TO {quote(sides['raw'])}")
+    if stale_sides:
+        print(f"  {table}: rebuilt from freshly loaded wide table")
+    return {"serving": len(serving), "text": len(text), "raw": len(raw)}
+
+
+def page_count(conn, table):
+    try:
+        return conn.execute("SELECT COUNT(*) FROM dbstat WHERE name = ?", (table,)).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None  # SQLite built without DBSTAT
+
+
+def build_serving_schema(conn, tables=TABLES):
+    for table in tables:
+        if column_types(conn, table) and not needs_split(conn, table):
+            print(f"  {table}: serving layout up to date")
+            continue
+        before = page_count(conn, table)
+        counts = split_table(conn, table)
+        if counts is None:
+            continue
+        after = page_count(conn, table)
+        pages = f", pages {before} -> {after}" if before is not None else ""
+        print(f"  {table}: {counts['serving']} serving, {counts['text']} text, {counts['raw']} raw columns{pages}")
+    materialize_press_names(conn, tables)
+    build_dimensions(conn, tables)
+    build_entities(conn, tables)
+    build_duplicates(conn, tables)
+    build_press_rollup(conn, tables)
+    build_press_profiles(conn, tables)
+    build_indexes(conn, tables)
+
+
+def main():
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else DB_PATH
+    if not db_path.exists():
+        print("DB not found:", db_path)
+        return
+    conn = sqlite3.connect(db_path)
+    t0 = time.perf_counter()
+    build_serving_schema(conn)
+    conn.execute("VACUUM")
+    conn.close()
+    print(f"Done in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
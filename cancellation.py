@@ -0,0 +1,148 @@
+"""
+Time budgets and cooperative cancellation for request handlers.
+
+`CancellationMiddleware` gives every HTTP request a `RequestBudget` (per path prefix,
+see BUDGETS) and marks it cancelled when the client disconnects. The budget is then
+enforced at two kinds of checkpoints:
+
+- inside SQLite: database.py installs `sqlite3.Connection.set_progress_handler` before
+  every statement, which aborts the statement once the budget is spent or cancelled,
+- between handler phases: `timing.span()` calls `check_budget()` on entry, so pandas
+  and matplotlib work stops at the next phase.
+
+Either way a `QueryAborted` is raised and turned into a 503 (budget exceeded) or a
+499 (client closed the request). Aborted queries are counted in
+pci_aborted_queries_total{reason}.
+
+Budgets: PCI_QUERY_BUDGET_S (default 30) for every path, PCI_QUERY_BUDGETS overrides
+per path prefix, e.g. "/complaints/list=5,/research/=60". Outside of a request (ETL
+scripts, background jobs) there is no budget.
+"""
+import asyncio
+import os
+from contextvars import ContextVar
+from time import perf_counter
+
+from fastapi.responses import JSONResponse
+
+from metrics import ABORTED_QUERIES
+
+DEFAULT_BUDGET = float(os.environ.get("PCI_QUERY_BUDGET_S", "30"))
+# Path prefix -> seconds; the longest matching prefix wins
+BUDGETS = {
+    "/complaints/list": 10.0,
+    "/complaints/": 5.0,
+    "/locations/": 5.0,
+    "/media/": 5.0,
+    "/visualizations/": 10.0,
+    "/batch": 15.0,
+}
+for item in filter(None, os.environ.get("PCI_QUERY_BUDGETS", "").split(",")):
+    prefix, _, seconds = item.partition("=")
+    BUDGETS[prefix.strip()] = float(seconds)
+
+# SQLite VM instructions between two budget checks
+PROGRESS_INTERVAL = 10000
+
+STATUS = {"timeout": 503, "disconnect": 499}
+DETAIL = {"timeout": "Query time budget exceeded", "disconnect": "Client closed request"}
+
+_current = ContextVar("request_budget", default=None)
+
+
+class QueryAborted(Exception):
+    def __init__(self, reason):
+        super().__init__(DETAIL[reason])
+        self.reason = reason
+
+
+class RequestBudget:
+    __slots__ = ("seconds", "deadline", "reason")
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.deadline = perf_counter() + seconds
+        self.reason = None
+
+    def cancel(self, reason="disconnect"):
+        if self.reason is None:
+            self.reason = reason
+
+    def exceeded(self):
+        """True once the budget is spent or cancelled; also the SQLite progress handler."""
+        if self.reason is None and perf_counter() > self.deadline:
+            self.reason = "timeout"
+        return self.reason is not None
+
+    def check(self):
+        if self.exceeded():
+            raise QueryAborted(self.reason)
+
+
+def budget_for(path):
+    matches = [prefix for prefix in BUDGETS if path.startswith(prefix)]
+    return BUDGETS[max(matches, key=len)] if matches else DEFAULT_BUDGET
+
+
+def current_budget():
+    return _current.get()
+
+
+def check_budget():
+    budget = _current.get()
+    if budget is not None:
+        budget.check()
+
+
+def install_progress_handler(dbapi_conn):
+    """Abort SQLite statements on `dbapi_conn` when the current request's budget runs out."""
+    budget = _current.get()
+    if budget is None:
+        dbapi_conn.set_progress_handler(None, 0)
+    else:
+        dbapi_conn.set_progress_handler(budget.exceeded, PROGRESS_INTERVAL)
+
+
+def aborted(budget):
+    """The QueryAborted for an interrupted statement; counts it."""
+    ABORTED_QUERIES.labels(budget.reason).inc()
+    return QueryAborted(budget.reason)
+
+
+async def query_aborted_handler(request, exc):
+    return JSONResponse({"detail": DETAIL[exc.reason]}, status_code=STATUS[exc.reason])
+
+
+class CancellationMiddleware:
+    """
+    Pure ASGI middleware. Pumps `receive` in a background task so a disconnect is seen
+    while the handler is still running (even when it never reads the body); the app
+    reads the same messages from a queue.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = RequestBudget(budget_for(scope["path"]))
+        messages = asyncio.Queue()
+
+        async def pump():
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    budget.cancel("disconnect")
+                    return
+
+        token = _current.set(budget)
+        watcher = asyncio.create_task(pump())
+        try:
+            await self.app(scope, messages.get, send)
+        finally:
+            watcher.cancel()
+            _current.reset(token)
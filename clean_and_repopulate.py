@@ -1,15 +1,11 @@
-import pandas as pd
-import sqlite3
 import os
-import re
 
-import pandas as pd
-import sqlite3
-import os
-import re
+from decision_rules import RULES
+from keyword_classifier import KeywordClassifier
+from staged_rebuild import rebuild_database
 
 # Paths
-base_path = r"d:\Projects\mphasis\pci_project_all\api_dev"
+base_path = os.path.dirname(os.path.abspath(__file__))
 by_press_path = os.path.join(base_path, "final_by_press_with_er.csv")
 against_press_path = os.path.join(base_path, "final_against_press_with_level.csv")
 db_path = os.path.join(base_path, "complaints.db")
@@ -22,90 +18,53 @@ def normalize_decision(decision):
     """
     if not isinstance(decision, str):
         return "Other", str(decision)
-    
-    decision_lower = decision.lower()
-    
-    # Define Parent Categories
-    if any(x in decision_lower for x in ['upheld', 'censured', 'warned', 'admonished', 'directed']):
-        return "Upheld", decision
-    elif any(x in decision_lower for x in ['closed', 'dismissed']):
-        return "Closed", decision
-    elif any(x in decision_lower for x in ['disposed', 'settled']):
-        return "Disposed", decision
-    elif 'sub-judice' in decision_lower:
-        return "Sub-judice", decision
-    else:
-        return "Other", decision
+    return RULES.parent(decision), decision
+
+# Ordered rules: the first rule with a keyword in the lower-cased affiliation wins
+CATEGORY_RULES = [
+    ("Government", ['police','govt','government','ministry','department','magistrate','official','ias','ips']),
+    ("Political", ['bjp','congress','party','mla','mp','politician','leader']),
+    ("Media", ['editor','journalist','reporter','press','media','news','channel','paper']),
+    ("Professional", ['advocate','lawyer','legal','court']),
+    ("Professional", ['doctor','medical','hospital']),
+    ("Business", ['manager','owner','director','company','ltd','pvt','corporate']),
+    ("Civil Society", ['ngo','society','association','union','activist']),
+]
+OCCUPATION_RULES = [
+    ("Police", ['police','sho','dgp','sp']),
+    ("Official/Administrator", ['magistrate','dm','sdm','collector','commissioner','official','secretary']),
+    ("Politician", ['mla','mp','minister','politician','party','leader','worker']),
+    ("Judiciary", ['judge','court','judicial']),
+    ("Defence/Railways", ['railway','defence','army']),
+    ("Legal Professional", ['advocate','lawyer']),
+    ("Medical Professional", ['doctor','medical']),
+    ("Education", ['principal','teacher','professor','school','college']),
+    ("Journalist/Media", ['editor','journalist','reporter','correspondent']),
+    ("Business/Corporate", ['manager','owner','proprietor','director','business']),
+    ("Social Worker/Activist", ['activist','social worker','ngo']),
+]
+AFFILIATION_CLASSIFIER = KeywordClassifier({
+    "category": (CATEGORY_RULES, "Individual"),
+    "occupation": (OCCUPATION_RULES, "Other"),
+})
 
 def extract_category_occupation(affiliation):
     """
     Extracts a broad Category and a specific Occupation from the affiliation string.
     """
-    if not isinstance(affiliation, str):
-        return "Individual", "Other"
-    
-    aff_lower = affiliation.lower()
+    labels = AFFILIATION_CLASSIFIER.classify_one(affiliation)
+    return labels["category"], labels["occupation"]
 
-    # ----- CATEGORY -----
-    if any(x in aff_lower for x in ['police','govt','government','ministry','department','magistrate','official','ias','ips']):
-        category = "Government"
-    elif any(x in aff_lower for x in ['bjp','congress','party','mla','mp','politician','leader']):
-        category = "Political"
-    elif any(x in aff_lower for x in ['editor','journalist','reporter','press','media','news','channel','paper']):
-        category = "Media"
-    elif any(x in aff_lower for x in ['advocate','lawyer','legal','court']):
-        category = "Professional"
-    elif any(x in aff_lower for x in ['doctor','medical','hospital']):
-        category = "Professional"
-    elif any(x in aff_lower for x in ['manager','owner','director','company','ltd','pvt','corporate']):
-        category = "Business"
-    elif any(x in aff_lower for x in ['ngo','society','association','union','activist']):
-        category = "Civil Society"
-    else:
-        category = "Individual"
-
-    # ----- OCCUPATION -----
-    if any(x in aff_lower for x in ['police','sho','dgp','sp']):
-        occupation = "Police"
-    elif any(x in aff_lower for x in ['magistrate','dm','sdm','collector','commissioner','official','secretary']):
-        occupation = "Official/Administrator"
-    elif any(x in aff_lower for x in ['mla','mp','minister','politician','party','leader','worker']):
-        occupation = "Politician"
-    elif any(x in aff_lower for x in ['judge','court','judicial']):
-        occupation = "Judiciary"
-    elif any(x in aff_lower for x in ['railway','defence','army']):
-        occupation = "Defence/Railways"
-    elif any(x in aff_lower for x in ['advocate','lawyer']):
-        occupation = "Legal Professional"
-    elif any(x in aff_lower for x in ['doctor','medical']):
-        occupation = "Medical Professional"
-    elif any(x in aff_lower for x in ['principal','teacher','professor','school','college']):
-        occupation = "Education"
-    elif any(x in aff_lower for x in ['editor','journalist','reporter','correspondent']):
-        occupation = "Journalist/Media"
-    elif any(x in aff_lower for x in ['manager','owner','proprietor','director','business']):
-        occupation = "Business/Corporate"
-    elif 'activist' in aff_lower or 'social worker' in aff_lower or 'ngo' in aff_lower:
-        occupation = "Social Worker/Activist"
-    else:
-        occupation = "Other"
-
-    return category, occupation
+def add_category_occupation(df, aff_col, category_col, occupation_col):
+    """Vectorized extract_category_occupation over a whole column."""
+    labels = AFFILIATION_CLASSIFIER.classify(df[aff_col])
+    df[category_col] = labels["category"]
+    df[occupation_col] = labels["occupation"]
 
 # --- 2. Data Loading & Processing ---
+# The transforms are row-local: csv_ingest feeds them one chunk of the CSV at a time
 
-def process_data():
-    print("Loading CSVs...")
-    # Load CSVs with semicolon separator
-    df_against = pd.read_csv(against_press_path, sep=';', on_bad_lines='skip')
-    df_by = pd.read_csv(by_press_path, sep=';', on_bad_lines='skip')
-    
-    print(f"Loaded 'against': {len(df_against)} rows")
-    print(f"Loaded 'by': {len(df_by)} rows")
-    
-    # --- Process 'Against Press' ---
-    print("Processing 'Against Press' data...")
-    
+def transform_against(df_against):
     # 1. Use Resolved Columns (Overwrite raw columns or fillna)
     # Names
     df_against['Complainant'] = df_against['c_name_resolved'].fillna(df_against['Complainant'])
@@ -128,19 +87,13 @@ def process_data():
     
     # 4. Affiliations (Complainant & Accused) - Derived from the UPDATED Complainant_Aff/Against_Aff
     # Complainant
-    comp_aff_data = df_against['Complainant_Aff'].apply(extract_category_occupation)
-    df_against['Complainant_Category'] = comp_aff_data.apply(lambda x: x[0])
-    df_against['Complainant_Occupation'] = comp_aff_data.apply(lambda x: x[1])
+    add_category_occupation(df_against, 'Complainant_Aff', 'Complainant_Category', 'Complainant_Occupation')
     
     # Accused (Against_Aff)
-    acc_aff_data = df_against['Against_Aff'].apply(extract_category_occupation)
-    df_against['Accused_Category'] = acc_aff_data.apply(lambda x: x[0])
-    df_against['Accused_Occupation'] = acc_aff_data.apply(lambda x: x[1])
-    
-    
-    # --- Process 'By Press' ---
-    print("Processing 'By Press' data...")
-    
+    add_category_occupation(df_against, 'Against_Aff', 'Accused_Category', 'Accused_Occupation')
+    return df_against
+
+def transform_by(df_by):
     # 1. Use Resolved Columns
     # Names
     df_by['Complainant'] = df_by['c_name_resolved'].fillna(df_by['Complainant'])
@@ -160,25 +113,20 @@ def process_data():
     
     # 4. Affiliations - Derived from UPDATED columns
     # Complainant
-    comp_aff_data_by = df_by['Complainant_Aff'].apply(extract_category_occupation)
-    df_by['Complainant_Category'] = comp_aff_data_by.apply(lambda x: x[0])
-    df_by['Complainant_Occupation'] = comp_aff_data_by.apply(lambda x: x[1])
+    add_category_occupation(df_by, 'Complainant_Aff', 'Complainant_Category', 'Complainant_Occupation')
     
     # Accused
-    acc_aff_data_by = df_by['Against_Aff'].apply(extract_category_occupation)
-    df_by['Accused_Category'] = acc_aff_data_by.apply(lambda x: x[0])
-    df_by['Accused_Occupation'] = acc_aff_data_by.apply(lambda x: x[1])
+    add_category_occupation(df_by, 'Against_Aff', 'Accused_Category', 'Accused_Occupation')
+    return df_by
 
-    
-    # --- 3. Save to Database ---
-    print("Saving to database...")
-    conn = sqlite3.connect(db_path)
-    
-    # Replace existing tables
-    df_against.to_sql('against', conn, if_exists='replace', index=False)
-    df_by.to_sql('by', conn, if_exists='replace', index=False)
-    
-    conn.close()
+def process_data():
+    # Rebuild into a scratch database (chunked, typed CSV ingest, serving schema,
+    # indexes), then swap the new tables into complaints.db in one transaction so
+    # the API never sees a half-loaded table
+    rebuild_database(db_path, {
+        'against': (against_press_path, transform_against),
+        'by': (by_press_path, transform_by),
+    })
     print("Database updated successfully!")
 
 if __name__ == "__main__":
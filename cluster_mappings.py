@@ -0,0 +1,162 @@
+"""
+Fuzzy clustering of Against / affiliation spellings into mapping CSV suggestions.
+
+against_mappings.csv and affiliation_mappings.csv are curated by hand. This tool
+proposes new entries for them:
+
+    1. one GROUP BY over all source columns of both tables gives every distinct
+       original value (the *_backup copy once a normalizer ran) with its row count
+    2. values are reduced to the normalizers' lookup key (simple_norm) and clustered
+       with fuzzy_cluster.py: blocking by words and character 4-grams (blocks of more
+       than --max-block keys, e.g. "news", are skipped), rapidfuzz.process.cdist
+       scoring per block, and every key joining its most frequent match scoring
+       >= --threshold
+    3. the cluster's most frequent key's most common spelling becomes the canonical
+       (or the canonical the mapping file already gives a member)
+
+The output is in the mapping CSV format (normalized_key, suggested_canonical) plus
+count, score (against the cluster's key) and cluster_rows columns for review, the
+clusters ranked by the rows they would change. Keys already in the mapping file are
+left out. Review the file, then append the rows you keep to the mapping file; the
+loaders ignore the extra columns.
+
+Run: python cluster_mappings.py against|affiliations [path/to/complaints.db]
+         [--threshold 90] [--max-block 200] [--out FILE]
+"""
+import argparse
+import csv
+import sqlite3
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from rapidfuzz import fuzz
+
+import normalize_affiliations
+import normalize_against
+from build_indexes import quote
+from build_serving_schema import wide_columns, wide_source
+from fuzzy_cluster import MAX_BLOCK, blocks, cluster, match_form, match_pairs
+
+HERE = Path(__file__).resolve().parent
+DB_PATH = HERE / "complaints.db"
+TABLES = ["against", "by"]
+# target -> (source columns, normalizer module with simple_norm/load_mapping/MAPPING_CSV)
+TARGETS = {
+    "against": ([normalize_against.COLUMN], normalize_against),
+    "affiliations": (list(normalize_affiliations.COLS.values()), normalize_affiliations),
+}
+THRESHOLD = 90
+FIELDS = ["normalized_key", "suggested_canonical", "count", "score", "cluster_rows"]
+
+
+def distinct_values(conn, columns, tables=TABLES):
+    """{original value: rows} over `columns` of `tables`, in one GROUP BY."""
+    parts = []
+    for table in tables:
+        types = wide_columns(conn, table)
+        for col in columns:
+            source = f"{col}_backup" if f"{col}_backup" in types else col
+            if source in types:
+                parts.append(f"SELECT {quote(source)} AS value FROM {wide_source(conn, table)}")
+    if not parts:
+        return {}
+    return dict(conn.execute(f"""
+        SELECT value, COUNT(*) FROM ({" UNION ALL ".join(parts)})
+        WHERE value IS NOT NULL GROUP BY value
+    """).fetchall())
+
+
+def group_keys(values, norm):
+    """({key: rows}, {key: Counter of spellings}) for the non-empty lookup keys."""
+    rows = defaultdict(int)
+    spellings = defaultdict(Counter)
+    for value, count in values.items():
+        key = norm(value)
+        # load_mapping strips keys, so a key with outer spaces could never match
+        if key and key == key.strip():
+            rows[key] += count
+            spellings[key][" ".join(str(value).split())] += count
+    return rows, spellings
+
+
+def suggest(values, norm, mapping, threshold=THRESHOLD, max_block=MAX_BLOCK, log=print):
+    """Mapping rows (dicts with FIELDS) for the clusters of `values`, ranked."""
+    t0 = time.perf_counter()
+    rows, spellings = group_keys(values, norm)
+    keys = sorted(rows, key=lambda k: (-rows[k], k))
+    forms = [match_form(k) for k in keys]
+    kept, skipped = blocks(forms, max_block)
+    t1 = time.perf_counter()
+    pairs = match_pairs(forms, kept, threshold)
+    t2 = time.perf_counter()
+    # keys are sorted by rows: a lower index is a heavier key
+    root = cluster([-i for i in range(len(keys))], pairs)
+    log(f"  {len(values)} values, {len(keys)} keys, {len(kept)} blocks ({skipped} over {max_block} skipped), "
+        f"{len(pairs)} pairs >= {threshold}; blocking {t1 - t0:.1f}s, scoring {t2 - t1:.1f}s")
+
+    members = defaultdict(list)
+    for i, r in enumerate(root):
+        members[r].append(i)
+    clusters = []
+    for r, group in members.items():
+        if len(group) < 2:
+            continue
+        mapped = [mapping[keys[i]] for i in group if keys[i] in mapping]
+        canonical = mapped[0] if mapped else spellings[keys[r]].most_common(1)[0][0]
+        new = [i for i in group if keys[i] not in mapping]
+        if not new:
+            continue
+        total = sum(rows[keys[i]] for i in group)
+        changed = sum(rows[keys[i]] for i in new if i != r)
+        clusters.append((changed, [
+            {
+                "normalized_key": keys[i],
+                "suggested_canonical": canonical,
+                "count": rows[keys[i]],
+                "score": 100 if i == r else round(fuzz.ratio(forms[i], forms[r])),
+                "cluster_rows": total,
+            }
+            for i in new
+        ]))
+    clusters.sort(key=lambda c: -c[0])
+    log(f"  {len(clusters)} clusters with new keys")
+    return [row for _, entries in clusters for row in entries]
+
+
+def write_rows(rows, out):
+    with open(out, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("target", choices=sorted(TARGETS))
+    parser.add_argument("db", nargs="?", type=Path, default=DB_PATH)
+    parser.add_argument("--threshold", type=int, default=THRESHOLD, help="minimum rapidfuzz ratio (0-100)")
+    parser.add_argument("--max-block", type=int, default=MAX_BLOCK, help="skip blocks with more keys than this")
+    parser.add_argument("--out", type=Path, help="default: <target>_mapping_candidates.csv")
+    args = parser.parse_args()
+    if not args.db.exists():
+        print("DB not found:", args.db)
+        sys.exit(1)
+
+    columns, normalizer = TARGETS[args.target]
+    mapping = normalizer.load_mapping(normalizer.MAPPING_CSV)
+    out = args.out or HERE / f"{args.target}_mapping_candidates.csv"
+
+    conn = sqlite3.connect(args.db)
+    t0 = time.perf_counter()
+    values = distinct_values(conn, columns)
+    conn.close()
+    print(f"Clustering {', '.join(columns)} ({len(mapping)} keys already mapped)...")
+    rows = suggest(values, normalizer.simple_norm, mapping, args.threshold, args.max_block)
+    write_rows(rows, out)
+    print(f"Wrote {len(rows)} suggestions to {out} in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
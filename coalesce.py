@@ -0,0 +1,99 @@
+"""
+Single-flight request coalescing for expensive endpoints.
+
+    @router.get("/india_map")
+    @coalesce("research.india_map")
+    def india_map(...): ...
+
+Concurrent calls with the same endpoint name and the same (normalized) arguments
+share one execution: the first caller computes, the others wait for its result for
+at most PCI_COALESCE_WAIT_S seconds (default 30), then get a 503. Exceptions are
+shared as well, except when the leader was aborted because its own client went away
+(cancellation.py): its waiters then start over. Nothing is cached: once the
+computation finishes, the next call recomputes.
+
+Waiters are counted in pci_coalesced_requests_total{endpoint, result}.
+"""
+import functools
+import inspect
+import os
+import threading
+import time
+
+from fastapi import HTTPException, Response
+
+from cancellation import QueryAborted
+from database import data_version
+from metrics import COALESCED
+from timing import span
+
+WAIT_SECONDS = float(os.environ.get("PCI_COALESCE_WAIT_S", "30"))
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _share(result):
+    # FastAPI may attach background tasks to a returned Response; give each caller its own
+    if isinstance(result, Response):
+        clone = Response(content=result.body, status_code=result.status_code, media_type=result.media_type)
+        clone.raw_headers = list(result.raw_headers)
+        return clone
+    return result
+
+
+def coalesce(name, wait_seconds=None):
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        flights = {}
+        lock = threading.Lock()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            # Requests pinned to different snapshots never share a result
+            key = (data_version(), *sorted((k, repr(v)) for k, v in bound.arguments.items()))
+            deadline = time.monotonic() + (WAIT_SECONDS if wait_seconds is None else wait_seconds)
+
+            while True:
+                with lock:
+                    flight = flights.get(key)
+                    leader = flight is None
+                    if leader:
+                        flight = flights[key] = _Flight()
+                if leader:
+                    break
+
+                with span("coalesce_wait"):
+                    finished = flight.done.wait(max(deadline - time.monotonic(), 0))
+                if not finished:
+                    COALESCED.labels(name, "timeout").inc()
+                    raise HTTPException(status_code=503, detail="Identical request still in progress, retry later")
+                if isinstance(flight.error, QueryAborted) and flight.error.reason == "disconnect":
+                    continue
+                COALESCED.labels(name, "shared").inc()
+                if flight.error is not None:
+                    raise flight.error
+                return _share(flight.result)
+
+            try:
+                flight.result = fn(*args, **kwargs)
+                return _share(flight.result)
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with lock:
+                    del flights[key]
+                flight.done.set()
+
+        return wrapper
+
+    return decorator
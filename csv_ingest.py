@@ -0,0 +1,240 @@
+"""
+Streaming ingestion of the semicolon-delimited source CSVs into SQLite.
+
+`read_chunks(path)` walks the file once with the csv module and hands pandas
+CHUNK_ROWS records at a time, parsed with explicit dtypes (DTYPES: nullable ints,
+categoricals for the low-cardinality columns, text for everything else), so memory
+is bounded by the chunk size, not the file size. Records with more fields than the
+header are skipped and reported with their line number in an `IngestReport`, instead
+of vanishing through on_bad_lines='skip' (pandas' chunked C parser even truncates
+such a record silently when it starts a chunk). Short records are padded with NULLs,
+as read_csv does.
+
+`ingest_csv(conn, path, table, transform)` recreates `table` and bulk-inserts each
+transformed chunk with executemany, all in one transaction: readers see either the
+old table or the complete new one. `ingest_tables(conn, sources)` does the same for
+several tables at once: `transformed()` runs the (row-local) transforms of the chunks
+of all tables in a pool of WORKERS processes while this process, the only writer,
+inserts the results in order. Inputs that fit in one chunk per table are transformed
+in-process; starting the workers would cost more than it saves.
+
+    report = ingest_csv(conn, "final_by_press_with_er.csv", "by", transform_by)
+    print(report.summary())   # 1655 rows in 1 chunks, 0 bad lines skipped
+"""
+import csv
+import io
+import itertools
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+from build_indexes import quote
+
+CHUNK_ROWS = int(os.environ.get("PCI_INGEST_CHUNK_ROWS", "50000"))
+SEP = ";"
+# Bad lines listed in the report (all of them are counted)
+REPORTED_BAD_LINES = 20
+# Transform processes; chunks in flight are capped at twice this to bound memory
+WORKERS = int(os.environ.get("PCI_ETL_WORKERS", "0")) or os.cpu_count() or 1
+
+INT_COLUMNS = ["PrimaryKey", "Unnamed: 0"]
+CATEGORY_COLUMNS = ["ReportName", "State", "ComplaintType", "level"]
+DTYPES = defaultdict(
+    lambda: "str",
+    {**{c: "Int64" for c in INT_COLUMNS}, **{c: "category" for c in CATEGORY_COLUMNS}},
+)
+
+
+class IngestReport:
+    __slots__ = ("path", "rows", "chunks", "bad_count", "bad_lines", "seconds")
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.rows = 0
+        self.chunks = 0
+        self.bad_count = 0
+        self.bad_lines = []   # (line number, reason), the first REPORTED_BAD_LINES
+        self.seconds = 0.0
+
+    def bad(self, line, reason):
+        self.bad_count += 1
+        if len(self.bad_lines) < REPORTED_BAD_LINES:
+            self.bad_lines.append((line, reason))
+
+    def summary(self):
+        return f"{self.rows} rows in {self.chunks} chunks, {self.bad_count} bad lines skipped"
+
+    def print(self):
+        print(f"  {os.path.basename(self.path)}: {self.summary()} ({self.seconds:.2f}s)")
+        for line, reason in self.bad_lines:
+            print(f"    line {line}: {reason}")
+        if self.bad_count > len(self.bad_lines):
+            print(f"    ... and {self.bad_count - len(self.bad_lines)} more")
+
+
+def read_header(path):
+    """Column names as read_csv reports them (empty names become 'Unnamed: N')."""
+    return list(pd.read_csv(path, sep=SEP, nrows=0).columns)
+
+
+def empty_frame(path, dtypes=DTYPES, usecols=None):
+    return pd.read_csv(path, sep=SEP, nrows=0, dtype=dtypes, usecols=usecols)
+
+
+def _frame(buf, header, dtypes, usecols):
+    buf.seek(0)
+    return pd.read_csv(buf, sep=SEP, header=None, names=header, dtype=dtypes, usecols=usecols)
+
+
+def read_chunks(path, chunksize=CHUNK_ROWS, dtypes=DTYPES, usecols=None, report=None):
+    """Yield typed DataFrames of up to `chunksize` rows; bad lines go to `report`."""
+    header = read_header(path)
+    report = report if report is not None else IngestReport(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f, delimiter=SEP)
+        next(reader, None)
+        buf = io.StringIO()
+        writer = csv.writer(buf, delimiter=SEP, lineterminator="\n")
+        pending = 0
+        for record in reader:
+            if not record:
+                continue
+            if len(record) > len(header):
+                report.bad(reader.line_num, f"expected {len(header)} fields, saw {len(record)}")
+                continue
+            writer.writerow(record)
+            pending += 1
+            if pending == chunksize:
+                report.rows += pending
+                report.chunks += 1
+                yield _frame(buf, header, dtypes, usecols)
+                buf = io.StringIO()
+                writer = csv.writer(buf, delimiter=SEP, lineterminator="\n")
+                pending = 0
+        if pending:
+            report.rows += pending
+            report.chunks += 1
+            yield _frame(buf, header, dtypes, usecols)
+
+
+def sql_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
+def create_table(conn, table, df):
+    cols = ", ".join(f"{quote(c)} {sql_type(t)}" for c, t in df.dtypes.items())
+    conn.execute(f"DROP TABLE IF EXISTS {quote(table)}")
+    conn.execute(f"CREATE TABLE {quote(table)} ({cols})")
+
+
+def sql_rows(df):
+    """Rows of `df` as tuples of plain Python values (NULL for every kind of missing)."""
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+
+def insert_rows(conn, table, df):
+    cols = ", ".join(quote(c) for c in df.columns)
+    marks = ", ".join("?" * len(df.columns))
+    conn.executemany(f"INSERT INTO {quote(table)} ({cols}) VALUES ({marks})", sql_rows(df))
+
+
+@contextmanager
+def transaction(conn):
+    """Explicit BEGIN/COMMIT (ROLLBACK on error), DDL included."""
+    isolation = conn.isolation_level
+    conn.isolation_level = None
+    conn.execute("BEGIN")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.isolation_level = isolation
+
+
+def _apply(transform, chunk):
+    return chunk if transform is None else transform(chunk)
+
+
+def _interleave(iterators):
+    """(key, item) round-robin over {key: iterator} until all are exhausted."""
+    active = dict(iterators)
+    while active:
+        for key, it in list(active.items()):
+            item = next(it, None)
+            if item is None:
+                del active[key]
+            else:
+                yield key, item
+
+
+def transformed(streams, workers=WORKERS):
+    """
+    Yield (table, transform(chunk)) for `streams` ({table: (chunks, transform)}), the
+    chunks of each table in their input order. Transforms run in a process pool when
+    `workers` > 1 and some table has more than one chunk.
+    """
+    heads = {table: list(itertools.islice(chunks, 2)) for table, (chunks, _) in streams.items()}
+    rest = {table: itertools.chain(heads[table], chunks) for table, (chunks, _) in streams.items()}
+    if workers <= 1 or all(len(head) < 2 for head in heads.values()):
+        for table, chunks in rest.items():
+            for chunk in chunks:
+                yield table, _apply(streams[table][1], chunk)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for table, chunk in _interleave(rest):
+            pending.append((table, pool.submit(_apply, streams[table][1], chunk)))
+            if len(pending) >= 2 * workers:
+                table, future = pending.popleft()
+                yield table, future.result()
+        while pending:
+            table, future = pending.popleft()
+            yield table, future.result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def ingest_tables(conn, sources, chunksize=CHUNK_ROWS, workers=WORKERS):
+    """
+    Replace each table of `sources` ({table: (path, transform)}) with the transformed
+    rows of its CSV, all in one transaction; returns {table: IngestReport}.
+    """
+    reports = {table: IngestReport(path) for table, (path, _) in sources.items()}
+    streams = {
+        table: (read_chunks(path, chunksize, report=reports[table]), transform)
+        for table, (path, transform) in sources.items()
+    }
+    t0 = time.perf_counter()
+    with transaction(conn):
+        created = set()
+        for table, chunk in transformed(streams, workers):
+            if table not in created:
+                create_table(conn, table, chunk)
+                created.add(table)
+            insert_rows(conn, table, chunk)
+        for table, (path, transform) in sources.items():
+            if table not in created:
+                create_table(conn, table, _apply(transform, empty_frame(path)))
+    seconds = time.perf_counter() - t0
+    for report in reports.values():
+        report.seconds = seconds
+        report.print()
+    return reports
+
+
+def ingest_csv(conn, path, table, transform=None, chunksize=CHUNK_ROWS, workers=WORKERS):
+    """Replace `table` with the (transformed) rows of `path` in one transaction."""
+    return ingest_tables(conn, {table: (path, transform)}, chunksize, workers)[table]
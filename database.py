@@ -1,38 +1,275 @@
 # api_dev/database.py  (replace your current file)
 import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from sqlalchemy import create_engine, inspect
-from sqlalchemy.orm import sessionmaker
+from time import perf_counter
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import Session
+import metrics
+from cancellation import aborted, current_budget, install_progress_handler
+from slow_queries import slow_query_log
 
 logger = logging.getLogger("uvicorn.error")
 
 # Resolve complaints.db relative to this file so the path is deterministic
 HERE = Path(__file__).resolve().parent
-DB_PATH = HERE / "complaints.db"   # adjust if real file is in a different folder
 
-# Make DB_URL absolute and POSIX-style (works on Windows with sqlite:///)
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH.as_posix()}"
+# Published snapshots (publish_snapshot.py): <dir>/<name>.db plus a CURRENT file naming the live one
+SNAPSHOT_DIR = Path(os.environ.get("PCI_SNAPSHOT_DIR", HERE / "snapshots")).resolve()
+CURRENT_FILE = SNAPSHOT_DIR / "CURRENT"
+SNAPSHOT_POLL_S = float(os.environ.get("PCI_SNAPSHOT_POLL_S", "5"))
 
-# Create engine
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-)
 
-# Session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def current_snapshot_path():
+    """The snapshot CURRENT points to, or None when no snapshot has been published."""
+    try:
+        name = CURRENT_FILE.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    return (SNAPSHOT_DIR / name).resolve() if name else None
+
+
+def _initial_db_path():
+    # PCI_DB_PATH serves another file (e.g. a synthetic DB) and disables snapshots
+    if os.environ.get("PCI_DB_PATH"):
+        return Path(os.environ["PCI_DB_PATH"]).resolve()
+    return current_snapshot_path() or (HERE / "complaints.db").resolve()
+
+
+DB_PATH = _initial_db_path()
+
+
+# SQL statement counts and durations for /metrics, plus the slow query log.
+# Statements also run under the request's time budget (cancellation.py); the progress
+# handler stays installed while rows are fetched and is removed on checkin.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    install_progress_handler(cursor.connection)
+    conn.info.setdefault("query_start", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - conn.info["query_start"].pop()
+    metrics.observe_sql(statement, elapsed)
+    slow_query_log.maybe_record(cursor.connection, statement, parameters, elapsed, executemany)
+
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+    # The progress handler interrupted the statement: report why instead of a DB error
+    budget = current_budget()
+    if budget is not None and budget.reason is not None and "interrupted" in str(exception_context.original_exception):
+        raise aborted(budget)
+
+
+def _checkin(dbapi_connection, connection_record):
+    dbapi_connection.set_progress_handler(None, 0)
+
+
+def make_engine(path):
+    # Make DB_URL absolute and POSIX-style (works on Windows with sqlite:///)
+    engine = create_engine(
+        f"sqlite:///{Path(path).as_posix()}",
+        connect_args={"check_same_thread": False},
+    )
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    event.listen(engine, "checkin", _checkin)
+    return engine
+
+
+class Snapshot:
+    """One database file being served, and the requests currently pinned to it."""
+
+    __slots__ = ("path", "engine", "version", "requests")
+
+    def __init__(self, path, version, engine=None):
+        self.path = Path(path)
+        self.engine = engine or make_engine(self.path)
+        self.version = version
+        self.requests = 0
+
+
+_active = Snapshot(DB_PATH, 1)
+_pinned = ContextVar("snapshot", default=None)
+_swap_lock = threading.Lock()
+_draining = []
+_swap_callbacks = [slow_query_log.forget_row_counts]
 
 # Log what the app actually uses at import/startup
 logger.info("Using SQLite DB at: %s", DB_PATH)
 try:
-    inspector = inspect(engine)
+    inspector = inspect(_active.engine)
     logger.info("Tables available at startup: %s", inspector.get_table_names())
 except Exception as e:
     logger.exception("Failed to inspect DB: %s", e)
 
 
+def current_snapshot():
+    """The snapshot this request is pinned to, else the active one."""
+    return _pinned.get() or _active
+
+
+def get_engine():
+    return current_snapshot().engine
+
+
+def data_version():
+    """Increases by one on every snapshot swap; part of every derived cache key."""
+    return current_snapshot().version
+
+
+def on_swap(callback):
+    """Call `callback()` after every snapshot swap (to drop caches derived from the data)."""
+    _swap_callbacks.append(callback)
+    return callback
+
+
+@contextmanager
+def pinned_snapshot():
+    """Run the enclosed work against the snapshot active now, even if it is swapped meanwhile."""
+    if _pinned.get() is not None:
+        yield _pinned.get()
+        return
+    with _swap_lock:
+        snapshot = _active
+        snapshot.requests += 1
+    token = _pinned.set(snapshot)
+    try:
+        yield snapshot
+    finally:
+        _pinned.reset(token)
+        with _swap_lock:
+            snapshot.requests -= 1
+            drained = snapshot is not _active and snapshot.requests == 0
+        if drained:
+            _release(snapshot)
+
+
+def _release(snapshot):
+    with _swap_lock:
+        if snapshot not in _draining:
+            return
+        _draining.remove(snapshot)
+    snapshot.engine.dispose()
+    logger.info("Released snapshot %s (version %s)", snapshot.path, snapshot.version)
+
+
+def activate(path):
+    """
+    Serve `path` from now on. New requests use the new snapshot, requests in flight
+    finish on the old one, whose connections are closed once the last of them is done.
+    """
+    path = Path(path).resolve()
+    if not path.is_file():
+        raise FileNotFoundError(path)
+    candidate = make_engine(path)
+    # Refuse files the API cannot serve before any request sees them
+    with candidate.connect() as conn:
+        tables = set(inspect(conn).get_table_names())
+    missing = {"against", "by"} - tables
+    if missing:
+        candidate.dispose()
+        raise ValueError(f"{path} has no table(s) {sorted(missing)}")
+
+    global _active
+    with _swap_lock:
+        old = _active
+        snapshot = _active = Snapshot(path, old.version + 1, candidate)
+        _draining.append(old)
+        idle = old.requests == 0
+    for callback in _swap_callbacks:
+        callback()
+    if idle:
+        _release(old)
+    logger.info("Activated snapshot %s (version %s)", path, snapshot.version)
+    return snapshot
+
+
+def snapshot_status():
+    published = current_snapshot_path()
+    with _swap_lock:
+        return {
+            "path": str(_active.path),
+            "version": _active.version,
+            "requests": _active.requests,
+            "current_file": str(CURRENT_FILE),
+            "published": str(published) if published else None,
+            "draining": [{"path": str(s.path), "version": s.version, "requests": s.requests} for s in _draining],
+        }
+
+
+def file_version(path):
+    """PRAGMA user_version of `path` (staged_rebuild.py bumps it), None if it cannot be read."""
+    try:
+        with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+    except sqlite3.Error:
+        return None
+
+
+def _watch_current():
+    # React to CURRENT changing only, so a manual activate is not undone
+    seen = current_snapshot_path()
+    # A staged rebuild swaps tables inside the served file; reactivating it drops the caches
+    rebuilt = (_active.path, file_version(_active.path))
+    while True:
+        time.sleep(SNAPSHOT_POLL_S)
+        path = current_snapshot_path()
+        if not os.environ.get("PCI_DB_PATH") and path is not None and path != seen:
+            seen = path
+            if path != _active.path:
+                try:
+                    activate(path)
+                except Exception as e:
+                    logger.exception("Failed to activate published snapshot: %s", e)
+        active = _active.path
+        version = file_version(active)
+        if version is None:
+            continue
+        if rebuilt[0] == active and rebuilt[1] != version:
+            try:
+                activate(active)
+            except Exception as e:
+                logger.exception("Failed to reactivate rebuilt database: %s", e)
+        rebuilt = (active, version)
+
+
+def start_snapshot_watcher():
+    """
+    Poll CURRENT and activate newly published snapshots (not with PCI_DB_PATH), and
+    reactivate the served file after a staged rebuild of it.
+    """
+    if SNAPSHOT_POLL_S <= 0:
+        return None
+    thread = threading.Thread(target=_watch_current, name="snapshot-watcher", daemon=True)
+    thread.start()
+    return thread
+
+
+class SnapshotMiddleware:
+    """Pure ASGI middleware pinning each request to one snapshot for its whole duration."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with pinned_snapshot():
+            await self.app(scope, receive, send)
+
+
 def get_db():
-    db = SessionLocal()
+    db = Session(bind=get_engine(), autoflush=False)
     try:
         yield db
     finally:
@@ -0,0 +1,213 @@
+"""
+Versioned decision normalization rules (decision_rules.json) and their incremental apply.
+
+The raw `Decision` text of a complaint maps to
+
+    Decision_Parent    first parent rule with a keyword in the lower-cased decision
+    Decision_Specific  the cleaned decision: fragments and noise -> "Other", known
+                       spellings -> one canonical form (dict lookups + a few regexes)
+
+The rules are data: edit decision_rules.json and bump its "version". They are compiled
+once into hash lookups and regexes (`DecisionRules`); the loaders and
+clean_decision_specific.py call `RULES`.
+
+Applying a rule version does not rewrite the tables: the (Decision, Decision_Parent,
+Decision_Specific) combinations present are grouped, each distinct raw decision is
+mapped under the new rules, and only the rows of decisions whose stored labels differ
+are updated. The decision dimension and press profiles are refreshed only if rows
+changed. decision_rules_state records the version and rules hash applied per table.
+
+Run: python decision_rules.py [path/to/complaints.db] [--rules decision_rules.json]
+"""
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from build_dimensions import build_dimension
+from build_indexes import quote
+from build_press import build_press_profiles
+from build_serving_schema import ROW_ID, column_types, is_split, side_tables, wide_source
+from keyword_classifier import KeywordClassifier
+
+HERE = Path(__file__).resolve().parent
+DB_PATH = HERE / "complaints.db"
+RULES_PATH = HERE / "decision_rules.json"
+TABLES = ["against", "by"]
+STATE_TABLE = "decision_rules_state"
+MAP_TABLE = "temp.decision_map"
+
+
+class DecisionRules:
+    def __init__(self, spec):
+        self.version = spec["version"]
+        self.hash = hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+        parent = spec["parent"]
+        self._parent = KeywordClassifier({
+            "parent": ([(r["label"], r["keywords"]) for r in parent["rules"]], parent["default"]),
+        })
+
+        specific = spec["specific"]
+        self.default = specific["default"]
+        self._other_values = frozenset(specific["other_values"])
+        self._other_patterns = [re.compile(p) for p in specific["other_patterns"]]
+        self._fragments = specific["fragments"]
+        self._incomplete_suffix = specific["incomplete_suffix"]
+        self._incomplete_exceptions = tuple(specific["incomplete_exceptions"])
+        self._replace = specific["replace"]
+        self._canonical = specific["canonical"]
+
+    @classmethod
+    def from_file(cls, path=RULES_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def parent(self, decision):
+        return self._parent.classify_one(decision)["parent"]
+
+    def specific(self, value):
+        """Cleaned Decision_Specific for a raw value (None and non-text -> default)."""
+        if not isinstance(value, str):
+            return self.default
+        value = value.strip()
+        if not value:
+            return self.default
+        lower = value.lower()
+        if lower in self._other_values or any(p.match(lower) for p in self._other_patterns):
+            return self.default
+        if lower in self._fragments:
+            return self._fragments[lower]
+        # Cut-off values like "Dismissed of"
+        if value.endswith(self._incomplete_suffix) and not lower.startswith(self._incomplete_exceptions):
+            return self.default
+
+        for old, new in self._replace.items():
+            value = value.replace(old, new)
+        value = re.sub(r"\s+", " ", value).rstrip(".")
+        lower = value.lower()
+        if lower in self._canonical:
+            return self._canonical[lower]
+        if value and value[0].islower():
+            value = value[0].upper() + value[1:]
+        return value
+
+    def decide(self, decision):
+        """(Decision_Parent, Decision_Specific) for a raw Decision."""
+        return self.parent(decision), self.specific(decision)
+
+
+RULES = DecisionRules.from_file()
+
+
+def _decision_source(conn, table):
+    """Table holding the raw Decision column of `table` (itself or its raw side table)."""
+    if "Decision" in column_types(conn, table):
+        return table
+    raw = side_tables(table)["raw"]
+    if is_split(conn, table) and "Decision" in column_types(conn, raw):
+        return raw
+    return None
+
+
+def stale_decisions(conn, table, rules=RULES):
+    """{raw decision: (parent, specific)} for the decisions whose rows hold other labels."""
+    stale = {}
+    for decision, parent, specific in conn.execute(f"""
+        SELECT Decision, Decision_Parent, Decision_Specific FROM {wide_source(conn, table)}
+        GROUP BY 1, 2, 3
+    """):
+        labels = rules.decide(decision)
+        if labels != (parent, specific):
+            stale[decision] = labels
+    return stale
+
+
+def _update_rows(conn, table, source, mapping):
+    conn.execute(f"DROP TABLE IF EXISTS {MAP_TABLE}")
+    # Untyped so the keys compare like the stored Decision values
+    conn.execute("CREATE TEMP TABLE decision_map (decision PRIMARY KEY, parent, specific)")
+    conn.executemany(
+        f"INSERT INTO {MAP_TABLE} VALUES (?, ?, ?)",
+        ((d, p, s) for d, (p, s) in mapping.items()),
+    )
+    t = quote(table)
+    differs = f"({t}.Decision_Parent IS NOT m.parent OR {t}.Decision_Specific IS NOT m.specific)"
+    if source == table:
+        sql = f"""
+            UPDATE {t} SET Decision_Parent = m.parent, Decision_Specific = m.specific
+            FROM {MAP_TABLE} m WHERE {t}.Decision IS m.decision AND {differs}
+        """
+    else:
+        sql = f"""
+            UPDATE {t} SET Decision_Parent = m.parent, Decision_Specific = m.specific
+            FROM {quote(source)} r JOIN {MAP_TABLE} m ON r.Decision IS m.decision
+            WHERE r.{ROW_ID} = {t}.{ROW_ID} AND {differs}
+        """
+    changed = conn.execute(sql).rowcount
+    conn.execute(f"DROP TABLE {MAP_TABLE}")
+    return changed
+
+
+def _record_state(conn, table, rules, changed):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            table_name TEXT PRIMARY KEY, version INTEGER, rules_hash TEXT,
+            rows_changed INTEGER, applied_at TEXT
+        )
+    """)
+    applied = conn.execute(
+        f"SELECT version, rules_hash FROM {STATE_TABLE} WHERE table_name = ?", (table,)
+    ).fetchone()
+    if not changed and applied == (rules.version, rules.hash):
+        return
+    conn.execute(
+        f"INSERT OR REPLACE INTO {STATE_TABLE} VALUES (?, ?, ?, ?, datetime('now'))",
+        (table, rules.version, rules.hash, changed),
+    )
+
+
+def apply_rules(conn, tables=TABLES, rules=RULES):
+    """Bring Decision_Parent/Decision_Specific in line with `rules`; returns {table: rows changed}."""
+    changed = {}
+    with conn:
+        for table in tables:
+            source = _decision_source(conn, table)
+            cols = column_types(conn, table)
+            if source is None or "Decision_Parent" not in cols or "Decision_Specific" not in cols:
+                print(f"  {table}: no Decision columns, skipping")
+                continue
+            stale = stale_decisions(conn, table, rules)
+            changed[table] = _update_rows(conn, table, source, stale) if stale else 0
+            _record_state(conn, table, rules, changed[table])
+            print(f"  {table}: {len(stale)} decisions remapped, {changed[table]} rows updated "
+                  f"(rules v{rules.version}, {rules.hash})")
+        if any(changed.values()):
+            build_dimension(conn, "decision", tables)
+    if any(changed.values()) and all("press_id" in column_types(conn, t) for t in TABLES):
+        build_press_profiles(conn, TABLES)
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("db", nargs="?", type=Path, default=DB_PATH)
+    parser.add_argument("--rules", type=Path, default=RULES_PATH)
+    args = parser.parse_args()
+    if not args.db.exists():
+        print("DB not found:", args.db)
+        sys.exit(1)
+    rules = DecisionRules.from_file(args.rules)
+    conn = sqlite3.connect(args.db)
+    t0 = time.perf_counter()
+    apply_rules(conn, TABLES, rules)
+    conn.close()
+    print(f"Done in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+In-memory dictionary of the dimension tables built by build_dimensions.py.
+
+Routers translate filter labels to integer ids before querying and ids back to labels
+after grouping, so the aggregate queries only compare ints. The dimensions are small
+(a few thousand rows at most) and only change when the ETL runs, so they are loaded
+once per database snapshot and dropped when a new snapshot is activated.
+"""
+import threading
+
+from sqlalchemy import text
+
+from build_dimensions import DIMENSIONS
+from database import data_version, get_engine, on_swap
+from metrics import record_cache
+
+
+class Dimension:
+    def __init__(self, name, rows, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.rows = {row[0]: dict(zip(attrs, row[1:])) for row in rows}
+        # attr -> {value: [ids]}
+        self.index = {attr: {} for attr in attrs}
+        for id_, values in self.rows.items():
+            for attr, value in values.items():
+                self.index[attr].setdefault(value, []).append(id_)
+
+    def ids(self, value, attr="label"):
+        """Ids whose `attr` equals `value` (empty list for an unknown label)."""
+        return self.index[attr].get(value, [])
+
+    def label(self, id_, attr="label"):
+        row = self.rows.get(id_)
+        return row[attr] if row else None
+
+    def values(self, attr="label"):
+        return sorted(v for v in self.index[attr] if v is not None)
+
+
+class DimensionCache:
+    def __init__(self):
+        # snapshot version -> {name: Dimension}
+        self._dims = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        dims = {}
+        with get_engine().connect() as conn:
+            for name, spec in DIMENSIONS.items():
+                cols = ", ".join(["id"] + spec["attrs"])
+                rows = conn.execute(text(f"SELECT {cols} FROM {spec['table']}")).fetchall()
+                dims[name] = Dimension(name, rows, spec["attrs"])
+        return dims
+
+    def get(self, name):
+        version = data_version()
+        dims = self._dims.get(version)
+        record_cache("dimensions", dims is not None)
+        if dims is None:
+            with self._lock:
+                dims = self._dims.get(version)
+                if dims is None:
+                    dims = self._dims[version] = self._load()
+        return dims[name]
+
+    def clear(self):
+        with self._lock:
+            self._dims = {}
+
+
+dimensions = DimensionCache()
+on_swap(dimensions.clear)
+
+
+def id_filter(column, ids, param):
+    """
+    SQL condition and bind params restricting `column` to `ids`. An unknown label
+    yields no ids and therefore a condition that matches nothing.
+    """
+    if not ids:
+        return "1 = 0", {}
+    names = [f"{param}{i}" for i in range(len(ids))]
+    return f"{column} IN ({', '.join(':' + n for n in names)})", dict(zip(names, ids))
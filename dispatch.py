@@ -0,0 +1,95 @@
+"""
+Call router endpoint functions by name, outside of FastAPI's request handling.
+
+Used by POST /batch to run several widget queries in one request. Parameters are
+validated against the endpoint's own signature (types and Query(...) constraints),
+so a sub-query accepts exactly what the HTTP endpoint accepts. Endpoints that take a
+`db: Session` get the session passed in by the caller. Endpoints that render their
+own JSON (timing.json_response) return their content unrendered.
+"""
+import inspect
+from typing import Annotated
+
+from fastapi import HTTPException
+from fastapi.params import Depends as DependsParam
+from pydantic import TypeAdapter, ValidationError
+from pydantic.fields import FieldInfo
+from pydantic_core import PydanticUndefined
+
+from routers import complaints, locations, media, visualizations
+from timing import RenderedJSON
+
+# name -> endpoint function; JSON endpoints that read through the `db` session
+# (the research router queries the engine directly and cannot share a batch snapshot)
+ENDPOINTS = {
+    "complaints.list": complaints.list_complaints,
+    "complaints.stats": complaints.complaint_stats,
+    "complaints.filters": complaints.get_filters,
+    "locations.states": locations.cases_per_state,
+    "media.top": media.top_media_houses,
+    "media.trends": media.media_trends,
+    "media.profile": media.press_profile,
+    "visualizations.wordcloud": visualizations.wordcloud_data,
+    "visualizations.network": visualizations.network_data,
+}
+
+_adapters = {}
+
+
+def _parameters(fn):
+    """[(name, TypeAdapter or None for the db session, default)] for `fn`, cached."""
+    params = _adapters.get(fn)
+    if params is None:
+        params = []
+        for name, p in inspect.signature(fn).parameters.items():
+            if isinstance(p.default, DependsParam):
+                params.append((name, None, PydanticUndefined))
+                continue
+            annotation = p.annotation if p.annotation is not inspect.Parameter.empty else str
+            if isinstance(p.default, FieldInfo):
+                adapter = TypeAdapter(Annotated[annotation, p.default])
+                default = p.default.default
+            else:
+                adapter = TypeAdapter(annotation)
+                default = PydanticUndefined if p.default is inspect.Parameter.empty else p.default
+            params.append((name, adapter, default))
+        _adapters[fn] = params
+    return params
+
+
+def bind_params(fn, params, db=None):
+    """
+    Keyword arguments for `fn` from the raw `params` dict. Raises HTTPException(422)
+    for unknown, missing or invalid parameters, like FastAPI would.
+    """
+    known = _parameters(fn)
+    unknown = set(params) - {name for name, adapter, _ in known if adapter is not None}
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown parameters: {sorted(unknown)}")
+    kwargs = {}
+    errors = []
+    for name, adapter, default in known:
+        if adapter is None:
+            kwargs[name] = db
+        elif name in params:
+            try:
+                kwargs[name] = adapter.validate_python(params[name])
+            except ValidationError as e:
+                errors.extend(
+                    {"type": err["type"], "loc": ["params", name], "msg": err["msg"]} for err in e.errors()
+                )
+        elif default is PydanticUndefined:
+            errors.append({"type": "missing", "loc": ["params", name], "msg": "Field required"})
+        else:
+            kwargs[name] = default
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    return kwargs
+
+
+def call_endpoint(name, params, db=None):
+    fn = ENDPOINTS.get(name)
+    if fn is None:
+        raise HTTPException(status_code=404, detail=f"Unknown endpoint: {name}")
+    result = fn(**bind_params(fn, params, db))
+    return result.content if isinstance(result, RenderedJSON) else result
@@ -1,7 +1,15 @@
 import sqlite3
 import pandas as pd
+from pathlib import Path
 
-DB_PATH = 'complaints.db'
+DB_PATH = str(Path(__file__).resolve().parent / 'complaints.db')
+
+def fill_levels(conn):
+    """Set NULL `by`.level to 'unknown'; returns the number of rows updated."""
+    cursor = conn.cursor()
+    cursor.execute('UPDATE "by" SET level = \'unknown\' WHERE level IS NULL')
+    conn.commit()
+    return cursor.rowcount
 
 def fill_null_levels():
     print(f"Connecting to database: {DB_PATH}")
@@ -15,9 +23,7 @@ def fill_null_levels():
 
     if initial_nulls > 0:
         print("Updating NULL levels to 'unknown'...")
-        cursor.execute('UPDATE "by" SET level = "unknown" WHERE level IS NULL')
-        conn.commit()
-        print(f"Updated {cursor.rowcount} rows.")
+        print(f"Updated {fill_levels(conn)} rows.")
     else:
         print("No NULL levels found to update.")
 
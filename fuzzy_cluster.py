@@ -0,0 +1,90 @@
+"""
+Blocking, rapidfuzz scoring and clustering of name keys, shared by
+cluster_mappings.py (mapping CSV suggestions) and build_entities.py (entity ids).
+
+    forms = [match_form(k) for k in keys]        # keys sorted heaviest first
+    kept, skipped = blocks(forms)                # candidate groups sharing a word or 4-gram
+    pairs = match_pairs(forms, kept, 90)         # {(i, j): score} via process.cdist
+    root = cluster([-i for i in range(len(keys))], pairs)
+
+Only keys that share a word or character 4-gram are compared; blocks of more than
+MAX_BLOCK keys ("news", "police") say nothing and are skipped, which keeps the work
+near-linear in the number of keys. Clustering links every key to its highest-ranked
+match rather than merging connected components, which keeps each cluster centred on
+its most frequent key.
+"""
+from collections import defaultdict
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+MAX_BLOCK = 200
+NGRAM = 4
+STOPWORDS = frozenset({"the", "of", "and", "for", "in", "to", "a", "an", "on", "at", "by"})
+
+
+def match_form(key):
+    """What gets scored: the key without stopwords, tokens sorted."""
+    words = sorted(w for w in key.split() if w not in STOPWORDS)
+    return " ".join(words) or key
+
+
+def blocks(forms, max_block=MAX_BLOCK):
+    """(distinct blocks of >= 2 form indices sharing a word or n-gram, oversized blocks skipped)."""
+    index = defaultdict(list)
+    for i, form in enumerate(forms):
+        grams = {"w:" + w for w in form.split() if len(w) >= 3}
+        compact = form.replace(" ", "")
+        grams.update(compact[j:j + NGRAM] for j in range(len(compact) - NGRAM + 1))
+        for gram in grams:
+            index[gram].append(i)
+    kept = set()
+    skipped = 0
+    for members in index.values():
+        if len(members) > max_block:
+            skipped += 1
+        elif len(members) > 1:
+            kept.add(tuple(members))
+    return sorted(kept, key=len, reverse=True), skipped
+
+
+def codes_differ(a, b):
+    """True if forms `a` and `b` differ only in short tokens (initials, state codes: "mp" vs "up")."""
+    if a.replace(" ", "") == b.replace(" ", ""):
+        return False
+    left, right = set(a.split()), set(b.split())
+    only_a, only_b = left - right, right - left
+    return bool(only_a and only_b) and all(len(w) <= 3 for w in only_a | only_b)
+
+
+def match_pairs(forms, blocks, threshold):
+    """
+    {(i, j): score} (i < j) for the pairs of a block scoring >= threshold, except
+    those whose only difference is a short code.
+    """
+    pairs = {}
+    for members in blocks:
+        choices = [forms[i] for i in members]
+        scores = process.cdist(
+            choices, choices, scorer=fuzz.ratio, score_cutoff=threshold,
+            dtype=np.uint8, workers=-1,
+        )
+        for r, c in zip(*np.nonzero(np.triu(scores, 1))):
+            i, j = members[r], members[c]
+            if (i, j) not in pairs and not codes_differ(forms[i], forms[j]):
+                pairs[(i, j)] = int(scores[r, c])
+    return pairs
+
+
+def cluster(ranks, pairs):
+    """Root per index: each joins its highest-ranked match above itself, followed to the end."""
+    parent = list(range(len(ranks)))
+    for i, j in pairs:
+        hi, lo = (i, j) if ranks[i] > ranks[j] else (j, i)
+        if ranks[hi] > ranks[parent[lo]]:
+            parent[lo] = hi
+    # Ranks strictly increase along parent links, so there are no cycles
+    root = parent[:]
+    for i in sorted(range(len(ranks)), key=ranks.__getitem__, reverse=True):
+        root[i] = i if parent[i] == i else root[parent[i]]
+    return root
@@ -0,0 +1,248 @@
+"""
+Generate schema-identical synthetic copies of complaints.db at 10x/100x/1000x scale.
+
+The generator learns from the real database:
+- the joint distribution of (State, year, ComplaintType_Normalized, Decision_Parent,
+  Decision_Specific, Complainant_Category, Accused_Category) - sampled as whole rows,
+  so every correlation between those columns is preserved,
+- the press-name distribution conditioned on State (Against for 'against', Complainant for 'by'),
+- the Complaint text length distribution conditioned on ComplaintType_Normalized.
+
+Everything else (names, affiliations, raw columns) is copied from the sampled template row.
+A small fraction of press/complainant names get a numeric suffix so the number of
+distinct entities grows with the scale, as it would in real data.
+
+Output is deterministic for a given --seed.
+
+Run: python generate_synthetic_db.py --scale 10 100 1000
+"""
+import argparse
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+from build_serving_schema import ROW_ID, build_serving_schema, wide_columns, wide_source
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_SOURCE = HERE / "complaints.db"
+DEFAULT_OUT_DIR = HERE / "synthetic"
+TABLES = ["against", "by"]
+
+# Column holding the media house in each table (same convention as routers/research.py)
+PRESS_COL = {"against": "Against", "by": "Complainant"}
+# Columns whose values are re-labelled with a suffix at --novel-rate to grow cardinality
+NOVEL_COLS = {"against": ["Against", "Complainant"], "by": ["Complainant", "Against"]}
+
+CHUNK_ROWS = 50_000
+WORD_RE = re.compile(r"\S+")
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def load_table(conn, table):
+    # Read through the serving/text/raw split so the model sees every column
+    columns = list(wide_columns(conn, table))
+    select_cols = ", ".join(quote(c) for c in columns)
+    cur = conn.execute(f"SELECT {select_cols} FROM {wide_source(conn, table)} ORDER BY {ROW_ID}")
+    rows = cur.fetchall()
+    data = {col: np.empty(len(rows), dtype=object) for col in columns}
+    for i, row in enumerate(rows):
+        for col, val in zip(columns, row):
+            data[col][i] = val
+    return columns, data
+
+
+def conditional_sampler(keys, values):
+    """
+    Build {key: array of values} so that sampling uniformly from the array
+    reproduces the empirical P(value | key).
+    """
+    groups = {}
+    for k, v in zip(keys, values):
+        groups.setdefault(k, []).append(v)
+    return {k: np.array(v, dtype=object) for k, v in groups.items()}
+
+
+class TableModel:
+    """Empirical distributions learned from one source table."""
+
+    def __init__(self, table, columns, data):
+        self.table = table
+        self.columns = columns
+        self.data = data
+        self.n = len(data[columns[0]]) if columns else 0
+
+        # Press columns are resampled together from a donor row of the same State
+        self.press_cols = [c for c in (PRESS_COL[table], "Press") if c in data]
+        states = data.get("State")
+        if self.press_cols and states is not None:
+            self.press_given_state = conditional_sampler(states, np.arange(self.n))
+        else:
+            self.press_given_state = {}
+
+        ctypes = data.get("ComplaintType_Normalized")
+        texts = data.get("Complaint")
+        if texts is not None and ctypes is not None:
+            lengths = np.array([len(WORD_RE.findall(t)) if isinstance(t, str) else 0 for t in texts])
+            self.length_given_type = conditional_sampler(ctypes, lengths)
+        else:
+            self.length_given_type = {}
+
+    def summary(self):
+        return {
+            "rows": self.n,
+            "press_states": len(self.press_given_state),
+            "length_types": len(self.length_given_type),
+        }
+
+
+class Corpus:
+    """Word stream built from every Complaint text; synthetic texts are windows over it."""
+
+    def __init__(self, models):
+        words = []
+        for m in models:
+            for t in m.data.get("Complaint", []):
+                if isinstance(t, str):
+                    words.extend(WORD_RE.findall(t))
+        if not words:
+            words = ["complaint"]
+        self.words = words
+        self.size = len(words)
+
+    def text(self, start, length):
+        if length <= 0:
+            return None
+        start = start % self.size
+        end = start + length
+        if end <= self.size:
+            return " ".join(self.words[start:end])
+        return " ".join(self.words[start:] + self.words[: end - self.size])
+
+
+def synthesize_chunk(model, corpus, rng, count, start_pk, novel_rate):
+    """Return `count` synthetic rows (list of tuples in model.columns order)."""
+    idx = rng.integers(0, model.n, size=count)
+    out = {col: model.data[col][idx].copy() for col in model.columns}
+
+    # Press name | State
+    if model.press_given_state:
+        states = out["State"]
+        picks = rng.random(count)
+        donors = idx.copy()
+        for i in range(count):
+            choices = model.press_given_state.get(states[i])
+            if choices is not None:
+                donors[i] = choices[int(picks[i] * len(choices))]
+        for col in model.press_cols:
+            out[col] = model.data[col][donors]
+
+    # Grow entity cardinality with the scale
+    if novel_rate > 0:
+        for col in NOVEL_COLS[model.table]:
+            if col not in out:
+                continue
+            mask = rng.random(count) < novel_rate
+            suffixes = rng.integers(1, 10_000, size=count)
+            vals = out[col]
+            for i in np.flatnonzero(mask):
+                if isinstance(vals[i], str) and vals[i]:
+                    vals[i] = f"{vals[i]} {suffixes[i]}"
+
+    # Complaint text with length | ComplaintType_Normalized
+    if "Complaint" in out:
+        ctypes = out.get("ComplaintType_Normalized")
+        picks = rng.random(count)
+        starts = rng.integers(0, corpus.size, size=count)
+        texts = out["Complaint"]
+        for i in range(count):
+            lengths = model.length_given_type.get(ctypes[i] if ctypes is not None else None)
+            if lengths is None or texts[i] is None:
+                continue
+            texts[i] = corpus.text(int(starts[i]), int(lengths[int(picks[i] * len(lengths))]))
+
+    # Template keys would repeat `scale` times, so number the synthetic rows instead
+    if "PrimaryKey" in out:
+        out["PrimaryKey"] = np.arange(start_pk, start_pk + count, dtype=np.int64).astype(object)
+    if "Unnamed: 0" in out:
+        out["Unnamed: 0"] = np.arange(start_pk, start_pk + count, dtype=np.int64).astype(object)
+
+    cols = [out[c] for c in model.columns]
+    return [tuple(int(v) if isinstance(v, np.integer) else v for v in row) for row in zip(*cols)]
+
+
+def create_wide_tables(src, dst):
+    """Loader-shaped (unsplit) tables; build_serving_schema() splits them after the load."""
+    for table in TABLES:
+        col_defs = ", ".join(f"{quote(c)} {t}".rstrip() for c, t in wide_columns(src, table).items())
+        dst.execute(f"CREATE TABLE {quote(table)} ({col_defs})")
+
+
+def generate(source_path, out_path, scale, seed, novel_rate=0.05):
+    src = sqlite3.connect(source_path)
+    models = []
+    for table in TABLES:
+        columns, data = load_table(src, table)
+        models.append(TableModel(table, columns, data))
+    corpus = Corpus(models)
+
+    if out_path.exists():
+        out_path.unlink()
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    dst = sqlite3.connect(out_path)
+    dst.execute("PRAGMA journal_mode = OFF")
+    dst.execute("PRAGMA synchronous = OFF")
+    create_wide_tables(src, dst)
+    src.close()
+
+    rng = np.random.default_rng(seed)
+    for model in models:
+        target = model.n * scale
+        placeholders = ", ".join("?" * len(model.columns))
+        insert = f"INSERT INTO {quote(model.table)} VALUES ({placeholders})"
+        written = 0
+        t0 = time.perf_counter()
+        dst.execute("BEGIN")
+        while written < target:
+            count = min(CHUNK_ROWS, target - written)
+            rows = synthesize_chunk(model, corpus, rng, count, written, novel_rate)
+            dst.executemany(insert, rows)
+            written += count
+        dst.execute("COMMIT")
+        print(f"  {model.table}: {written} rows in {time.perf_counter() - t0:.1f}s ({model.summary()})")
+
+    # Same serving/text/raw split and indexes as the real database
+    build_serving_schema(dst)
+    dst.close()
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate scaled synthetic complaints databases")
+    parser.add_argument("--source", type=Path, default=DEFAULT_SOURCE, help="Real database to learn from")
+    parser.add_argument("--out-dir", type=Path, default=DEFAULT_OUT_DIR)
+    parser.add_argument("--scale", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--novel-rate", type=float, default=0.05,
+                        help="Fraction of press/complainant names turned into new entities")
+    args = parser.parse_args()
+
+    if not args.source.exists():
+        print("Source DB not found:", args.source)
+        return
+
+    for scale in args.scale:
+        out_path = args.out_dir / f"complaints_x{scale}.db"
+        print(f"Generating {out_path} (scale {scale}x, seed {args.seed})...")
+        generate(args.source, out_path, scale, args.seed + scale, args.novel_rate)
+        print(f"  size: {os.path.getsize(out_path) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
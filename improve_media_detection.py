@@ -1,10 +1,12 @@
-import pandas as pd
-import sqlite3
+import numpy as np
 import os
-import re
+
+from decision_rules import RULES
+from keyword_classifier import KeywordClassifier, keyword_pattern
+from staged_rebuild import rebuild_database
 
 # Paths
-base_path = r"d:\Projects\mphasis\pci_project_all\api_dev"
+base_path = os.path.dirname(os.path.abspath(__file__))
 by_press_path = os.path.join(base_path, "final_by_press_with_er.csv")
 against_press_path = os.path.join(base_path, "final_against_press_with_level.csv")
 db_path = os.path.join(base_path, "complaints.db")
@@ -27,156 +29,135 @@ INDIAN_MEDIA_BRANDS = [
     'scroll', 'wire', 'quint', 'newslaundry'
 ]
 
+MEDIA_PATTERN = keyword_pattern(MEDIA_KEYWORDS + INDIAN_MEDIA_BRANDS)
+
 def is_media_entity(text):
     if not isinstance(text, str):
         return False
-    t = text.lower()
-    return any(k in t for k in MEDIA_KEYWORDS) or any(b in t for b in INDIAN_MEDIA_BRANDS)
+    return MEDIA_PATTERN.search(text.lower()) is not None
+
+
+# Ordered rules: the first rule with a keyword in the lower-cased affiliation wins
+CATEGORY_RULES = [
+    ("Government", ['police','govt','government','ministry','department','ias','ips']),
+    ("Political", ['bjp','congress','party','mla','mp','politician']),
+    ("Media", MEDIA_KEYWORDS + INDIAN_MEDIA_BRANDS),
+    ("Professional", ['advocate','lawyer','court']),
+    ("Professional", ['doctor','medical','hospital']),
+    ("Business", ['company','ltd','pvt','corporate']),
+    ("Civil Society", ['ngo','society','association','activist']),
+]
+OCCUPATION_RULES = [
+    ("Police", ['police']),
+    ("Judiciary", ['judge','judicial']),
+    ("Legal Professional", ['advocate','lawyer']),
+    ("Journalist/Media", MEDIA_KEYWORDS + INDIAN_MEDIA_BRANDS),
+]
+AFFILIATION_CLASSIFIER = KeywordClassifier({
+    "category": (CATEGORY_RULES, "Individual"),
+    "occupation": (OCCUPATION_RULES, "Other"),
+})
+FORCED_MEDIA = ("Media", "Journalist/Media")
 
 
 def extract_category_occupation(affiliation, force_media=False):
     if force_media:
-        return "Media", "Journalist/Media"
-
-    if not isinstance(affiliation, str):
-        return "Individual", "Other"
-
-    aff = affiliation.lower()
-
-    # CATEGORY
-    if any(x in aff for x in ['police','govt','government','ministry','department','ias','ips']):
-        category = "Government"
-    elif any(x in aff for x in ['bjp','congress','party','mla','mp','politician']):
-        category = "Political"
-    elif is_media_entity(affiliation):
-        category = "Media"
-    elif any(x in aff for x in ['advocate','lawyer','court']):
-        category = "Professional"
-    elif any(x in aff for x in ['doctor','medical','hospital']):
-        category = "Professional"
-    elif any(x in aff for x in ['company','ltd','pvt','corporate']):
-        category = "Business"
-    elif any(x in aff for x in ['ngo','society','association','activist']):
-        category = "Civil Society"
-    else:
-        category = "Individual"
-
-    # OCCUPATION
-    if 'police' in aff:
-        occupation = "Police"
-    elif any(x in aff for x in ['judge','judicial']):
-        occupation = "Judiciary"
-    elif any(x in aff for x in ['advocate','lawyer']):
-        occupation = "Legal Professional"
-    elif is_media_entity(affiliation):
-        occupation = "Journalist/Media"
-    else:
-        occupation = "Other"
-
-    return category, occupation
+        return FORCED_MEDIA
+    labels = AFFILIATION_CLASSIFIER.classify_one(affiliation)
+    return labels["category"], labels["occupation"]
+
+
+def category_occupation(affiliations, force_media=None):
+    """Vectorized extract_category_occupation: DataFrame[category, occupation] per row."""
+    labels = AFFILIATION_CLASSIFIER.classify(affiliations)
+    if force_media is not None:
+        labels.loc[np.asarray(force_media, dtype=bool), ["category", "occupation"]] = FORCED_MEDIA
+    return labels
 
 
 def normalize_decision(decision):
     if not isinstance(decision, str):
         return "Other", str(decision)
-
-    d = decision.lower()
-    if any(x in d for x in ['upheld','censured','warned','admonished','directed']):
-        return "Upheld", decision
-    elif any(x in d for x in ['dismissed','closed']):
-        return "Closed", decision
-    elif any(x in d for x in ['disposed','settled']):
-        return "Disposed", decision
-    elif 'sub-judice' in d:
-        return "Sub-judice", decision
-    else:
-        return "Other", decision
+    return RULES.parent(decision), decision
 
 
 # --- 2. Processing ---
 
-def process_data():
-    df_against = pd.read_csv(against_press_path, sep=';', on_bad_lines='skip')
-    df_by = pd.read_csv(by_press_path, sep=';', on_bad_lines='skip')
+MEDIA_ACCUSED_TYPES = [
+    'Principles and Defamation',
+    'Principles and Publications',
+    'Paid News',
+    'Misleading Advertisements',
+    'Communal, Casteist, Anti National and Anti Religious Writings'
+]
 
-    # ---------------- AGAINST PRESS ----------------
-    df_against['Complainant'] = df_against['c_name_resolved'].fillna(df_against['Complainant'])
-    df_against['Against'] = df_against['a_name_resolved'].fillna(df_against['Against'])
-    df_against['Complainant_Aff'] = df_against['c_aff_resolved'].fillna(df_against['Complainant_Aff'])
-    df_against['Against_Aff'] = df_against['a_aff_resolved'].fillna(df_against['Against_Aff'])
+MEDIA_COMPLAINANT_TYPES = [
+    'Harassment of Newsmen',
+    'Facilities to the Press',
+    'Violence against Newsmen',
+    'Curtailment of Press Freedom'
+]
 
-    df_against['ComplaintType_Normalized'] = df_against['res_ComplaintType'].fillna(df_against['ComplaintType'])
 
-    dec = df_against['Decision'].apply(normalize_decision)
-    df_against['Decision_Parent'] = dec.apply(lambda x: x[0])
-    df_against['Decision_Specific'] = dec.apply(lambda x: x[1])
+def resolve_columns(df):
+    df['Complainant'] = df['c_name_resolved'].fillna(df['Complainant'])
+    df['Against'] = df['a_name_resolved'].fillna(df['Against'])
+    df['Complainant_Aff'] = df['c_aff_resolved'].fillna(df['Complainant_Aff'])
+    df['Against_Aff'] = df['a_aff_resolved'].fillna(df['Against_Aff'])
 
-    media_accused_types = [
-        'Principles and Defamation',
-        'Principles and Publications',
-        'Paid News',
-        'Misleading Advertisements',
-        'Communal, Casteist, Anti National and Anti Religious Writings'
-    ]
+    dec = df['Decision'].apply(normalize_decision)
+    df['Decision_Parent'] = dec.apply(lambda x: x[0])
+    df['Decision_Specific'] = dec.apply(lambda x: x[1])
 
-    df_against['force_accused_media'] = (
-        df_against['ComplaintType_Normalized'].isin(media_accused_types)
-        & (df_against['ComplaintType_Normalized'] != 'Suo-Motu')
-    )
 
-    df_against[['Complainant_Category','Complainant_Occupation']] = df_against.apply(
-        lambda r: extract_category_occupation(r['Complainant_Aff'], False),
-        axis=1, result_type='expand'
-    )
+# Both transforms are row-local: a batch of rows transforms the same way alone or
+# as part of the whole file (csv_ingest.py feeds chunks, pipeline.py appends new
+# ReportName batches)
+
+def transform_against(df_against):
+    df_against['ComplaintType_Normalized'] = df_against['res_ComplaintType'].fillna(df_against['ComplaintType'])
+    resolve_columns(df_against)
 
-    df_against[['Accused_Category','Accused_Occupation']] = df_against.apply(
-        lambda r: extract_category_occupation(r['Against_Aff'], r['force_accused_media']),
-        axis=1, result_type='expand'
+    force_accused_media = (
+        df_against['ComplaintType_Normalized'].isin(MEDIA_ACCUSED_TYPES)
+        & (df_against['ComplaintType_Normalized'] != 'Suo-Motu')
     )
 
-    df_against.drop(columns=['force_accused_media'], inplace=True)
+    df_against[['Complainant_Category','Complainant_Occupation']] = category_occupation(
+        df_against['Complainant_Aff']
+    ).to_numpy()
 
-    # ---------------- BY PRESS ----------------
-    df_by['Complainant'] = df_by['c_name_resolved'].fillna(df_by['Complainant'])
-    df_by['Against'] = df_by['a_name_resolved'].fillna(df_by['Against'])
-    df_by['Complainant_Aff'] = df_by['c_aff_resolved'].fillna(df_by['Complainant_Aff'])
-    df_by['Against_Aff'] = df_by['a_aff_resolved'].fillna(df_by['Against_Aff'])
+    df_against[['Accused_Category','Accused_Occupation']] = category_occupation(
+        df_against['Against_Aff'], force_accused_media
+    ).to_numpy()
+    return df_against
 
-    df_by['ComplaintType_Normalized'] = df_by['ComplaintType']
 
-    dec = df_by['Decision'].apply(normalize_decision)
-    df_by['Decision_Parent'] = dec.apply(lambda x: x[0])
-    df_by['Decision_Specific'] = dec.apply(lambda x: x[1])
-
-    media_complainant_types = [
-        'Harassment of Newsmen',
-        'Facilities to the Press',
-        'Violence against Newsmen',
-        'Curtailment of Press Freedom'
-    ]
+def transform_by(df_by):
+    df_by['ComplaintType_Normalized'] = df_by['ComplaintType']
+    resolve_columns(df_by)
 
-    df_by['force_complainant_media'] = (
-        df_by['ComplaintType_Normalized'].isin(media_complainant_types)
+    force_complainant_media = (
+        df_by['ComplaintType_Normalized'].isin(MEDIA_COMPLAINANT_TYPES)
         & (df_by['ComplaintType_Normalized'] != 'Suo-Motu')
     )
 
-    df_by[['Complainant_Category','Complainant_Occupation']] = df_by.apply(
-        lambda r: extract_category_occupation(r['Complainant_Aff'], r['force_complainant_media']),
-        axis=1, result_type='expand'
-    )
+    df_by[['Complainant_Category','Complainant_Occupation']] = category_occupation(
+        df_by['Complainant_Aff'], force_complainant_media
+    ).to_numpy()
 
-    df_by[['Accused_Category','Accused_Occupation']] = df_by.apply(
-        lambda r: extract_category_occupation(r['Against_Aff'], False),
-        axis=1, result_type='expand'
-    )
+    df_by[['Accused_Category','Accused_Occupation']] = category_occupation(
+        df_by['Against_Aff']
+    ).to_numpy()
+    return df_by
 
-    df_by.drop(columns=['force_complainant_media'], inplace=True)
 
-    # ---------------- SAVE ----------------
-    conn = sqlite3.connect(db_path)
-    df_against.to_sql('against', conn, if_exists='replace', index=False)
-    df_by.to_sql('by', conn, if_exists='replace', index=False)
-    conn.close()
+def process_data():
+    # Typed, chunked load into a scratch database, swapped into place in one transaction
+    rebuild_database(db_path, {
+        'against': (against_press_path, transform_against),
+        'by': (by_press_path, transform_by),
+    })
 
     print("Database updated successfully.")
 
@@ -0,0 +1,273 @@
+"""
+Background jobs for long renders and exports.
+
+POST /jobs queues a job and returns its id at once; a bounded pool of worker threads
+runs it and keeps the result as a file in PCI_JOB_DIR for PCI_JOB_TTL_S seconds.
+
+Kinds:
+    render  an image endpoint of /research (RENDERS), `params` are its query parameters
+    export  the rows of /complaints/list as CSV, `params` are its query parameters
+
+Queued jobs run lowest `priority` first, then in submission order. Each kind has a
+cap on concurrently running jobs (exports: PCI_JOB_EXPORT_SLOTS), so large exports
+cannot take every worker. Submitting beyond PCI_JOB_QUEUE queued jobs is refused
+with a 429. Jobs live in the process that accepted them.
+"""
+import csv
+import heapq
+import itertools
+import os
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from fastapi import HTTPException, Response
+from sqlalchemy import text
+
+from database import get_engine, pinned_snapshot
+from dispatch import bind_params
+from metrics import JOB_QUEUE_DEPTH, JOBS
+from routers import complaints, research
+
+JOB_WORKERS = int(os.environ.get("PCI_JOB_WORKERS", "2"))
+MAX_QUEUED = int(os.environ.get("PCI_JOB_QUEUE", "50"))
+JOB_TTL = float(os.environ.get("PCI_JOB_TTL_S", "900"))
+EXPORT_SLOTS = int(os.environ.get("PCI_JOB_EXPORT_SLOTS", "1"))
+JOB_DIR = Path(os.environ.get("PCI_JOB_DIR", Path(tempfile.gettempdir()) / "pci-jobs"))
+EXPORT_CHUNK = 5000
+
+RENDERS = {
+    "research.wordcloud": research.get_wordcloud,
+    "research.india_map": research.india_map,
+    "research.stacked_histogram": research.stacked_histogram,
+    "research.cdf_lineplot": research.cdf_lineplot,
+    "research.freq_line_plot": research.freq_lineplot,
+    "research.visualize_press": research.visualize_press,
+    "research.bubble_topk_press": research.bubble_topk_press,
+}
+EXPORTS = {"complaints.list": complaints.list_complaints}
+
+# kind -> default priority and cap on running jobs (None: all workers)
+KINDS = {
+    "render": {"priority": 5, "running": None},
+    "export": {"priority": 10, "running": EXPORT_SLOTS},
+}
+
+FINISHED = ("done", "failed", "cancelled")
+
+
+class Job:
+    __slots__ = (
+        "id", "kind", "endpoint", "params", "priority", "status", "error",
+        "created", "started", "finished", "path", "media_type", "filename", "size",
+    )
+
+    def __init__(self, kind, endpoint, params, priority):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.endpoint = endpoint
+        self.params = params
+        self.priority = priority
+        self.status = "queued"
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.path = None
+        self.media_type = None
+        self.filename = None
+        self.size = None
+
+    def expires(self):
+        return self.finished + JOB_TTL if self.finished else None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "endpoint": self.endpoint,
+            "priority": self.priority,
+            "status": self.status,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "expires": self.expires(),
+            "media_type": self.media_type,
+            "size": self.size,
+        }
+
+
+def _render(job, kwargs):
+    result = RENDERS[job.endpoint](**kwargs)
+    if not isinstance(result, Response):
+        raise TypeError(f"{job.endpoint} did not return a Response")
+    path = JOB_DIR / f"{job.id}.part"
+    path.write_bytes(result.body)
+    return path, result.media_type, None
+
+
+def _export(job, kwargs):
+    kwargs = {k: v for k, v in kwargs.items() if k != "db"}
+    query, params = complaints.list_query(**kwargs)
+    path = JOB_DIR / f"{job.id}.part"
+    with get_engine().connect() as conn, open(path, "w", newline="", encoding="utf-8") as f:
+        result = conn.execution_options(stream_results=True).execute(text(query), params)
+        writer = csv.writer(f)
+        writer.writerow(result.keys())
+        while rows := result.fetchmany(EXPORT_CHUNK):
+            writer.writerows(rows)
+    return path, "text/csv", f"{kwargs['table']}_complaints.csv"
+
+
+RUNNERS = {"render": (RENDERS, _render), "export": (EXPORTS, _export)}
+
+
+class JobManager:
+    def __init__(self, workers=JOB_WORKERS, max_queued=MAX_QUEUED):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._jobs = {}
+        self._queue = []  # heap of (priority, seq, job)
+        self._seq = itertools.count()
+        self._running = {kind: 0 for kind in KINDS}
+        self._kwargs = {}
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def submit(self, kind, endpoint, params, priority=None):
+        """Validate and queue a job. Raises HTTPException (404/422/429) like the endpoints."""
+        if kind not in RUNNERS:
+            raise HTTPException(status_code=422, detail=f"Unknown job kind: {kind}")
+        registry, _ = RUNNERS[kind]
+        if endpoint is None and len(registry) == 1:
+            endpoint = next(iter(registry))
+        fn = registry.get(endpoint)
+        if fn is None:
+            raise HTTPException(status_code=404, detail=f"Unknown {kind} endpoint: {endpoint}")
+        kwargs = bind_params(fn, params)
+        if kwargs.get("table") not in complaints.ALLOWED_TABLES:
+            raise HTTPException(status_code=400, detail="Invalid table name")
+
+        job = Job(kind, endpoint, params, KINDS[kind]["priority"] if priority is None else priority)
+        with self._cond:
+            self._sweep()
+            if len(self._queue) >= self.max_queued:
+                raise HTTPException(status_code=429, detail="Too many queued jobs, retry later")
+            self._jobs[job.id] = job
+            self._kwargs[job.id] = kwargs
+            heapq.heappush(self._queue, (job.priority, next(self._seq), job))
+            JOB_QUEUE_DEPTH.set(len(self._queue))
+            self._start_workers()
+            self._cond.notify()
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            self._sweep()
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found or expired")
+        return job
+
+    def list(self):
+        with self._cond:
+            self._sweep()
+            return sorted(self._jobs.values(), key=lambda j: j.created, reverse=True)
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or delete a finished one and its result."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail="Job not found or expired")
+            if job.status == "running":
+                raise HTTPException(status_code=409, detail="Job is running")
+            if job.status == "queued":
+                self._queue = [item for item in self._queue if item[2] is not job]
+                heapq.heapify(self._queue)
+                JOB_QUEUE_DEPTH.set(len(self._queue))
+                self._kwargs.pop(job.id, None)
+                job.status = "cancelled"
+                job.finished = time.time()
+                JOBS.labels(job.kind, job.status).inc()
+            self._forget(job)
+        return job
+
+    def _start_workers(self):
+        if self._threads:
+            return
+        JOB_DIR.mkdir(parents=True, exist_ok=True)
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _next(self):
+        # Highest priority job whose kind is below its running cap
+        for item in sorted(self._queue):
+            job = item[2]
+            cap = KINDS[job.kind]["running"]
+            if cap is None or self._running[job.kind] < cap:
+                self._queue.remove(item)
+                heapq.heapify(self._queue)
+                JOB_QUEUE_DEPTH.set(len(self._queue))
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next()
+                while job is None:
+                    # Wake up now and then to drop expired results
+                    self._cond.wait(timeout=60)
+                    self._sweep()
+                    job = self._next()
+                kwargs = self._kwargs.pop(job.id)
+                self._running[job.kind] += 1
+                job.status = "running"
+                job.started = time.time()
+            self._run(job, kwargs)
+
+    def _run(self, job, kwargs):
+        _, runner = RUNNERS[job.kind]
+        path = media_type = filename = error = None
+        try:
+            with pinned_snapshot():
+                part, media_type, filename = runner(job, kwargs)
+            path = part.with_suffix("")
+            os.replace(part, path)
+        except HTTPException as e:
+            error = {"status": e.status_code, "detail": e.detail}
+        except Exception as e:
+            error = {"status": 500, "detail": f"{type(e).__name__}: {e}"}
+        with self._cond:
+            self._running[job.kind] -= 1
+            job.finished = time.time()
+            if error is None:
+                job.status = "done"
+                job.path, job.media_type, job.filename = path, media_type, filename
+                job.size = path.stat().st_size
+            else:
+                job.status = "failed"
+                job.error = error
+                (JOB_DIR / f"{job.id}.part").unlink(missing_ok=True)
+            JOBS.labels(job.kind, job.status).inc()
+            # A slot of this kind is free again; a job held back by the cap may start
+            self._cond.notify_all()
+
+    def _sweep(self):
+        now = time.time()
+        for job in [j for j in self._jobs.values() if j.finished and j.expires() <= now]:
+            self._forget(job)
+
+    def _forget(self, job):
+        self._jobs.pop(job.id, None)
+        if job.path is not None:
+            job.path.unlink(missing_ok=True)
+
+
+job_manager = JobManager()
@@ -0,0 +1,72 @@
+"""
+Keyword rule engine for the category/occupation extraction of the loaders.
+
+A tier is an ordered list of (label, keywords) rules plus a default: the first rule
+with a keyword occurring anywhere in the lower-cased text wins, exactly like the
+`if any(x in text for x in [...]) ... elif ...` chains it replaces. Each rule's
+keywords are compiled into one alternation regex, and a whole column is classified
+at once: the rules are evaluated with `str.contains` over the distinct values only,
+precedence is resolved with `np.select`, and the labels are mapped back onto the rows.
+
+    AFFILIATION = KeywordClassifier({
+        "category": ([("Government", ["police", "govt"]), ...], "Individual"),
+        "occupation": ([("Police", ["police"]), ...], "Other"),
+    }, non_text={"category": "Individual", "occupation": "Other"})
+    AFFILIATION.classify(df["Complainant_Aff"])    # DataFrame[category, occupation]
+    AFFILIATION.classify_one("Times of India")     # {"category": ..., "occupation": ...}
+
+Non-string values (NaN, None, numbers) get `non_text` labels without being matched.
+verify_classifier.py checks the loaders' rule tables against golden output.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+
+def keyword_pattern(keywords):
+    """One regex matching any of `keywords` as a plain substring."""
+    return re.compile("|".join(re.escape(k) for k in keywords))
+
+
+class KeywordClassifier:
+    def __init__(self, tiers, non_text=None):
+        # tier -> ([(label, compiled pattern)], default)
+        self.tiers = {
+            name: ([(label, keyword_pattern(keywords)) for label, keywords in rules], default)
+            for name, (rules, default) in tiers.items()
+        }
+        self.non_text = non_text or {name: default for name, (_, default) in tiers.items()}
+
+    def classify_one(self, value):
+        if not isinstance(value, str):
+            return dict(self.non_text)
+        text = value.lower()
+        result = {}
+        for name, (rules, default) in self.tiers.items():
+            result[name] = next((label for label, pattern in rules if pattern.search(text)), default)
+        return result
+
+    def classify_distinct(self, values):
+        """DataFrame indexed by the distinct string `values`, one column per tier."""
+        values = pd.Index(pd.unique(np.asarray(values, dtype=object)))
+        lowered = pd.Series(values.str.lower(), index=values)
+        out = pd.DataFrame(index=values)
+        for name, (rules, default) in self.tiers.items():
+            conditions = [lowered.str.contains(pattern).to_numpy(dtype=bool) for _, pattern in rules]
+            labels = [label for label, _ in rules]
+            out[name] = np.select(conditions, labels, default=default) if rules else default
+        return out
+
+    def classify(self, series):
+        """DataFrame (same index as `series`) with one label column per tier."""
+        series = pd.Series(series)
+        is_text = series.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+        out = pd.DataFrame(index=series.index)
+        table = self.classify_distinct(series[is_text]) if is_text.any() else None
+        for name in self.tiers:
+            column = np.full(len(series), self.non_text[name], dtype=object)
+            if table is not None:
+                column[is_text] = series[is_text].map(table[name]).to_numpy(dtype=object)
+            out[name] = column
+        return out
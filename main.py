@@ -1,6 +1,10 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from routers import complaints, locations, media, visualizations, research
+from routers import complaints, locations, media, visualizations, research, admin, batch, jobs
+from timing import ServerTimingMiddleware
+from cancellation import CancellationMiddleware, QueryAborted, query_aborted_handler
+from database import SnapshotMiddleware, start_snapshot_watcher
+from metrics import MetricsMiddleware, render_latest
 
 app = FastAPI(title="PCI Complaints Analysis API")
 
@@ -10,14 +14,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(CancellationMiddleware)
+app.add_middleware(SnapshotMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+app.add_exception_handler(QueryAborted, query_aborted_handler)
+start_snapshot_watcher()
 
 app.include_router(complaints.router)
 app.include_router(locations.router)
 app.include_router(media.router)
 app.include_router(visualizations.router)
 app.include_router(research.router)
+app.include_router(batch.router)
+app.include_router(jobs.router)
+app.include_router(admin.router)
 
 @app.get("/")
 def root():
-    return {"message": "Welcome to PCI Complaints Analysis API"}
\ No newline at end of file
+    return {"message": "Welcome to PCI Complaints Analysis API"}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
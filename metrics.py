@@ -0,0 +1,142 @@
+"""
+Prometheus metrics for the API.
+
+- pci_http_request_duration_seconds   histogram per route/method/status
+- pci_http_requests_in_flight         gauge
+- pci_sql_statements_total            counter per statement kind (SELECT, PRAGMA, ...)
+- pci_sql_statement_duration_seconds  histogram per statement kind
+- pci_render_pool_busy_threads        threads of the sync-handler pool that are busy
+- pci_render_pool_queue_depth         requests waiting for a thread of that pool
+- pci_cache_requests_total            counter per cache/result (hit|miss)
+- pci_coalesced_requests_total        requests that waited on an identical in-flight one,
+                                      per endpoint/result (shared|timeout)
+- pci_jobs_total                      background jobs finished, per kind/status
+- pci_job_queue_depth                 background jobs waiting for a worker
+- pci_aborted_queries_total           statements interrupted per reason (timeout|disconnect)
+
+Cache hit ratio in PromQL:
+    sum by (cache) (rate(pci_cache_requests_total{result="hit"}[5m]))
+      / sum by (cache) (rate(pci_cache_requests_total[5m]))
+
+For several worker processes set PROMETHEUS_MULTIPROC_DIR to an empty directory
+before starting uvicorn; /metrics then aggregates across all workers.
+"""
+import os
+from time import perf_counter
+
+from anyio import to_thread
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+REQUEST_LATENCY = Histogram(
+    "pci_http_request_duration_seconds", "HTTP request latency",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+IN_FLIGHT = Gauge(
+    "pci_http_requests_in_flight", "HTTP requests currently being served",
+    multiprocess_mode="livesum",
+)
+SQL_STATEMENTS = Counter("pci_sql_statements_total", "SQL statements executed", ["statement"])
+SQL_DURATION = Histogram(
+    "pci_sql_statement_duration_seconds", "SQL statement execution time",
+    ["statement"], buckets=SQL_BUCKETS,
+)
+POOL_BUSY = Gauge(
+    "pci_render_pool_busy_threads", "Busy threads in the pool running sync handlers",
+    multiprocess_mode="livesum",
+)
+POOL_QUEUE = Gauge(
+    "pci_render_pool_queue_depth", "Requests waiting for a thread in the sync handler pool",
+    multiprocess_mode="livesum",
+)
+CACHE_REQUESTS = Counter("pci_cache_requests_total", "Cache lookups", ["cache", "result"])
+COALESCED = Counter(
+    "pci_coalesced_requests_total", "Requests that waited on an identical in-flight request",
+    ["endpoint", "result"],
+)
+JOBS = Counter("pci_jobs_total", "Background jobs finished", ["kind", "status"])
+ABORTED_QUERIES = Counter(
+    "pci_aborted_queries_total", "SQL statements interrupted by the request budget", ["reason"],
+)
+JOB_QUEUE_DEPTH = Gauge(
+    "pci_job_queue_depth", "Background jobs waiting for a worker",
+    multiprocess_mode="livesum",
+)
+
+
+def statement_kind(statement):
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else "UNKNOWN"
+
+
+def observe_sql(statement, seconds):
+    kind = statement_kind(statement)
+    SQL_STATEMENTS.labels(kind).inc()
+    SQL_DURATION.labels(kind).observe(seconds)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def sample_thread_pool():
+    """Must be called from the event loop thread."""
+    stats = to_thread.current_default_thread_limiter().statistics()
+    POOL_BUSY.set(stats.borrowed_tokens)
+    POOL_QUEUE.set(stats.tasks_waiting)
+
+
+def render_latest():
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency and in-flight requests per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        sample_thread_pool()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_FLIGHT.dec()
+            sample_thread_pool()
+            # Label by route template, never the raw path, to keep cardinality bounded
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(perf_counter() - start)
@@ -12,8 +12,13 @@ import sqlite3
 import csv
 import os
 from collections import Counter
+from pathlib import Path
 
-DB = r"d:\Projects\mphasis\pci_project_all\api_dev\complaints.db"
+from build_serving_schema import wide_columns
+from normalization_engine import apply_mapping
+
+HERE = Path(__file__).resolve().parent
+DB = str(HERE / "complaints.db")
 TABLES = ["against", "by"]
 COL = "ComplaintType_Normalized"
 BACKUP_COL = f"{COL}_backup"
@@ -59,7 +64,14 @@ def normalize_value(val):
         return None
     return CANONICAL_MAP.get(v, v)
 
+def canonical_stored_value(cur_val):
+    """Value to store for `cur_val`: written only when the normalized form differs from the trimmed one."""
+    source_val = (str(cur_val).strip() if cur_val is not None and str(cur_val).strip() != "" else None)
+    new_val = normalize_value(source_val) if source_val is not None else None
+    return new_val if source_val != new_val else cur_val
+
 def apply_inplace(conn, table):
+    """Normalize `table`; returns (rows updated, Counter of canonical labels)."""
     cur = conn.cursor()
     # ensure column exists
     cur.execute(f"PRAGMA table_info({table});")
@@ -68,7 +80,8 @@ def apply_inplace(conn, table):
         raise RuntimeError(f"Column {COL} not found in table {table}")
 
     # create backup column if missing and populate
-    if BACKUP_COL not in cols:
+    # The backup may already live in the <table>_raw side table (build_serving_schema.py)
+    if BACKUP_COL not in wide_columns(conn, table):
         print(f"Adding backup column {BACKUP_COL} to {table} and copying original values.")
         cur.execute(f"ALTER TABLE {table} ADD COLUMN {BACKUP_COL} TEXT;")
         cur.execute(f"UPDATE {table} SET {BACKUP_COL} = {COL};")
@@ -76,39 +89,21 @@ def apply_inplace(conn, table):
     else:
         print(f"Backup column {BACKUP_COL} already exists in {table} (skipping create).")
 
-    # determine pk for updates: prefer PrimaryKey if present, else use rowid
-    pk_col = None
-    if "PrimaryKey" in cols:
-        pk_col = "PrimaryKey"
-    else:
-        pk_col = "rowid"
-
-    print(f"Processing table {table} using PK {pk_col}")
+    print(f"Processing table {table}")
 
-    # fetch values to update
-    cur.execute(f"SELECT {pk_col}, {COL} FROM {table}")
-    rows = cur.fetchall()
+    # One normalization per distinct original (backup) value, applied with a single
+    # UPDATE ... FROM; re-running is idempotent
+    with conn:
+        updated = apply_mapping(conn, table, COL, canonical_stored_value, source=BACKUP_COL)
+    print(f"Updated {updated} rows in {table} (wrote only when value changed).")
 
-    update_stmt = f"UPDATE {table} SET {COL} = ? WHERE {pk_col} = ?"
     counts = Counter()
-    updated = 0
-
-    for pk, cur_val in rows:
-        source_val = (str(cur_val).strip() if cur_val is not None and str(cur_val).strip() != "" else None)
-        if source_val is None:
-            new_val = None
-        else:
-            new_val = normalize_value(source_val)
-        # only run update if different (avoids writing identical values)
-        if (source_val != new_val):
-            cur.execute(update_stmt, (new_val, pk))
-            updated += 1
-        if new_val:
-            counts[new_val] += 1
-
-    conn.commit()
-    print(f"Updated {updated} rows in {table} (wrote only when value changed).")
-    return counts
+    for label, cnt in cur.execute(f"""
+        SELECT TRIM({COL}), COUNT(*) FROM {table}
+        WHERE TRIM({COL}) <> '' GROUP BY TRIM({COL})
+    """):
+        counts[label] += cnt
+    return updated, counts
 
 def main():
     if not os.path.exists(DB):
@@ -125,7 +120,7 @@ def main():
         if cur.fetchone() is None:
             print(f"Table {t} not found, skipping.")
             continue
-        counts = apply_inplace(conn, t)
+        _, counts = apply_inplace(conn, t)
         total_counts.update(counts)
 
     # write out CSV of canonical counts after normalization
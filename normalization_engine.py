@@ -0,0 +1,108 @@
+"""
+Set-based column normalization shared by the normalize_* / clean_* scripts.
+
+Instead of selecting every row and issuing one UPDATE per changed row, a
+canonicalizer is called once per distinct value of the column. The old -> new pairs
+that differ are loaded into a temp table and applied with a single UPDATE ... FROM
+join, so the Python work is O(distinct values) and the row work stays inside SQLite.
+
+    with conn:
+        changed = apply_mapping(conn, "against", "Decision_Specific", clean_decision_specific)
+
+`canonicalize(value)` gets the stored value (None for NULL) and returns the new one;
+rows whose value maps to itself are not written. The caller owns the transaction.
+
+With `source=` the column is derived from another column instead of from itself,
+normally its `*_backup` copy of the original values (which may live in the
+`<table>_raw` side table): column = canonicalize(source). That is idempotent, so the
+pipeline can re-run a normalizer after rows were appended or its mapping changed.
+"""
+from build_indexes import quote
+
+MAP_TABLE = "temp.norm_map"
+
+
+def distinct_values(conn, table, column):
+    return [r[0] for r in conn.execute(f"SELECT DISTINCT {quote(column)} FROM {quote(table)}")]
+
+
+def build_mapping(values, canonicalize):
+    """{old: new} for the values whose canonical form differs."""
+    mapping = {}
+    for value in values:
+        new = canonicalize(value)
+        if new != value:
+            mapping[value] = new
+    return mapping
+
+
+def _source_table(conn, table, column):
+    """`table` or its raw side table (build_serving_schema.py), whichever has `column`."""
+    for name in (table, f"{table}_raw"):
+        if column in {r[1] for r in conn.execute(f"PRAGMA table_info({quote(name)})")}:
+            return name
+    raise ValueError(f"Column {column} not found in {table}")
+
+
+def apply_mapping(conn, table, column, canonicalize, values=None, source=None):
+    """
+    Rewrite `column` of `table` through `canonicalize`, evaluated once per distinct
+    value (or once per value of `values` when given). Returns the number of rows changed.
+    """
+    if source is not None:
+        return derive_column(conn, table, column, source, canonicalize)
+    if values is None:
+        values = distinct_values(conn, table, column)
+    mapping = build_mapping(values, canonicalize)
+    if not mapping:
+        return 0
+
+    col = quote(column)
+    changed = 0
+    # NULL never matches in a join; it gets its own UPDATE
+    if None in mapping:
+        cur = conn.execute(f"UPDATE {quote(table)} SET {col} = ? WHERE {col} IS NULL", (mapping.pop(None),))
+        changed += cur.rowcount
+    if mapping:
+        conn.execute(f"DROP TABLE IF EXISTS {MAP_TABLE}")
+        # No declared types: keys keep their storage class and compare like the column values
+        conn.execute("CREATE TEMP TABLE norm_map (old PRIMARY KEY, new)")
+        conn.executemany(f"INSERT INTO {MAP_TABLE} (old, new) VALUES (?, ?)", mapping.items())
+        cur = conn.execute(f"""
+            UPDATE {quote(table)} SET {col} = m.new
+            FROM {MAP_TABLE} m WHERE {quote(table)}.{col} = m.old
+        """)
+        changed += cur.rowcount
+        conn.execute(f"DROP TABLE {MAP_TABLE}")
+    return changed
+
+
+def derive_column(conn, table, column, source, canonicalize):
+    """Set `column` = canonicalize(`source`) where it differs; returns the rows changed."""
+    src_table = _source_table(conn, table, source)
+    mapping = {v: canonicalize(v) for v in distinct_values(conn, src_table, source)}
+    t, col, src = quote(table), quote(column), quote(source)
+    if src_table == table:
+        null_rows = f"{src} IS NULL"
+        join, match = "", f"{t}.{src} = m.old"
+    else:
+        null_rows = f"row_id IN (SELECT row_id FROM {quote(src_table)} WHERE {src} IS NULL)"
+        join, match = f"{quote(src_table)} s JOIN ", f"s.row_id = {t}.row_id"
+
+    changed = 0
+    if None in mapping:
+        new = mapping.pop(None)
+        cur = conn.execute(f"UPDATE {t} SET {col} = ? WHERE {null_rows} AND {col} IS NOT ?", (new, new))
+        changed += cur.rowcount
+    if mapping:
+        conn.execute(f"DROP TABLE IF EXISTS {MAP_TABLE}")
+        conn.execute("CREATE TEMP TABLE norm_map (old PRIMARY KEY, new)")
+        conn.executemany(f"INSERT INTO {MAP_TABLE} (old, new) VALUES (?, ?)", mapping.items())
+        on = f" ON s.{src} = m.old" if join else ""
+        cur = conn.execute(f"""
+            UPDATE {t} SET {col} = m.new
+            FROM {join}{MAP_TABLE} m{on} WHERE {match} AND {t}.{col} IS NOT m.new
+        """)
+        changed += cur.rowcount
+        conn.execute(f"DROP TABLE {MAP_TABLE}")
+    return changed
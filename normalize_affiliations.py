@@ -3,13 +3,17 @@ import csv
 import re
 from pathlib import Path
 
-DB = r"d:\Projects\mphasis\pci_project_all\api_dev\complaints.db"
+from build_serving_schema import wide_columns
+from normalization_engine import apply_mapping
+
+HERE = Path(__file__).resolve().parent
+DB = str(HERE / "complaints.db")
 TABLES = ["against", "by"]
 COLS = {
     "c": "c_aff_resolved",
     "a": "a_aff_resolved"
 }
-MAPPING_CSV = Path(r"d:\Projects\mphasis\pci_project_all\api_dev\affiliation_mappings.csv")
+MAPPING_CSV = HERE / "affiliation_mappings.csv"
 
 def simple_norm(s):
     if s is None:
@@ -43,6 +47,9 @@ def ensure_backup_column(cursor, table, col):
     backup_col = f"{col}_backup"
     cursor.execute(f"PRAGMA table_info({table});")
     cols = [c[1] for c in cursor.fetchall()]
+    if backup_col not in cols and backup_col in wide_columns(cursor.connection, table):
+        # Already moved to the <table>_raw side table by build_serving_schema.py
+        return backup_col
     if backup_col not in cols:
         cursor.execute(f"ALTER TABLE {table} ADD COLUMN \"{backup_col}\" TEXT;")
         print(f"Added backup column {backup_col} to {table}")
@@ -93,38 +100,20 @@ def update_table(conn, table, mapping):
         ensure_backup_column(cur, table, col)
     conn.commit()
 
-    # Select PK for iteration - try PrimaryKey, else rowid
-    cur.execute(f"PRAGMA table_info({table});")
-    schema = cur.fetchall()
-    cols = [c[1] for c in schema]
-    # We don't have a formal PK in the schema usually, so use rowid
-    pk = "rowid"
-
-    # Fetch all rows with the two columns and PK
-    cur.execute(f"SELECT {pk}, {COLS['c']}, {COLS['a']} FROM {table}")
-    rows = cur.fetchall()
-    total_rows = len(rows)
+    total_rows = cur.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
     print(f"Processing {table}: {total_rows} rows")
 
-    update_stmt = f"UPDATE {table} SET \"{COLS['c']}\" = ?, \"{COLS['a']}\" = ? WHERE {pk} = ?"
-    changed = 0
-
-    for row in rows:
-        rowid = row[0]
-        raw_c = row[1]
-        raw_a = row[2]
-        
-        new_c = canonicalize_value(raw_c, mapping) if raw_c is not None else raw_c
-        new_a = canonicalize_value(raw_a, mapping) if raw_a is not None else raw_a
+    # Canonicalize each distinct value once and rewrite both columns set-based
+    def canonical(raw):
+        return canonicalize_value(raw, mapping) if raw is not None else raw
 
-        # Only run update if something actually changes (string compare)
-        # We check against the RAW values we just fetched
-        if (raw_c != new_c) or (raw_a != new_a):
-            cur.execute(update_stmt, (new_c, new_a, rowid))
-            changed += 1
+    # Derived from the original (backup) values, so re-running is idempotent
+    changed = 0
+    with conn:
+        for col in COLS.values():
+            changed += apply_mapping(conn, table, col, canonical, source=f"{col}_backup")
 
-    conn.commit()
-    print(f"Updated {changed} rows in {table} (out of {total_rows})")
+    print(f"Updated {changed} values in {table} (out of {total_rows} rows)")
     return changed, total_rows
 
 def main():
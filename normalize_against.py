@@ -3,10 +3,13 @@ import csv
 import re
 from pathlib import Path
 
-DB = r"d:\Projects\mphasis\pci_project_all\api_dev\complaints.db"
+from normalization_engine import apply_mapping
+
+HERE = Path(__file__).resolve().parent
+DB = str(HERE / "complaints.db")
 TABLES = ["against", "by"]
 COLUMN = "Against"
-MAPPING_CSV = Path(r"d:\Projects\mphasis\pci_project_all\api_dev\against_mappings.csv")
+MAPPING_CSV = HERE / "against_mappings.csv"
 
 def simple_norm(s):
     """Normalize string for matching purposes"""
@@ -41,6 +44,12 @@ def ensure_backup_column(cursor, table, col):
     backup_col = f"{col}_backup"
     cursor.execute(f"PRAGMA table_info({table});")
     cols = [c[1] for c in cursor.fetchall()]
+    if backup_col not in cols:
+        # Already moved to the <table>_raw side table by build_serving_schema.py
+        # (checked directly: build_press.py imports this module)
+        cursor.execute(f'PRAGMA table_info("{table}_raw");')
+        if backup_col in [c[1] for c in cursor.fetchall()]:
+            return backup_col
     if backup_col not in cols:
         cursor.execute(f'ALTER TABLE {table} ADD COLUMN "{backup_col}" TEXT;')
         print(f"Added backup column {backup_col} to {table}")
@@ -85,33 +94,21 @@ def update_table(conn, table, mapping):
     cur = conn.cursor()
     
     # Ensure backup exists
-    ensure_backup_column(cur, table, COLUMN)
+    backup_col = ensure_backup_column(cur, table, COLUMN)
     conn.commit()
 
-    # Use rowid as primary key
-    pk = "rowid"
-
-    # Fetch all rows
-    cur.execute(f'SELECT {pk}, "{COLUMN}" FROM {table}')
-    rows = cur.fetchall()
-    total_rows = len(rows)
+    total_rows = cur.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
     print(f"Processing {table}: {total_rows} rows")
 
-    update_stmt = f'UPDATE {table} SET "{COLUMN}" = ? WHERE {pk} = ?'
-    changed = 0
+    # One canonicalization per distinct original (backup) value, applied with a
+    # single UPDATE ... FROM; re-running is idempotent
+    with conn:
+        changed = apply_mapping(
+            conn, table, COLUMN,
+            lambda raw: canonicalize_value(raw, mapping) if raw is not None else raw,
+            source=backup_col,
+        )
 
-    for row in rows:
-        rowid = row[0]
-        raw_value = row[1]
-        
-        new_value = canonicalize_value(raw_value, mapping) if raw_value is not None else raw_value
-
-        # Only update if something changed
-        if raw_value != new_value:
-            cur.execute(update_stmt, (new_value, rowid))
-            changed += 1
-
-    conn.commit()
     print(f"Updated {changed} rows in {table} (out of {total_rows})")
     return changed, total_rows
 
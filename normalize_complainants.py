@@ -1,15 +1,10 @@
 import sqlite3
 import pandas as pd
 
-DB_PATH = 'complaints.db'
+from build_entities import GENERIC_TITLES
+from build_serving_schema import ROW_ID, is_split, wide_source
 
-# List of generic titles to normalize
-GENERIC_TITLES = [
-    "Editor", "Chief Editor", "Publisher", "President", "General Secretary", 
-    "Manager", "editor", "Correspondent", "Reporter", "Journalist", "Secretary",
-    "Managing Editor", "Group Editor", "Resident Editor", "Executive Editor",
-    "Bureau Chief", "Staff Reporter", "City Editor", "News Editor", "Sub-Editor"
-]
+DB_PATH = 'complaints.db'
 
 def normalize_complainants():
     conn = sqlite3.connect(DB_PATH)
@@ -22,7 +17,10 @@ def normalize_complainants():
     # Fetch all rows where Complainant is in our generic list
     # We'll do this in python to be case-insensitive or flexible
     
-    cursor.execute('SELECT PrimaryKey, Complainant, Complainant_Aff FROM "by"')
+    # Complainant_Aff lives in by_raw once the serving schema is built; PrimaryKey is
+    # not unique, so rows are addressed by row_id (rowid on an unsplit table)
+    key = ROW_ID if is_split(conn, "by") else "rowid"
+    cursor.execute(f'SELECT {ROW_ID}, Complainant, Complainant_Aff FROM {wide_source(conn, "by")}')
     rows = cursor.fetchall()
     
     batch_updates = []
@@ -42,7 +40,7 @@ def normalize_complainants():
     
     if batch_updates:
         print(f"Found {len(batch_updates)} rows to update.")
-        cursor.executemany('UPDATE "by" SET Complainant = ? WHERE PrimaryKey = ?', batch_updates)
+        cursor.executemany(f'UPDATE "by" SET Complainant = ? WHERE {key} = ?', batch_updates)
         conn.commit()
         print(f"Successfully updated {cursor.rowcount} rows.")
     else:
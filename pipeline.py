@@ -0,0 +1,443 @@
+"""
+Staged, incremental ETL for complaints.db.
+
+Replaces running the loader and clean-up scripts by hand, in order, over the whole
+tables. The stages form a DAG (STAGES, listed in dependency order):
+
+    load                      CSVs -> against/by (improve_media_detection transforms)
+    normalize_against         Against column          (against_mappings.csv)
+    normalize_affiliations    c_/a_aff_resolved       (affiliation_mappings.csv)
+    normalize_complaint_type  ComplaintType_Normalized
+    decisions                 Decision_Parent/Specific (decision_rules.json)
+    by_level                  by.level from final_by_press_with_level.csv
+    fill_levels               by.level NULL -> 'unknown'
+    serving                   serving schema, dimensions, entities, duplicates, press
+                              tables, indexes
+
+A stage re-runs only if the content hash of one of its inputs (data files and the
+code that processes them) changed, or if a stage it depends on changed rows since its
+last run. The load stage hashes every ReportName batch of the CSVs: when only new
+batches appear they are appended to the existing tables; a changed or removed batch,
+or a change to the loader code, reloads that table.
+
+State lives in the database itself:
+
+    etl_stage_state   stage -> input hashes, upstream run ids, last run that changed rows
+    etl_stage_runs    one row per stage run: time, seconds, rows changed, table sizes
+    etl_batches       (table, ReportName) -> rows, content hash
+
+Run: python pipeline.py [path/to/complaints.db] [--dry-run] [--force [STAGE ...]] [--history]
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import improve_media_detection
+import normalise_complaintType
+import normalize_affiliations
+import normalize_against
+from build_indexes import quote
+from build_serving_schema import ROW_ID, build_serving_schema, column_types, is_split, side_tables
+from csv_ingest import IngestReport, ingest_tables, insert_rows, read_chunks, transaction, transformed
+from decision_rules import RULES_PATH, apply_rules
+from fill_null_levels import fill_levels
+from update_by_level_via_complainant import CSV_PATH as LEVEL_CSV, load_levels, update_levels
+
+HERE = Path(__file__).resolve().parent
+DB_PATH = HERE / "complaints.db"
+TABLES = ["against", "by"]
+STATE_TABLE = "etl_stage_state"
+RUNS_TABLE = "etl_stage_runs"
+BATCHES_TABLE = "etl_batches"
+BATCH_COLUMN = "ReportName"
+
+SOURCES = {
+    "against": (Path(improve_media_detection.against_press_path), improve_media_detection.transform_against),
+    "by": (Path(improve_media_detection.by_press_path), improve_media_detection.transform_by),
+}
+
+
+class Stage:
+    """`run(conn, changed)` returns (rows changed in the fact tables, detail or None)."""
+    __slots__ = ("name", "deps", "inputs", "run")
+
+    def __init__(self, name, deps, inputs, run):
+        self.name = name
+        self.deps = deps
+        self.inputs = [Path(p) for p in inputs]
+        self.run = run
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    except FileNotFoundError:
+        return "missing"
+    return h.hexdigest()[:16]
+
+
+def _key(path):
+    """Input name as stored in the state table (relative to the repo when possible)."""
+    try:
+        return path.resolve().relative_to(HERE).as_posix()
+    except ValueError:
+        return str(path)
+
+
+# --- load ---
+
+def batch_keys(chunk):
+    return chunk[BATCH_COLUMN].astype(object).where(chunk[BATCH_COLUMN].notna(), "")
+
+
+def scan_batches(path):
+    """{ReportName: (rows, hash)} over the raw CSV rows of each batch, streamed."""
+    report = IngestReport(path)
+    running = {}
+    for chunk in read_chunks(path, report=report):
+        header = "\x1f".join(chunk.columns).encode("utf-8")
+        row_hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        for name, positions in chunk.groupby(batch_keys(chunk), sort=False).indices.items():
+            h, rows = running.get(name) or (hashlib.sha256(header), 0)
+            h.update(row_hashes[positions].tobytes())
+            running[name] = (h, rows + len(positions))
+    return {name: (rows, h.hexdigest()[:16]) for name, (h, rows) in running.items()}, report
+
+
+def stored_batches(conn, table):
+    return {
+        name: (rows, digest) for name, rows, digest in conn.execute(
+            f"SELECT report_name, rows, hash FROM {BATCHES_TABLE} WHERE table_name = ?", (table,)
+        )
+    }
+
+
+def record_batches(conn, table, batches, replace):
+    if replace:
+        conn.execute(f"DELETE FROM {BATCHES_TABLE} WHERE table_name = ?", (table,))
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {BATCHES_TABLE} VALUES (?, ?, ?, ?, datetime('now'))",
+        [(table, name, rows, digest) for name, (rows, digest) in batches.items()],
+    )
+
+
+class _Reload(Exception):
+    pass
+
+
+def _target_column(chunk, column):
+    if column in chunk.columns:
+        return chunk[column]
+    base = column[:-len("_backup")] if column.endswith("_backup") else None
+    if base in chunk.columns:
+        # New rows have not been normalized yet: their backup is the value itself
+        return chunk[base]
+    return pd.Series(None, index=chunk.index, dtype=object)
+
+
+def append_chunks(conn, table, chunks):
+    """
+    Append transformed chunks to `table` (and its side tables once split) inside the
+    caller's transaction; returns the row count. Raises _Reload if the rows have
+    columns the table does not.
+    """
+    split = is_split(conn, table)
+    targets = [table, *side_tables(table).values()] if split else [table]
+    columns = {t: [c for c in column_types(conn, t) if c != ROW_ID] for t in targets}
+    known = set().union(*columns.values())
+    next_id = conn.execute(f"SELECT COALESCE(MAX({ROW_ID}), 0) + 1 FROM {quote(table)}").fetchone()[0] if split else None
+    rows = 0
+    for chunk in chunks:
+        if set(chunk.columns) - known:
+            raise _Reload()
+        for target, cols in columns.items():
+            if not cols:
+                continue
+            frame = pd.DataFrame({c: _target_column(chunk, c) for c in cols})
+            if split:
+                frame.insert(0, ROW_ID, range(next_id, next_id + len(chunk)))
+            insert_rows(conn, target, frame)
+        if split:
+            next_id += len(chunk)
+        rows += len(chunk)
+    return rows
+
+
+def run_load(conn, changed):
+    code_changed = changed is None or any(
+        not p.name.endswith(".csv") for p in changed
+    )
+    details = []
+    rows_changed = 0
+    reloads = {}
+    for table, (path, transform) in SOURCES.items():
+        batches, scan = scan_batches(path)
+        known = stored_batches(conn, table)
+        exists = bool(column_types(conn, table))
+        bad = f", {scan.bad_count} bad lines skipped" if scan.bad_count else ""
+
+        new = [name for name in batches if name not in known]
+        modified = [name for name in known if batches.get(name) != known[name] and name in batches]
+        removed = [name for name in known if name not in batches]
+        reload = code_changed or not exists or not known or modified or removed
+
+        if not reload and not new:
+            details.append(f"{table}: no new batches")
+            continue
+        if not reload:
+            wanted = set(new)
+            rows = (
+                chunk[keys.isin(wanted)].copy()
+                for chunk in read_chunks(path)
+                for keys in [batch_keys(chunk)]
+                if keys.isin(wanted).any()
+            )
+            chunks = (chunk for _, chunk in transformed({table: (rows, transform)}))
+            try:
+                with transaction(conn):
+                    count = append_chunks(conn, table, chunks)
+                    record_batches(conn, table, {n: batches[n] for n in new}, replace=False)
+                details.append(f"{table}: appended {len(new)} batches ({count} rows{bad})")
+                rows_changed += count
+                continue
+            except _Reload:
+                pass
+        if changed is None or not exists or not known:
+            why = "full load"
+        elif code_changed:
+            why = "loader changed"
+        else:
+            why = f"{len(modified)} changed / {len(removed)} removed batches"
+        reloads[table] = (batches, scan.rows, f"{table}: reloaded {scan.rows} rows ({why}{bad})")
+
+    if reloads:
+        # Reloaded tables are ingested together, their transforms in parallel
+        ingest_tables(conn, {table: SOURCES[table] for table in reloads})
+        with conn:
+            for table, (batches, rows, detail) in reloads.items():
+                record_batches(conn, table, batches, replace=True)
+                rows_changed += rows
+                details.append(detail)
+    return rows_changed, "; ".join(details)
+
+
+# --- clean-up stages ---
+
+def run_normalize_against(conn, changed):
+    mapping = normalize_against.load_mapping(normalize_against.MAPPING_CSV)
+    return sum(normalize_against.update_table(conn, table, mapping)[0] for table in TABLES), None
+
+
+def run_normalize_affiliations(conn, changed):
+    mapping = normalize_affiliations.load_mapping(normalize_affiliations.MAPPING_CSV)
+    return sum(normalize_affiliations.update_table(conn, table, mapping)[0] for table in TABLES), None
+
+
+def run_normalize_complaint_type(conn, changed):
+    return sum(normalise_complaintType.apply_inplace(conn, table)[0] for table in TABLES), None
+
+
+def run_decisions(conn, changed):
+    return sum(apply_rules(conn, TABLES).values()), None
+
+
+def run_by_level(conn, changed):
+    levels = load_levels(LEVEL_CSV)
+    if levels is None:
+        return 0, "level CSV unusable, skipped"
+    return update_levels(conn, levels), None
+
+
+def run_fill_levels(conn, changed):
+    return fill_levels(conn), None
+
+
+def run_serving(conn, changed):
+    build_serving_schema(conn, TABLES)
+    # Derived columns are reassigned on every row; nothing depends on this stage
+    return sum(table_rows(conn).values()), None
+
+
+STAGES = [
+    Stage("load", [], [
+        *(path for path, _ in SOURCES.values()),
+        HERE / "improve_media_detection.py", HERE / "keyword_classifier.py", HERE / "csv_ingest.py",
+    ], run_load),
+    Stage("normalize_against", ["load"], [
+        normalize_against.MAPPING_CSV, HERE / "normalize_against.py", HERE / "normalization_engine.py",
+    ], run_normalize_against),
+    Stage("normalize_affiliations", ["load"], [
+        normalize_affiliations.MAPPING_CSV, HERE / "normalize_affiliations.py", HERE / "normalization_engine.py",
+    ], run_normalize_affiliations),
+    Stage("normalize_complaint_type", ["load"], [
+        HERE / "normalise_complaintType.py", HERE / "normalization_engine.py",
+    ], run_normalize_complaint_type),
+    Stage("decisions", ["load"], [RULES_PATH, HERE / "decision_rules.py"], run_decisions),
+    Stage("by_level", ["load"], [LEVEL_CSV, HERE / "update_by_level_via_complainant.py"], run_by_level),
+    Stage("fill_levels", ["by_level"], [HERE / "fill_null_levels.py"], run_fill_levels),
+    Stage("serving", [
+        "normalize_against", "normalize_affiliations", "normalize_complaint_type",
+        "decisions", "fill_levels",
+    ], [
+        HERE / "build_serving_schema.py", HERE / "build_dimensions.py", HERE / "build_press.py",
+        HERE / "build_entities.py", HERE / "fuzzy_cluster.py", HERE / "build_duplicates.py",
+        HERE / "build_indexes.py", normalize_against.MAPPING_CSV,
+    ], run_serving),
+]
+
+
+# --- state ---
+
+def ensure_tables(conn):
+    with conn:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+                stage TEXT PRIMARY KEY, inputs TEXT, upstream TEXT,
+                last_run_id INTEGER, output_run_id INTEGER
+            )
+        """)
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {RUNS_TABLE} (
+                id INTEGER PRIMARY KEY, stage TEXT, started_at TEXT, seconds REAL,
+                rows_changed INTEGER, table_rows TEXT, status TEXT, detail TEXT
+            )
+        """)
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {BATCHES_TABLE} (
+                table_name TEXT, report_name TEXT, rows INTEGER, hash TEXT, loaded_at TEXT,
+                PRIMARY KEY (table_name, report_name)
+            )
+        """)
+
+
+def load_state(conn):
+    return {
+        stage: {"inputs": json.loads(inputs), "upstream": json.loads(upstream),
+                "last_run_id": last, "output_run_id": output}
+        for stage, inputs, upstream, last, output in conn.execute(
+            f"SELECT stage, inputs, upstream, last_run_id, output_run_id FROM {STATE_TABLE}"
+        )
+    }
+
+
+def table_rows(conn):
+    return {t: conn.execute(f"SELECT COUNT(*) FROM {quote(t)}").fetchone()[0]
+            for t in TABLES if column_types(conn, t)}
+
+
+def plan(stage, state, inputs, upstream, force):
+    """Why `stage` has to run (None if it is up to date) and the inputs that changed."""
+    prev = state.get(stage.name)
+    if force:
+        return "forced", None
+    if prev is None:
+        return "never run", None
+    changed = [k for k, h in inputs.items() if prev["inputs"].get(k) != h]
+    if changed:
+        return "inputs changed: " + ", ".join(changed), [HERE / k for k in changed]
+    deps = [d for d in stage.deps if prev["upstream"].get(d) != upstream.get(d)]
+    if deps:
+        return "upstream changed: " + ", ".join(deps), []
+    return None, None
+
+
+def run_pipeline(conn, force=(), dry_run=False):
+    """Run the stages that are out of date; returns False if a stage failed."""
+    ensure_tables(conn)
+    state = load_state(conn)
+    outputs = {name: s["output_run_id"] for name, s in state.items()}
+    pending = set()
+    for stage in STAGES:
+        inputs = {_key(p): file_hash(p) for p in stage.inputs}
+        upstream = {d: outputs.get(d) for d in stage.deps}
+        reason, changed = plan(stage, state, inputs, upstream, force == "all" or stage.name in force)
+        if reason is None and any(d in pending for d in stage.deps):
+            reason, changed = "upstream pending: " + ", ".join(d for d in stage.deps if d in pending), []
+        if reason is None:
+            print(f"[{stage.name}] up to date")
+            continue
+        print(f"[{stage.name}] {reason}")
+        if dry_run:
+            pending.add(stage.name)
+            continue
+
+        started = time.strftime("%Y-%m-%d %H:%M:%S")
+        t0 = time.perf_counter()
+        try:
+            rows_changed, detail = stage.run(conn, changed)
+        except Exception as exc:
+            conn.rollback()
+            with conn:
+                conn.execute(
+                    f"INSERT INTO {RUNS_TABLE} (stage, started_at, seconds, rows_changed, status, detail) "
+                    "VALUES (?, ?, ?, 0, 'failed', ?)",
+                    (stage.name, started, time.perf_counter() - t0, repr(exc)),
+                )
+            print(f"[{stage.name}] FAILED: {exc!r}")
+            return False
+        seconds = time.perf_counter() - t0
+        with conn:
+            run_id = conn.execute(
+                f"INSERT INTO {RUNS_TABLE} (stage, started_at, seconds, rows_changed, table_rows, status, detail) "
+                "VALUES (?, ?, ?, ?, ?, 'ok', ?)",
+                (stage.name, started, seconds, rows_changed, json.dumps(table_rows(conn)), detail),
+            ).lastrowid
+            # Downstream stages only re-run if this run changed rows
+            output = run_id if rows_changed else outputs.get(stage.name)
+            conn.execute(
+                f"INSERT OR REPLACE INTO {STATE_TABLE} VALUES (?, ?, ?, ?, ?)",
+                (stage.name, json.dumps(inputs), json.dumps(upstream), run_id, output),
+            )
+        outputs[stage.name] = output
+        print(f"[{stage.name}] {seconds:.2f}s, {rows_changed} rows changed" + (f" ({detail})" if detail else ""))
+    return True
+
+
+def print_history(conn, limit=20):
+    ensure_tables(conn)
+    rows = conn.execute(
+        f"SELECT id, stage, started_at, seconds, rows_changed, status, detail FROM {RUNS_TABLE} "
+        "ORDER BY id DESC LIMIT ?", (limit,)
+    ).fetchall()
+    for run_id, stage, started, seconds, rows_changed, status, detail in reversed(rows):
+        print(f"{run_id:5d} {started} {stage:26} {status:6} {seconds:8.2f}s {rows_changed:9d} rows  {detail or ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("db", nargs="?", type=Path, default=DB_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="only print which stages would run")
+    parser.add_argument("--force", nargs="*", metavar="STAGE",
+                        help="re-run these stages (all stages if none given)")
+    parser.add_argument("--history", action="store_true", help="print the last stage runs")
+    args = parser.parse_args()
+
+    names = {s.name for s in STAGES}
+    unknown = set(args.force or ()) - names
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))} (stages: {', '.join(s.name for s in STAGES)})")
+
+    conn = sqlite3.connect(args.db)
+    if args.history:
+        print_history(conn)
+        return
+    force = "all" if args.force == [] else set(args.force or ())
+    t0 = time.perf_counter()
+    ok = run_pipeline(conn, force, args.dry_run)
+    conn.close()
+    print(f"Done in {time.perf_counter() - t0:.2f}s")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
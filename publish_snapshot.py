@@ -0,0 +1,99 @@
+"""
+Publish an ETL result as a new database snapshot for the running API.
+
+Copies the database (default complaints.db) with SQLite's online backup API into
+snapshots/<name>.db, checks it, then points snapshots/CURRENT at it with an atomic
+rename. Running API processes pick it up within PCI_SNAPSHOT_POLL_S seconds, or at
+once via POST /admin/snapshot/activate. The source file can keep being rebuilt by
+the ETL afterwards; the API never reads it directly.
+
+Older snapshots beyond --keep are deleted (never the new one, nor the one it replaces,
+which may still be finishing requests).
+
+Run: python publish_snapshot.py [path/to/complaints.db] [--name NAME] [--keep 3]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from database import CURRENT_FILE, SNAPSHOT_DIR, current_snapshot_path
+
+HERE = Path(__file__).resolve().parent
+DB_PATH = HERE / "complaints.db"
+REQUIRED_TABLES = {"against", "by"}
+
+
+def copy_database(src_path, dst_path):
+    src = sqlite3.connect(f"file:{src_path.as_posix()}?mode=ro", uri=True)
+    dst = sqlite3.connect(dst_path)
+    try:
+        src.backup(dst)
+        ok = dst.execute("PRAGMA quick_check").fetchone()[0]
+        if ok != "ok":
+            raise RuntimeError(f"quick_check failed: {ok}")
+        tables = {r[0] for r in dst.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing = REQUIRED_TABLES - tables
+        if missing:
+            raise RuntimeError(f"missing tables: {sorted(missing)}")
+    finally:
+        src.close()
+        dst.close()
+
+
+def point_current(path):
+    tmp = CURRENT_FILE.with_name(CURRENT_FILE.name + ".tmp")
+    tmp.write_text(path.name + "\n", encoding="utf-8")
+    os.replace(tmp, CURRENT_FILE)
+
+
+def prune(keep, protect):
+    snapshots = sorted(SNAPSHOT_DIR.glob("*.db"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for path in snapshots[keep:]:
+        if path.resolve() in protect:
+            continue
+        try:
+            path.unlink()
+            print(f"  removed {path.name}")
+        except OSError as e:
+            # Still open by a server on a platform that locks open files
+            print(f"  kept {path.name}: {e}")
+
+
+def publish(src_path, name=None, keep=3):
+    src_path = Path(src_path).resolve()
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    name = name or time.strftime("complaints_%Y%m%dT%H%M%S")
+    target = SNAPSHOT_DIR / f"{name}.db"
+    if target.exists():
+        raise FileExistsError(target)
+    part = target.with_name(target.name + ".part")
+    part.unlink(missing_ok=True)
+
+    previous = current_snapshot_path()
+    copy_database(src_path, part)
+    os.replace(part, target)
+    point_current(target)
+    print(f"Published {target}")
+    prune(keep, {target.resolve()} | ({previous} if previous else set()))
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("db", nargs="?", type=Path, default=DB_PATH)
+    parser.add_argument("--name", help="snapshot name (default: complaints_<timestamp>)")
+    parser.add_argument("--keep", type=int, default=3, help="snapshots to keep, including the new one")
+    args = parser.parse_args()
+    if not args.db.exists():
+        print("DB not found:", args.db)
+        sys.exit(1)
+    t0 = time.perf_counter()
+    publish(args.db, args.name, max(args.keep, 2))
+    print(f"Done in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from database import SNAPSHOT_DIR, activate, current_snapshot_path, snapshot_status
+from slow_queries import slow_query_log
+
+ADMIN_TOKEN = os.environ.get("PCI_ADMIN_TOKEN")
+
+
+def require_admin(x_admin_token: str = Header(None)):
+    # Open in local development; set PCI_ADMIN_TOKEN to protect these endpoints
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)],
+    responses={404: {"description": "Not found"}},
+)
+
+@router.get("/slow_queries")
+def slow_queries(
+    limit: int = Query(50, ge=1, le=500),
+    full_scans_only: bool = False,
+    group_by_statement: bool = Query(False, description="Aggregate by statement text, slowest total first"),
+):
+    """
+    Statements slower than PCI_SLOW_QUERY_MS seen by this worker, with bound
+    parameters and EXPLAIN QUERY PLAN output. `full_scans` lists large tables
+    the plan scans without an index.
+    """
+    if group_by_statement:
+        items = slow_query_log.statements(limit, full_scans_only)
+    else:
+        items = slow_query_log.entries(limit, full_scans_only)
+    return {
+        "threshold_ms": slow_query_log.threshold * 1000,
+        "large_table_rows": slow_query_log.large_table_rows,
+        "queries": items,
+    }
+
+@router.delete("/slow_queries")
+def clear_slow_queries():
+    slow_query_log.clear()
+    return {"cleared": True}
+
+@router.get("/snapshot")
+def snapshot():
+    """The database snapshot being served, and older ones still finishing requests."""
+    return snapshot_status()
+
+@router.post("/snapshot/activate")
+def activate_snapshot(
+    name: str = Query(None, description="File in the snapshot directory; default: the one CURRENT points to"),
+):
+    """Switch the API to another snapshot without a restart; requests in flight finish on the old one."""
+    if name is None:
+        path = current_snapshot_path()
+        if path is None:
+            raise HTTPException(status_code=404, detail="No snapshot published")
+    else:
+        if os.path.basename(name) != name:
+            raise HTTPException(status_code=400, detail="Snapshot name must be a file name")
+        path = SNAPSHOT_DIR / name
+    try:
+        activate(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Snapshot not found: {path.name}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return snapshot_status()
@@ -0,0 +1,124 @@
+import contextvars
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+
+from database import get_engine
+from dispatch import ENDPOINTS, call_endpoint
+from timing import span
+
+router = APIRouter(
+    prefix="/batch",
+    tags=["batch"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Read connections used by one batch, and threads shared by all batches
+BATCH_CONNECTIONS = int(os.environ.get("PCI_BATCH_CONNECTIONS", "4"))
+BATCH_WORKERS = int(os.environ.get("PCI_BATCH_WORKERS", "8"))
+MAX_QUERIES = 20
+SNAPSHOT_RETRIES = 3
+
+_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+
+
+class SubQuery(BaseModel):
+    name: str = Field(..., description="Key of this result in the response")
+    endpoint: str = Field(..., description="One of GET /batch/endpoints, e.g. 'complaints.stats'")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Query parameters of the endpoint")
+
+
+class BatchRequest(BaseModel):
+    queries: List[SubQuery]
+
+
+def _data_version(dbapi_conn):
+    return dbapi_conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def _begin_read(dbapi_conn):
+    # pysqlite does not BEGIN before SELECTs; an explicit read transaction pins the snapshot
+    dbapi_conn.execute("BEGIN")
+    dbapi_conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+
+def open_snapshot(n):
+    """
+    `n` connections whose read transactions all see the same database state.
+    PRAGMA data_version of the first connection is read before any transaction starts
+    and again inside its own transaction, which starts last; if a commit landed in
+    between, the snapshots may differ and all transactions are restarted.
+    """
+    conns = [get_engine().connect() for _ in range(n)]
+    raw = [c.connection.dbapi_connection for c in conns]
+    try:
+        for _ in range(SNAPSHOT_RETRIES):
+            before = _data_version(raw[0])
+            for dbapi_conn in raw[1:] + raw[:1]:
+                _begin_read(dbapi_conn)
+            if _data_version(raw[0]) == before:
+                return conns
+            for dbapi_conn in raw:
+                dbapi_conn.rollback()
+        raise HTTPException(status_code=503, detail="Database kept changing; could not take a consistent snapshot")
+    except Exception:
+        for c in conns:
+            c.close()
+        raise
+
+
+@router.get("/endpoints")
+def batch_endpoints():
+    """Endpoint names accepted in a batch."""
+    return sorted(ENDPOINTS)
+
+
+@router.post("")
+def run_batch(batch: BatchRequest):
+    """
+    Run several named sub-queries (e.g. the widgets of the dashboard) concurrently
+    on a bounded set of read connections that share one database snapshot.
+    Each result is {"status": 200, "data": ...} or {"status": <code>, "error": ...};
+    one failing sub-query does not fail the batch.
+    """
+    queries = batch.queries
+    if not queries:
+        return {"results": {}}
+    if len(queries) > MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_QUERIES} queries per batch")
+    names = [q.name for q in queries]
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=400, detail="Query names must be unique")
+
+    with span("snapshot"):
+        conns = open_snapshot(min(len(queries), BATCH_CONNECTIONS))
+    sessions = queue.Queue()
+    for conn in conns:
+        sessions.put(Session(bind=conn))
+
+    def run(query):
+        session = sessions.get()
+        try:
+            return {"status": 200, "data": call_endpoint(query.endpoint, query.params, session)}
+        except HTTPException as e:
+            return {"status": e.status_code, "error": e.detail}
+        except Exception as e:
+            return {"status": 500, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            sessions.put(session)
+
+    try:
+        # Each task runs in a copy of this request's context, so spans land in its Server-Timing
+        futures = [_pool.submit(contextvars.copy_context().run, run, q) for q in queries]
+        results = {q.name: f.result() for q, f in zip(queries, futures)}
+    finally:
+        while not sessions.empty():
+            sessions.get().close()
+        for conn in conns:
+            conn.close()
+    return {"results": results}
@@ -2,6 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 from database import get_db
+from timing import json_response, span
+from serving import from_clause
+from dimensions import dimensions, id_filter
 
 router = APIRouter(
     prefix="/complaints",
@@ -11,28 +14,35 @@ router = APIRouter(
 
 ALLOWED_TABLES = ['against', 'by']
 
-@router.get("/list")
-def list_complaints(
-    state: str = None,
-    start_year: int = None,
-    end_year: int = None,
-    complaint_type: str = None,
-    decision_parent: str = None,
-    decision: str = None,
-    category: str = None,
-    table: str = Query(..., description="Table name: 'against' or 'by'"),
-    db: Session = Depends(get_db)
-):
+def list_query(table, state=None, start_year=None, end_year=None, complaint_type=None,
+               decision_parent=None, decision=None, category=None, include_text=True, include_raw=False):
+    """(SQL, params) selecting the rows of /complaints/list; also used by export jobs."""
     if table not in ALLOWED_TABLES:
         raise HTTPException(status_code=400, detail="Invalid table name")
 
-    query_str = f"SELECT * FROM {table} WHERE 1=1"
+    source = from_clause(table, include_text=include_text, include_raw=include_raw)
+    query_str = f"SELECT * FROM {source} WHERE 1=1"
     params = {}
     
+    # Dimension filters compare integer ids (see build_dimensions.py)
+    id_filters = []
     if state:
-        query_str += " AND State = :state"
-        params["state"] = state
-    
+        id_filters.append(("state_id", dimensions.get("state").ids(state), "state"))
+    if complaint_type:
+        id_filters.append(("type_id", dimensions.get("type").ids(complaint_type), "ctype"))
+    if decision_parent:
+        id_filters.append(("decision_id", dimensions.get("decision").ids(decision_parent, "parent"), "dparent"))
+    if decision:
+        id_filters.append(("decision_id", dimensions.get("decision").ids(decision, "specific"), "decision"))
+    if category:
+        cat_col = "complainant_category_id" if table == 'against' else "accused_category_id"
+        id_filters.append((cat_col, dimensions.get("category").ids(category), "cat"))
+
+    for column, ids, param in id_filters:
+        condition, id_params = id_filter(column, ids, param)
+        query_str += f" AND {condition}"
+        params.update(id_params)
+
     if start_year:
         query_str += " AND CAST(substr(ReportName, -4) AS INTEGER) >= :syear"
         params["syear"] = start_year
@@ -40,41 +50,45 @@ def list_complaints(
     if end_year:
         query_str += " AND CAST(substr(ReportName, -4) AS INTEGER) <= :eyear"
         params["eyear"] = end_year
-        
-    if complaint_type:
-        query_str += " AND ComplaintType_Normalized = :ctype"
-        params["ctype"] = complaint_type
-        
-    if decision_parent:
-        query_str += " AND Decision_Parent = :dparent"
-        params["dparent"] = decision_parent
-        
-    if decision:
-        query_str += " AND Decision_Specific = :decision"
-        params["decision"] = decision
-        
-    if category:
-        if table == 'against':
-            query_str += " AND Complainant_Category = :cat"
-        else:
-            query_str += " AND Accused_Category = :cat"
-        params["cat"] = category
-    
-    result = db.execute(text(query_str), params).mappings().all()
-    return {"data": [dict(row) for row in result]}
+    return query_str, params
+
+@router.get("/list")
+def list_complaints(
+    state: str = None,
+    start_year: int = None,
+    end_year: int = None,
+    complaint_type: str = None,
+    decision_parent: str = None,
+    decision: str = None,
+    category: str = None,
+    table: str = Query(..., description="Table name: 'against' or 'by'"),
+    include_text: bool = Query(True, description="Include the complaint text"),
+    include_raw: bool = Query(False, description="Include raw and backup columns"),
+    db: Session = Depends(get_db)
+):
+    query_str, params = list_query(
+        table, state, start_year, end_year, complaint_type, decision_parent, decision, category,
+        include_text, include_raw,
+    )
+    with span("db"):
+        result = db.execute(text(query_str), params).mappings().all()
+    with span("serialize"):
+        return json_response({"data": [dict(row) for row in result]})
 
 @router.get("/stats")
 def complaint_stats(
     start_year: int = None,
     end_year: int = None,
     table: str = Query(..., description="Table name: 'against' or 'by'"),
+    distinct_cases: bool = Query(False, description="Count near-duplicate complaints once (build_duplicates.py)"),
     db: Session = Depends(get_db)
 ):
     if table not in ALLOWED_TABLES:
         raise HTTPException(status_code=400, detail="Invalid table name")
 
+    count_expr = "COUNT(DISTINCT duplicate_group)" if distinct_cases else "COUNT(*)"
     # Total count
-    count_query = f"SELECT COUNT(*) as total FROM {table} WHERE 1=1"
+    count_query = f"SELECT {count_expr} as total FROM {table} WHERE 1=1"
     params = {}
     
     if start_year:
@@ -84,11 +98,12 @@ def complaint_stats(
         count_query += " AND CAST(substr(ReportName, -4) AS INTEGER) <= :eyear"
         params["eyear"] = end_year
         
-    total = db.execute(text(count_query), params).scalar()
+    with span("db"):
+        total = db.execute(text(count_query), params).scalar()
     
     # Yearly distribution
     year_query = f"""
-        SELECT substr(ReportName, -4) as year, COUNT(*) as count 
+        SELECT substr(ReportName, -4) as year, {count_expr} as count 
         FROM {table} 
         WHERE ReportName IS NOT NULL
     """
@@ -99,7 +114,8 @@ def complaint_stats(
         
     year_query += " GROUP BY year ORDER BY year"
     
-    yearly_data = db.execute(text(year_query), params).mappings().all()
+    with span("db"):
+        yearly_data = db.execute(text(year_query), params).mappings().all()
     
     return {
         "total_complaints": total,
@@ -122,59 +138,39 @@ def get_filters(db: Session = Depends(get_db)):
         "categories": set()
     }
 
-    for table in ALLOWED_TABLES:
-        # Years (extracted from ReportName)
-        years_query = f"SELECT DISTINCT substr(ReportName, -4) as year FROM {table} WHERE ReportName IS NOT NULL"
-        years_res = db.execute(text(years_query)).scalars().all()
-        for y in years_res:
-            if y and y.isdigit():
-                filters["years"].add(int(y))
-
-        # States
-        states_query = f"SELECT DISTINCT State FROM {table} WHERE State IS NOT NULL"
-        states_res = db.execute(text(states_query)).scalars().all()
-        filters["states"].update([s for s in states_res if s])
-
-        # Complaint Types (Normalized)
-        types_query = f"SELECT DISTINCT ComplaintType_Normalized FROM {table} WHERE ComplaintType_Normalized IS NOT NULL"
-        types_res = db.execute(text(types_query)).scalars().all()
-        filters["complaint_types"].update([t for t in types_res if t])
-
-        # Decisions (Specific)
-        decisions_query = f"SELECT DISTINCT Decision_Specific FROM {table} WHERE Decision_Specific IS NOT NULL"
-        decisions_res = db.execute(text(decisions_query)).scalars().all()
-        filters["decisions"].update([d for d in decisions_res if d])
-        
-        # Decisions (Parent)
-        decisions_p_query = f"SELECT DISTINCT Decision_Parent FROM {table} WHERE Decision_Parent IS NOT NULL"
-        decisions_p_res = db.execute(text(decisions_p_query)).scalars().all()
-        filters["decision_parents"].update([d for d in decisions_p_res if d])
-
-        # Affiliations (combine complainant and accused affiliations)
-        c_aff_query = f"SELECT DISTINCT c_aff_resolved FROM {table} WHERE c_aff_resolved IS NOT NULL"
-        a_aff_query = f"SELECT DISTINCT a_aff_resolved FROM {table} WHERE a_aff_resolved IS NOT NULL"
-        
-        c_aff_res = db.execute(text(c_aff_query)).scalars().all()
-        a_aff_res = db.execute(text(a_aff_query)).scalars().all()
+    # States, types, decisions and categories come from the dimension tables
+    filters["states"].update(dimensions.get("state").values())
+    filters["complaint_types"].update(dimensions.get("type").values())
+    filters["decisions"].update(dimensions.get("decision").values("specific"))
+    filters["decision_parents"].update(dimensions.get("decision").values("parent"))
+    filters["categories"].update(dimensions.get("category").values())
+
+    with span("db"):
+        for table in ALLOWED_TABLES:
+            # Years (extracted from ReportName)
+            years_query = f"SELECT DISTINCT substr(ReportName, -4) as year FROM {table} WHERE ReportName IS NOT NULL"
+            years_res = db.execute(text(years_query)).scalars().all()
+            for y in years_res:
+                if y and y.isdigit():
+                    filters["years"].add(int(y))
+
+            # Affiliations (combine complainant and accused affiliations)
+            c_aff_query = f"SELECT DISTINCT c_aff_resolved FROM {table} WHERE c_aff_resolved IS NOT NULL"
+            a_aff_query = f"SELECT DISTINCT a_aff_resolved FROM {table} WHERE a_aff_resolved IS NOT NULL"
         
-        filters["affiliations"].update([a for a in c_aff_res if a])
-        filters["affiliations"].update([a for a in a_aff_res if a])
+            c_aff_res = db.execute(text(c_aff_query)).scalars().all()
+            a_aff_res = db.execute(text(a_aff_query)).scalars().all()
         
-        # Occupations
-        if table == 'against':
-            occ_query = f"SELECT DISTINCT Complainant_Occupation FROM {table} WHERE Complainant_Occupation IS NOT NULL"
-        else:
-            occ_query = f"SELECT DISTINCT Accused_Occupation FROM {table} WHERE Accused_Occupation IS NOT NULL"
-        occ_res = db.execute(text(occ_query)).scalars().all()
-        filters["occupations"].update([o for o in occ_res if o])
+            filters["affiliations"].update([a for a in c_aff_res if a])
+            filters["affiliations"].update([a for a in a_aff_res if a])
         
-        # Categories
-        if table == 'against':
-            cat_query = f"SELECT DISTINCT Complainant_Category FROM {table} WHERE Complainant_Category IS NOT NULL"
-        else:
-            cat_query = f"SELECT DISTINCT Accused_Category FROM {table} WHERE Accused_Category IS NOT NULL"
-        cat_res = db.execute(text(cat_query)).scalars().all()
-        filters["categories"].update([c for c in cat_res if c])
+            # Occupations
+            if table == 'against':
+                occ_query = f"SELECT DISTINCT Complainant_Occupation FROM {table} WHERE Complainant_Occupation IS NOT NULL"
+            else:
+                occ_query = f"SELECT DISTINCT Accused_Occupation FROM {table} WHERE Accused_Occupation IS NOT NULL"
+            occ_res = db.execute(text(occ_query)).scalars().all()
+            filters["occupations"].update([o for o in occ_res if o])
 
     return {
         "years": sorted(list(filters["years"]), reverse=True),
@@ -186,3 +182,36 @@ def get_filters(db: Session = Depends(get_db)):
         "occupations": sorted(list(filters["occupations"])),
         "categories": sorted(list(filters["categories"]))
     }
+
+@router.get("/entity/{entity_id}")
+def entity_complaints(
+    entity_id: int,
+    include_text: bool = Query(False, description="Include the complaint text"),
+    db: Session = Depends(get_db)
+):
+    """
+    Every complaint involving one resolved person or organization (build_entities.py),
+    as complainant or accused, in both tables: indexed lookups on the entity id columns.
+    """
+    with span("db"):
+        entity = db.execute(
+            text("SELECT * FROM entities WHERE id = :id"), {"id": entity_id}
+        ).mappings().first()
+        if entity is None:
+            raise HTTPException(status_code=404, detail="Unknown entity")
+
+        complaints = {}
+        for table in ALLOWED_TABLES:
+            query = f"""
+                SELECT *, CASE WHEN complainant_entity_id = :id THEN 'complainant' ELSE 'accused' END AS role
+                FROM {from_clause(table, include_text=include_text)}
+                WHERE complainant_entity_id = :id OR accused_entity_id = :id
+                ORDER BY CAST(substr(ReportName, -4) AS INTEGER)
+            """
+            complaints[table] = db.execute(text(query), {"id": entity_id}).mappings().all()
+
+    with span("serialize"):
+        return json_response({
+            "entity": dict(entity),
+            "complaints": {table: [dict(row) for row in rows] for table, rows in complaints.items()},
+        })
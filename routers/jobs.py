@@ -0,0 +1,101 @@
+import asyncio
+import json
+from typing import Any, Dict, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from jobs import EXPORTS, FINISHED, RENDERS, job_manager
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+    responses={404: {"description": "Not found"}},
+)
+
+EVENTS_POLL_S = 0.5
+
+
+class JobRequest(BaseModel):
+    kind: Literal["render", "export"]
+    endpoint: Optional[str] = Field(None, description="One of GET /jobs/endpoints; optional for exports")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Query parameters of the endpoint")
+    priority: Optional[int] = Field(None, ge=0, le=20, description="Lower runs first (render 5, export 10)")
+
+
+def _view(job):
+    return {
+        **job.to_dict(),
+        "links": {
+            "status": f"/jobs/{job.id}",
+            "events": f"/jobs/{job.id}/events",
+            "result": f"/jobs/{job.id}/result",
+        },
+    }
+
+
+@router.get("/endpoints")
+def job_endpoints():
+    """Endpoint names accepted per job kind."""
+    return {"render": sorted(RENDERS), "export": sorted(EXPORTS)}
+
+
+@router.post("", status_code=202)
+def submit_job(request: JobRequest):
+    """
+    Queue a render or export and return its id immediately. Poll GET /jobs/{id}
+    or stream GET /jobs/{id}/events, then fetch GET /jobs/{id}/result.
+    """
+    job = job_manager.submit(request.kind, request.endpoint, request.params, request.priority)
+    return _view(job)
+
+
+@router.get("")
+def list_jobs(limit: int = Query(50, ge=1, le=500)):
+    """Jobs of this worker, newest first."""
+    return [_view(job) for job in job_manager.list()[:limit]]
+
+
+@router.get("/{job_id}")
+def job_status(job_id: str):
+    return _view(job_manager.get(job_id))
+
+
+@router.get("/{job_id}/result")
+def job_result(job_id: str):
+    job = job_manager.get(job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=409, detail={"status": job.status, "error": job.error})
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail={"status": job.status})
+    return FileResponse(job.path, media_type=job.media_type, filename=job.filename)
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events: one `status` event per change until the job finishes."""
+    job_manager.get(job_id)
+
+    async def stream():
+        last = None
+        while True:
+            try:
+                state = _view(job_manager.get(job_id))
+            except HTTPException:
+                yield 'event: status\ndata: {"status": "expired"}\n\n'
+                return
+            if state != last:
+                yield f"event: status\ndata: {json.dumps(state)}\n\n"
+                last = state
+            if state["status"] in FINISHED:
+                return
+            await asyncio.sleep(EVENTS_POLL_S)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.delete("/{job_id}")
+def delete_job(job_id: str):
+    """Cancel a queued job, or delete a finished job and its result."""
+    return job_manager.cancel(job_id).to_dict()
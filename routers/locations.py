@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 from database import get_db
+from timing import span
+from dimensions import dimensions
 
 router = APIRouter(
     prefix="/locations",
@@ -22,9 +24,9 @@ def cases_per_state(
         raise HTTPException(status_code=400, detail="Invalid table name")
         
     query_str = f"""
-        SELECT State, COUNT(*) as case_count
+        SELECT state_id, COUNT(*) as case_count
         FROM {table}
-        WHERE State IS NOT NULL
+        WHERE state_id IS NOT NULL
     """
     params = {}
     
@@ -35,7 +37,9 @@ def cases_per_state(
         query_str += " AND CAST(substr(ReportName, -4) AS INTEGER) <= :eyear"
         params["eyear"] = end_year
         
-    query_str += " GROUP BY State ORDER BY case_count DESC"
+    query_str += " GROUP BY state_id ORDER BY case_count DESC"
     
-    rows = db.execute(text(query_str), params).mappings().all()
-    return [{"state": row["State"], "count": row["case_count"]} for row in rows]
+    with span("db"):
+        rows = db.execute(text(query_str), params).mappings().all()
+    states = dimensions.get("state")
+    return [{"state": states.label(row["state_id"]), "count": row["case_count"]} for row in rows]
@@ -1,8 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import text
 from sqlalchemy.orm import Session
+import json
 import pandas as pd
 from database import get_db
+from timing import json_response, span
+from dimensions import dimensions, id_filter
+from build_press import MAPPING_CSV, canonical_press
+from normalize_against import load_mapping
 
 router = APIRouter(
     prefix="/media",
@@ -11,11 +16,15 @@ router = APIRouter(
 )
 
 ALLOWED_TABLES = ['against', 'by']
-ALLOWED_GROUP_COLS = ["res_ComplaintType", "State", "level"] # Updated to match schema if needed, checking main.py it was res_ComplaintType but let's stick to what's likely in DB or alias it.
-# main.py uses "ComplaintType" as default in visualize_press but checks against ["res_ComplaintType", "State", "level"]
-# Let's assume the column name in DB is what we pass, or we map it.
-# In main.py: query = f"SELECT Press, {group_col}, ReportName FROM {table} WHERE Press IS NOT NULL"
-# So group_col must be a valid column.
+ALLOWED_GROUP_COLS = ["res_ComplaintType", "State", "level"]
+
+# Same canonicalization the ETL applied to press_name (build_press.py)
+PRESS_MAPPING = load_mapping(MAPPING_CSV)
+
+def press_ids(press_name):
+    """dim_press ids for a press name as typed by the user (raw or canonical spelling)."""
+    press = dimensions.get("press")
+    return press.ids(press_name) or press.ids(canonical_press(press_name, PRESS_MAPPING))
 
 @router.get("/top")
 def top_media_houses(
@@ -26,16 +35,19 @@ def top_media_houses(
     if table not in ALLOWED_TABLES:
         raise HTTPException(status_code=400, detail="Invalid table name")
         
-    query_str = f"""
-        SELECT Press, COUNT(*) as count
-        FROM {table}
-        WHERE Press IS NOT NULL
-        GROUP BY Press
+    # Served from the press x year x type rollup built by build_press.py
+    query_str = """
+        SELECT press_id, SUM(count) as count
+        FROM press_rollup
+        WHERE source = :source
+        GROUP BY press_id
         ORDER BY count DESC
         LIMIT :limit
     """
-    rows = db.execute(text(query_str), {"limit": top_k}).mappings().all()
-    return [{"press": row["Press"], "count": row["count"]} for row in rows]
+    with span("db"):
+        rows = db.execute(text(query_str), {"source": table, "limit": top_k}).mappings().all()
+    press = dimensions.get("press")
+    return [{"press": press.label(row["press_id"]), "count": row["count"]} for row in rows]
 
 @router.get("/trends")
 def media_trends(
@@ -46,12 +58,60 @@ def media_trends(
     if table not in ALLOWED_TABLES:
         raise HTTPException(status_code=400, detail="Invalid table name")
         
+    condition, params = id_filter("press_id", press_ids(press_name), "press")
     query_str = f"""
-        SELECT substr(ReportName, -4) as year, COUNT(*) as count
-        FROM {table}
-        WHERE Press = :press AND ReportName IS NOT NULL
+        SELECT year, SUM(count) as count
+        FROM press_rollup
+        WHERE source = :source AND {condition} AND year IS NOT NULL
         GROUP BY year
         ORDER BY year
     """
-    rows = db.execute(text(query_str), {"press": press_name}).mappings().all()
-    return [{"year": row["year"], "count": row["count"]} for row in rows]
+    params["source"] = table
+    with span("db"):
+        rows = db.execute(text(query_str), params).mappings().all()
+    return [{"year": str(row["year"]), "count": row["count"]} for row in rows]
+
+@router.get("/{press}/profile")
+def press_profile(
+    press: str,
+    table: str = Query(..., description="Table name"),
+    db: Session = Depends(get_db)
+):
+    """
+    Everything about one press house in a single primary-key read of press_profile
+    (built by build_press.py): yearly counts, decision and complaint type mix,
+    top states and top counterparties (complainants for 'against', accused for 'by').
+    """
+    if table not in ALLOWED_TABLES:
+        raise HTTPException(status_code=400, detail="Invalid table name")
+
+    ids = press_ids(press)
+    if not ids:
+        raise HTTPException(status_code=404, detail="Unknown press house")
+
+    with span("db"):
+        row = db.execute(
+            text("SELECT * FROM press_profile WHERE source = :source AND press_id = :press_id"),
+            {"source": table, "press_id": ids[0]},
+        ).mappings().first()
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"No complaints for this press house in '{table}'")
+
+    with span("serialize"):
+        def pairs(value, key):
+            return [{key: k, "count": n} for k, n in json.loads(value)]
+
+        return json_response({
+            "press": row["press_name"],
+            "press_id": row["press_id"],
+            "table": table,
+            "total": row["total"],
+            "first_year": row["first_year"],
+            "last_year": row["last_year"],
+            "yearly": pairs(row["yearly"], "year"),
+            "decisions": pairs(row["decisions"], "decision"),
+            "complaint_types": pairs(row["types"], "complaint_type"),
+            "top_states": pairs(row["top_states"], "state"),
+            "counterparty_role": "complainant" if table == "against" else "accused",
+            "top_counterparties": pairs(row["top_counterparties"], "name"),
+        })
@@ -3,6 +3,8 @@ from sqlalchemy import text
 from sqlalchemy.orm import Session
 from collections import Counter
 from database import get_db
+from timing import span
+from serving import from_clause
 
 router = APIRouter(
     prefix="/visualizations",
@@ -24,7 +26,8 @@ def wordcloud_data(
     if table not in ALLOWED_TABLES:
         raise HTTPException(status_code=400, detail="Invalid table name")
         
-    query_str = f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL"
+    source = from_clause(table, [column])
+    query_str = f"SELECT {column} FROM {source} WHERE {column} IS NOT NULL"
     params = {}
     
     if start_year and end_year:
@@ -32,17 +35,19 @@ def wordcloud_data(
         params["syear"] = start_year
         params["eyear"] = end_year
         
-    rows = db.execute(text(query_str), params).fetchall()
+    with span("db"):
+        rows = db.execute(text(query_str), params).fetchall()
     
-    all_text = []
-    for row in rows:
-        if row[0]:
-            # Split by common delimiters if needed, or just take the text
-            # main.py logic: [phrase.strip().lower() for phrase in row[0].split(';') if phrase.strip()]
-            all_text.extend([t.strip().lower() for t in row[0].split(';') if t.strip()])
-            
-    counter = Counter(all_text)
-    most_common = counter.most_common(limit)
+    with span("transform"):
+        all_text = []
+        for row in rows:
+            if row[0]:
+                # Split by common delimiters if needed, or just take the text
+                # main.py logic: [phrase.strip().lower() for phrase in row[0].split(';') if phrase.strip()]
+                all_text.extend([t.strip().lower() for t in row[0].split(';') if t.strip()])
+                
+        counter = Counter(all_text)
+        most_common = counter.most_common(limit)
     
     return [{"text": word, "value": count} for word, count in most_common]
 
@@ -62,7 +67,8 @@ def network_data(
         WHERE Complainant IS NOT NULL AND Against IS NOT NULL
         LIMIT :limit
     """
-    rows = db.execute(text(query_str), {"limit": limit}).mappings().all()
+    with span("db"):
+        rows = db.execute(text(query_str), {"limit": limit}).mappings().all()
     
     nodes = set()
     links = []
@@ -0,0 +1,74 @@
+"""
+Column resolution for the split serving schema (see build_serving_schema.py).
+
+The hot `against`/`by` tables only hold the columns the API filters and groups on;
+long text lives in `<table>_text` and raw/backup columns in `<table>_raw`, all keyed
+by `row_id`. Routers that take a column name from the client, or that want the
+side columns, build their FROM clause here so only the needed side tables are joined.
+Also works on an unsplit (wide) database, where every column resolves to the table itself.
+"""
+import threading
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from database import data_version, get_engine, on_swap
+
+ROW_ID = "row_id"
+SIDE_TABLES = ("text", "raw")
+
+_layouts = {}
+_lock = threading.Lock()
+
+
+def _table_columns(conn, table):
+    return [row[1] for row in conn.execute(text(f'PRAGMA table_info("{table}")'))]
+
+
+def table_layout(table):
+    """{column: physical table} for `table` and its side tables (cached per snapshot)."""
+    key = (data_version(), table)
+    layout = _layouts.get(key)
+    if layout is not None:
+        return layout
+    with get_engine().connect() as conn:
+        layout = {c: table for c in _table_columns(conn, table)}
+        if ROW_ID in layout:
+            for suffix in SIDE_TABLES:
+                side = f"{table}_{suffix}"
+                for c in _table_columns(conn, side):
+                    layout.setdefault(c, side)
+    with _lock:
+        _layouts[key] = layout
+    return layout
+
+
+@on_swap
+def clear_layout_cache():
+    with _lock:
+        _layouts.clear()
+
+
+def check_column(table, column):
+    """Validate a client-supplied column name against the schema; returns it unchanged."""
+    if column not in table_layout(table) or column == ROW_ID:
+        raise HTTPException(status_code=400, detail=f"Invalid column name: {column}")
+    return column
+
+
+def from_clause(table, columns=(), include_text=False, include_raw=False):
+    """
+    FROM clause for `table` joining the side tables that hold `columns`
+    (plus every text/raw column when include_text/include_raw is set).
+    """
+    layout = table_layout(table)
+    sides = []
+    for column in columns:
+        source = layout[check_column(table, column)]
+        if source != table and source not in sides:
+            sides.append(source)
+    for flag, suffix in ((include_text, "text"), (include_raw, "raw")):
+        side = f"{table}_{suffix}"
+        if flag and side in layout.values() and side not in sides:
+            sides.append(side)
+    return f'"{table}"' + "".join(f' LEFT JOIN "{side}" USING ({ROW_ID})' for side in sides)
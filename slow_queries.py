@@ -0,0 +1,128 @@
+"""
+In-process slow query log.
+
+database.py calls `slow_query_log.maybe_record()` after every statement. Statements
+slower than PCI_SLOW_QUERY_MS are stored with their bound parameters and the output
+of `EXPLAIN QUERY PLAN`; plans that do a full `SCAN` of a table with more than
+PCI_LARGE_TABLE_ROWS rows are flagged. Served by GET /admin/slow_queries.
+
+Only the execute step is timed (SQLite returns the first row from execute, so
+aggregates and sorts are fully covered; long row-by-row fetches are not).
+Each worker process keeps its own log.
+"""
+import os
+import re
+import threading
+import time
+from collections import deque
+
+SLOW_QUERY_SECONDS = float(os.environ.get("PCI_SLOW_QUERY_MS", "200")) / 1000
+LARGE_TABLE_ROWS = int(os.environ.get("PCI_LARGE_TABLE_ROWS", "10000"))
+MAX_ENTRIES = 200
+MAX_STATEMENTS = 500
+
+FULL_SCAN_RE = re.compile(r"^SCAN (\S+)(?: AS \S+)?$")
+
+
+def _jsonable(value):
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes>"
+    return repr(value)
+
+
+class SlowQueryLog:
+    def __init__(self, threshold=SLOW_QUERY_SECONDS, large_table_rows=LARGE_TABLE_ROWS):
+        self.threshold = threshold
+        self.large_table_rows = large_table_rows
+        self._entries = deque(maxlen=MAX_ENTRIES)
+        self._by_statement = {}
+        self._table_rows = {}
+        self._lock = threading.Lock()
+
+    def maybe_record(self, dbapi_conn, statement, parameters, seconds, executemany=False):
+        if seconds < self.threshold or executemany:
+            return
+        if statement.lstrip().upper().startswith("EXPLAIN"):
+            return
+        plan = self._explain(dbapi_conn, statement, parameters)
+        full_scans = []
+        for detail in plan:
+            m = FULL_SCAN_RE.match(detail)
+            if m and self._row_count(dbapi_conn, m.group(1)) >= self.large_table_rows:
+                full_scans.append(m.group(1))
+
+        entry = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "duration_ms": round(seconds * 1000, 2),
+            "statement": " ".join(statement.split()),
+            "parameters": [_jsonable(p) for p in (parameters or ())]
+            if not isinstance(parameters, dict) else {k: _jsonable(v) for k, v in parameters.items()},
+            "plan": plan,
+            "full_scans": full_scans,
+        }
+        with self._lock:
+            self._entries.append(entry)
+            agg = self._by_statement.get(entry["statement"])
+            if agg is None:
+                if len(self._by_statement) >= MAX_STATEMENTS:
+                    return
+                agg = self._by_statement[entry["statement"]] = {
+                    "statement": entry["statement"], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                }
+            agg["count"] += 1
+            agg["total_ms"] = round(agg["total_ms"] + entry["duration_ms"], 2)
+            agg["max_ms"] = max(agg["max_ms"], entry["duration_ms"])
+            agg["plan"] = plan
+            agg["full_scans"] = full_scans
+            agg["last_seen"] = entry["timestamp"]
+
+    def _explain(self, dbapi_conn, statement, parameters):
+        try:
+            cur = dbapi_conn.cursor()
+            try:
+                cur.execute("EXPLAIN QUERY PLAN " + statement, parameters or ())
+                return [row[3] for row in cur.fetchall()]
+            finally:
+                cur.close()
+        except Exception as e:
+            return [f"<explain failed: {e}>"]
+
+    def _row_count(self, dbapi_conn, table):
+        table = table.strip('"')
+        if table not in self._table_rows:
+            try:
+                cur = dbapi_conn.execute(f'SELECT COUNT(*) FROM "{table}"')
+                self._table_rows[table] = cur.fetchone()[0]
+            except Exception:
+                self._table_rows[table] = 0
+        return self._table_rows[table]
+
+    def entries(self, limit=50, full_scans_only=False):
+        with self._lock:
+            items = list(self._entries)
+        if full_scans_only:
+            items = [e for e in items if e["full_scans"]]
+        return list(reversed(items))[:limit]
+
+    def statements(self, limit=50, full_scans_only=False):
+        with self._lock:
+            items = [dict(v) for v in self._by_statement.values()]
+        if full_scans_only:
+            items = [s for s in items if s["full_scans"]]
+        items.sort(key=lambda s: s["total_ms"], reverse=True)
+        return items[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_statement.clear()
+            self._table_rows.clear()
+
+    def forget_row_counts(self):
+        with self._lock:
+            self._table_rows.clear()
+
+
+slow_query_log = SlowQueryLog()
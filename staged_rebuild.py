@@ -0,0 +1,171 @@
+"""
+Full rebuild of complaints.db from the CSVs without the API seeing it half-written.
+
+The loaders used to replace `against`/`by` in the live file and then split, index and
+analyze them step by step, so for the whole load the API read missing, wide or
+unindexed tables. `rebuild_database(db_path, sources)` instead:
+
+    1. builds everything in <db>.staging, a scratch file opened with journal_mode=OFF,
+       synchronous=OFF and a large page cache: chunked ingest with the transforms of
+       both tables running in parallel (csv_ingest.py), serving schema, dimensions
+       and entities (seeded from the live file, so ids stay stable), press tables,
+       indexes and statistics
+    2. copies each rebuilt table into the live file as <table>__staging (one
+       transaction), then drops the old tables, renames the staged ones into place,
+       recreates their indexes, copies the statistics computed in step 1 and
+       increments PRAGMA user_version (a second, short transaction)
+
+Readers keep seeing the previous tables until the second transaction commits. The API's
+snapshot watcher (database.py) notices the new user_version and reactivates the file,
+so data_version() moves and the dimension, layout and row-count caches are dropped. Tables the
+rebuild does not produce (ETL state, rules state) are left alone. A crash during
+step 1 only loses the scratch file.
+
+    rebuild_database(DB_PATH, {"against": (csv_path, transform_against), ...})
+"""
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+from build_dimensions import DIMENSIONS
+from build_entities import ALIASES_TABLE
+from build_indexes import quote
+from build_serving_schema import build_serving_schema
+from csv_ingest import ingest_tables, transaction
+
+STAGING_SUFFIX = "__staging"
+# Page cache of the build and swap connections, in KiB
+CACHE_KB = int(os.environ.get("PCI_REBUILD_CACHE_KB", str(256 * 1024)))
+SCRATCH_PRAGMAS = [
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    f"PRAGMA cache_size = -{CACHE_KB}",
+    "PRAGMA temp_store = MEMORY",
+]
+# Copied from the live file first so dimension and entity ids stay stable across rebuilds
+SEED_TABLES = [dim["table"] for dim in DIMENSIONS.values()] + [ALIASES_TABLE]
+
+
+def staging_path(db_path):
+    db_path = Path(db_path)
+    return db_path.with_name(db_path.name + ".staging")
+
+
+def seed(conn, db_path):
+    """Copy SEED_TABLES from the live database at `db_path` into the staging connection."""
+    if not Path(db_path).exists():
+        return
+    conn.execute("ATTACH DATABASE ? AS live", (str(db_path),))
+    for (sql,) in conn.execute(
+        f"SELECT sql FROM live.sqlite_master WHERE type = 'table' "
+        f"AND name IN ({', '.join('?' * len(SEED_TABLES))})", SEED_TABLES,
+    ).fetchall():
+        conn.execute(sql)
+    for table in SEED_TABLES:
+        if conn.execute("SELECT 1 FROM main.sqlite_master WHERE name = ?", (table,)).fetchone():
+            conn.execute(f"INSERT INTO main.{quote(table)} SELECT * FROM live.{quote(table)}")
+    conn.commit()
+    conn.execute("DETACH DATABASE live")
+
+
+def build_staging(path, sources, db_path=None):
+    """
+    Build the complete serving database for `sources` ({table: (csv, transform)}) at
+    `path`, seeded from the live database `db_path`.
+    """
+    Path(path).unlink(missing_ok=True)
+    conn = sqlite3.connect(path)
+    try:
+        for pragma in SCRATCH_PRAGMAS:
+            conn.execute(pragma)
+        if db_path is not None:
+            seed(conn, db_path)
+        print(f"Loading {', '.join(sources)}...")
+        ingest_tables(conn, sources)
+        print("Building serving schema, indexes and statistics...")
+        build_serving_schema(conn, list(sources))
+    finally:
+        conn.close()
+
+
+def _schema(conn, kind):
+    return conn.execute(
+        "SELECT name, tbl_name, sql FROM staging.sqlite_master "
+        "WHERE type = ? AND name NOT LIKE 'sqlite_%' AND sql IS NOT NULL ORDER BY rowid",
+        (kind,),
+    ).fetchall()
+
+
+def _create_as(sql, name):
+    """CREATE TABLE statement `sql` with its table name replaced by main.`name`."""
+    return re.sub(
+        r'^CREATE TABLE\s+(?:"(?:[^"]|"")+"|\[[^\]]+\]|`[^`]+`|[^\s(]+)\s*\(',
+        f"CREATE TABLE main.{quote(name)} (", sql, count=1,
+    )
+
+
+def _copy_statistics(conn, tables):
+    """Copy the staging file's ANALYZE results for `tables` instead of analyzing again."""
+    if not conn.execute("SELECT 1 FROM staging.sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        return
+    if not conn.execute("SELECT 1 FROM main.sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        # Creates an empty sqlite_stat1 without scanning any table
+        conn.execute("ANALYZE main.sqlite_master")
+    names = [name for name, _, _ in tables]
+    placeholders = ", ".join("?" * len(names))
+    conn.execute(f"DELETE FROM main.sqlite_stat1 WHERE tbl IN ({placeholders})", names)
+    conn.execute(
+        f"INSERT INTO main.sqlite_stat1 SELECT * FROM staging.sqlite_stat1 WHERE tbl IN ({placeholders})",
+        names,
+    )
+
+
+def swap_in(db_path, path):
+    """
+    Replace the live tables with those of the staging file at `path`. The rows are
+    copied in a first transaction; the swap itself is a second, short one.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(f"PRAGMA cache_size = -{CACHE_KB}")
+        conn.execute("ATTACH DATABASE ? AS staging", (str(path),))
+        tables = _schema(conn, "table")
+        indexes = _schema(conn, "index")
+        # Readers keep using the live tables while the copies are written
+        with transaction(conn):
+            for name, _, sql in tables:
+                staged = name + STAGING_SUFFIX
+                conn.execute(f"DROP TABLE IF EXISTS main.{quote(staged)}")
+                conn.execute(_create_as(sql, staged))
+                conn.execute(f"INSERT INTO main.{quote(staged)} SELECT * FROM staging.{quote(name)}")
+        with transaction(conn):
+            for name, _, _ in tables:
+                conn.execute(f"DROP TABLE IF EXISTS main.{quote(name)}")
+                conn.execute(f"ALTER TABLE main.{quote(name + STAGING_SUFFIX)} RENAME TO {quote(name)}")
+            for name, _, sql in indexes:
+                conn.execute(f"DROP INDEX IF EXISTS main.{quote(name)}")
+                conn.execute(sql)
+            _copy_statistics(conn, tables)
+            # Tells the API's snapshot watcher to drop the caches derived from the old tables
+            version = conn.execute("PRAGMA main.user_version").fetchone()[0]
+            conn.execute(f"PRAGMA main.user_version = {version + 1}")
+        conn.execute("DETACH DATABASE staging")
+        return [name for name, _, _ in tables]
+    finally:
+        conn.close()
+
+
+def rebuild_database(db_path, sources):
+    """Rebuild `db_path` from `sources` ({table: (csv, transform)}) and swap it in atomically."""
+    t0 = time.perf_counter()
+    path = staging_path(db_path)
+    build_staging(path, sources, db_path)
+    built = time.perf_counter()
+    print("Swapping rebuilt tables into place...")
+    tables = swap_in(db_path, path)
+    path.unlink(missing_ok=True)
+    print(f"  {len(tables)} tables swapped in {time.perf_counter() - built:.2f}s "
+          f"(build {built - t0:.2f}s)")
+    return tables
@@ -0,0 +1,120 @@
+"""
+Per-request phase timing.
+
+`ServerTimingMiddleware` starts a timer for every HTTP request and exposes the
+accumulated phase timings as a `Server-Timing` response header plus one JSON
+log line per request. Handlers mark their phases with `span()`:
+
+    with span("db"):
+        rows = db.execute(...).mappings().all()
+    with span("render"):
+        plt.bar(...)
+
+Phase names used by the routers: db, transform, render, serialize. FastAPI encodes
+and renders a returned dict after the handler (and its spans) finished, so handlers
+time JSON serialization by returning `json_response(...)` from inside the span.
+Outside of a request `span()` is a no-op, so ETL scripts can share code with the API.
+Entering a span is also a cancellation checkpoint (see cancellation.py).
+"""
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from cancellation import check_budget
+
+logger = logging.getLogger("uvicorn.error")
+
+_current = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    __slots__ = ("spans",)
+
+    def __init__(self):
+        self.spans = {}
+
+    def add(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def header(self, total):
+        parts = [f"{name};dur={sec * 1000:.1f}" for name, sec in self.spans.items()]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def current_timings():
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    check_budget()
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    t0 = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, perf_counter() - t0)
+
+
+class RenderedJSON(JSONResponse):
+    """JSONResponse that keeps its encoded content for callers outside FastAPI (dispatch.py)."""
+
+    def __init__(self, content):
+        self.content = content
+        super().__init__(content)
+
+
+def json_response(content):
+    """The response FastAPI would build for `content`, encoded and rendered now."""
+    return RenderedJSON(jsonable_encoder(content))
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware overhead, streaming bodies untouched)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                value = timings.header(perf_counter() - start).encode("latin-1")
+                # Copy the header list: cached/shared Response objects must not be mutated
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", value)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if logger.isEnabledFor(logging.INFO):
+                route = scope.get("route")
+                logger.info(json.dumps({
+                    "event": "request_timing",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status,
+                    "total_ms": round((perf_counter() - start) * 1000, 2),
+                    "spans_ms": {k: round(v * 1000, 2) for k, v in timings.spans.items()},
+                }))
@@ -1,45 +1,49 @@
 import pandas as pd
 import sqlite3
+from pathlib import Path
 
-CSV_PATH = 'final_by_press_with_level.csv'
-DB_PATH = 'complaints.db'
+from csv_ingest import IngestReport, read_chunks, read_header
 
-def update_database():
-    print(f"Reading CSV from {CSV_PATH}...")
+HERE = Path(__file__).resolve().parent
+CSV_PATH = str(HERE / 'final_by_press_with_level.csv')
+DB_PATH = str(HERE / 'complaints.db')
+
+def load_levels(csv_path=CSV_PATH):
+    """Complainant -> level from the CSV (first level seen wins); None if the CSV is unusable."""
+    print(f"Reading CSV from {csv_path}...")
     try:
-        # Using semicolon separator as determined from previous inspection
-        df_csv = pd.read_csv(CSV_PATH, sep=';', on_bad_lines='skip', engine='python')
+        columns = read_header(csv_path)
     except Exception as e:
         print(f"Failed to read CSV: {e}")
-        return
+        return None
 
-    if 'Complainant' not in df_csv.columns or 'level' not in df_csv.columns:
-        print(f"CSV missing 'Complainant' or 'level' columns. Available: {df_csv.columns.tolist()}")
-        return
+    if 'Complainant' not in columns or 'level' not in columns:
+        print(f"CSV missing 'Complainant' or 'level' columns. Available: {columns}")
+        return None
 
-    # Create mapping: Complainant -> level
-    comp_to_level = {}
-    
+    # Stream only the two columns we need, in typed chunks on the C parser
     print("Building Complainant -> Level mapping...")
-    for index, row in df_csv.iterrows():
-        comp = row['Complainant']
-        lvl = row['level']
-        
-        if pd.isna(comp) or pd.isna(lvl):
-            continue
-            
-        comp = str(comp).strip()
-        lvl = str(lvl).strip()
-        
-        # If we encounter the same complainant with a different level, we keep the first one
-        # (or we could try to be smarter, but for now simple mapping)
-        if comp not in comp_to_level:
-            comp_to_level[comp] = lvl
+    report = IngestReport(csv_path)
+    pairs = []
+    for chunk in read_chunks(csv_path, usecols=['Complainant', 'level'], report=report):
+        chunk = chunk.dropna()
+        pairs.append(pd.DataFrame({
+            'comp': chunk['Complainant'].astype(str).str.strip(),
+            'lvl': chunk['level'].astype(str).str.strip(),
+        }))
+    if report.bad_count:
+        print(f"Skipped {report.bad_count} bad lines.")
+
+    # If we encounter the same complainant with a different level, we keep the first one
+    levels = pd.concat(pairs) if pairs else pd.DataFrame(columns=['comp', 'lvl'])
+    levels = levels.drop_duplicates('comp')
+    comp_to_level = dict(zip(levels['comp'], levels['lvl']))
 
     print(f"Found {len(comp_to_level)} unique Complainants with levels in CSV.")
+    return comp_to_level
 
-    print("Connecting to database...")
-    conn = sqlite3.connect(DB_PATH)
+def update_levels(conn, comp_to_level):
+    """Set `by`.level from the Complainant -> level mapping; returns the rows changed."""
     cursor = conn.cursor()
 
     # Check if 'level' column exists in 'by' table
@@ -56,12 +60,23 @@ def update_database():
     print("Updating 'by' table based on Complainant column...")
     
     # Prepare batch update
-    update_data = [(lvl, comp) for comp, lvl in comp_to_level.items()]
+    update_data = [(lvl, comp, lvl) for comp, lvl in comp_to_level.items()]
     
-    # We use executemany to update rows where Complainant matches
-    cursor.executemany('UPDATE "by" SET level = ? WHERE Complainant = ?', update_data)
+    # We use executemany to update rows where Complainant matches (and the level differs)
+    cursor.executemany('UPDATE "by" SET level = ? WHERE Complainant = ? AND level IS NOT ?', update_data)
     
     conn.commit()
+    return cursor.rowcount
+
+def update_database():
+    comp_to_level = load_levels(CSV_PATH)
+    if comp_to_level is None:
+        return
+
+    print("Connecting to database...")
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    update_levels(conn, comp_to_level)
     
     # Verify
     cursor.execute('SELECT count(*) FROM "by" WHERE level IS NOT NULL')
@@ -0,0 +1,75 @@
+"""
+Check the compiled keyword rules against the old if/elif extraction.
+
+golden/affiliation_classification.csv holds every distinct affiliation of the
+source CSVs (plus edge cases and a missing value) with the labels produced by the
+original extract_category_occupation of clean_and_repopulate.py and
+improve_media_detection.py. Both the scalar functions and the column-wise
+classifiers must reproduce them exactly:
+
+    python verify_classifier.py
+
+Exit code 1 on any mismatch.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import clean_and_repopulate
+import improve_media_detection
+
+GOLDEN = Path(__file__).resolve().parent / "golden" / "affiliation_classification.csv"
+
+
+def load_golden():
+    golden = pd.read_csv(GOLDEN, dtype=str, keep_default_na=False)
+    affiliations = golden["affiliation"].astype(object)
+    affiliations[golden["is_null"] == "1"] = np.nan
+    return affiliations, golden
+
+
+def compare(name, expected, actual, affiliations):
+    expected = pd.Series(expected).reset_index(drop=True)
+    actual = pd.Series(actual).reset_index(drop=True)
+    bad = expected != actual
+    for i in np.flatnonzero(bad.to_numpy())[:5]:
+        print(f"  {name}: {affiliations.iloc[i]!r}: expected {expected[i]!r}, got {actual[i]!r}")
+    print(f"{name:32} {'OK' if not bad.any() else f'{int(bad.sum())} MISMATCHES'}")
+    return int(bad.sum())
+
+
+def main():
+    affiliations, golden = load_golden()
+    print(f"{len(golden)} golden affiliations")
+    mismatches = 0
+
+    scalar = [clean_and_repopulate.extract_category_occupation(a) for a in affiliations]
+    vector = clean_and_repopulate.AFFILIATION_CLASSIFIER.classify(affiliations)
+    mismatches += compare("clean category (scalar)", golden["category"], [c for c, _ in scalar], affiliations)
+    mismatches += compare("clean occupation (scalar)", golden["occupation"], [o for _, o in scalar], affiliations)
+    mismatches += compare("clean category (column)", golden["category"], vector["category"], affiliations)
+    mismatches += compare("clean occupation (column)", golden["occupation"], vector["occupation"], affiliations)
+
+    scalar = [improve_media_detection.extract_category_occupation(a) for a in affiliations]
+    vector = improve_media_detection.category_occupation(affiliations)
+    mismatches += compare("media category (scalar)", golden["media_category"], [c for c, _ in scalar], affiliations)
+    mismatches += compare("media occupation (scalar)", golden["media_occupation"], [o for _, o in scalar], affiliations)
+    mismatches += compare("media category (column)", golden["media_category"], vector["category"], affiliations)
+    mismatches += compare("media occupation (column)", golden["media_occupation"], vector["occupation"], affiliations)
+    is_media = [str(int(improve_media_detection.is_media_entity(a))) for a in affiliations]
+    mismatches += compare("is_media_entity", golden["is_media"], is_media, affiliations)
+
+    # Forced media rows ignore the affiliation entirely
+    force = np.arange(len(affiliations)) % 2 == 0
+    forced = improve_media_detection.category_occupation(affiliations, force)
+    expected = [improve_media_detection.extract_category_occupation(a, f) for a, f in zip(affiliations, force)]
+    mismatches += compare("media force_media (column)", [c for c, _ in expected], forced["category"], affiliations)
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Check that the API's key filter/count queries are served by indexes.
+
+Runs EXPLAIN QUERY PLAN for the hot queries of the routers (same SQL shape and
+parameters) and fails if any of them still does a full `SCAN <table>`.
+Run after build_indexes.py:
+
+    python verify_indexes.py [path/to/complaints.db]
+
+Exit code 1 if a query does a full table scan.
+"""
+import re
+import sqlite3
+import sys
+from pathlib import Path
+
+from build_indexes import CATEGORY_ID_COL, YEAR_EXPR
+
+DB_PATH = Path(__file__).resolve().parent / "complaints.db"
+TABLES = ["against", "by"]
+
+FULL_SCAN_RE = re.compile(r"^SCAN (\S+)(?: AS \S+)?$")
+
+
+def key_queries(table):
+    """(endpoint, sql, params) mirroring the queries built in routers/ (dimension filters use ids)."""
+    return [
+        ("/complaints/list?state", f"SELECT * FROM {table} WHERE 1=1 AND state_id IN (?)", (1,)),
+        ("/complaints/list?years", f"SELECT * FROM {table} WHERE 1=1 AND {YEAR_EXPR} >= ? AND {YEAR_EXPR} <= ?", (2015, 2016)),
+        ("/complaints/list?complaint_type", f"SELECT * FROM {table} WHERE 1=1 AND type_id IN (?)", (1,)),
+        ("/complaints/list?decision_parent", f"SELECT * FROM {table} WHERE 1=1 AND decision_id IN (?, ?, ?)", (1, 2, 3)),
+        ("/complaints/list?decision", f"SELECT * FROM {table} WHERE 1=1 AND decision_id IN (?)", (1,)),
+        ("/complaints/list?category", f"SELECT * FROM {table} WHERE 1=1 AND {CATEGORY_ID_COL[table]} IN (?)", (1,)),
+        ("/complaints/stats total", f"SELECT COUNT(*) as total FROM {table} WHERE 1=1 AND {YEAR_EXPR} >= ?", (2010,)),
+        ("/complaints/stats yearly",
+         f"SELECT substr(ReportName, -4) as year, COUNT(*) as count FROM {table} "
+         f"WHERE ReportName IS NOT NULL AND {YEAR_EXPR} >= ? GROUP BY year ORDER BY year", (2010,)),
+        ("/complaints/stats?distinct_cases total",
+         f"SELECT COUNT(DISTINCT duplicate_group) as total FROM {table} WHERE 1=1 AND {YEAR_EXPR} >= ?", (2010,)),
+        ("/complaints/stats?distinct_cases yearly",
+         f"SELECT substr(ReportName, -4) as year, COUNT(DISTINCT duplicate_group) as count FROM {table} "
+         f"WHERE ReportName IS NOT NULL AND {YEAR_EXPR} >= ? GROUP BY year ORDER BY year", (2010,)),
+        ("/complaints/filters affiliations",
+         f"SELECT DISTINCT c_aff_resolved FROM {table} WHERE c_aff_resolved IS NOT NULL", ()),
+        ("/locations/states",
+         f"SELECT state_id, COUNT(*) as case_count FROM {table} WHERE state_id IS NOT NULL "
+         f"AND {YEAR_EXPR} >= ? AND {YEAR_EXPR} <= ? GROUP BY state_id ORDER BY case_count DESC", (2000, 2020)),
+        ("/research/cases_per_state",
+         f"SELECT state_id, COUNT(*) as case_count FROM {table} WHERE {YEAR_EXPR} BETWEEN ? AND ? "
+         f"GROUP BY state_id ORDER BY case_count DESC", (2000, 2020)),
+        ("/research/bubble_topk_press",
+         f"SELECT {YEAR_EXPR} as Year, press_id, COUNT(*) as Complaints FROM {table} "
+         f"WHERE ReportName IS NOT NULL AND press_id IS NOT NULL AND state_id IN (?) "
+         f"GROUP BY Year, press_id", (1,)),
+        ("/media/top",
+         "SELECT press_id, SUM(count) as count FROM press_rollup WHERE source = ? "
+         "GROUP BY press_id ORDER BY count DESC LIMIT ?", (table, 10)),
+        ("/media/trends",
+         "SELECT year, SUM(count) as count FROM press_rollup WHERE source = ? AND press_id IN (?) "
+         "AND year IS NOT NULL GROUP BY year ORDER BY year", (table, 1)),
+        ("/media/{press}/profile",
+         "SELECT * FROM press_profile WHERE source = ? AND press_id = ?", (table, 1)),
+        ("/complaints/entity/{id}",
+         f"SELECT * FROM {table} WHERE complainant_entity_id = ? OR accused_entity_id = ?", (1, 1)),
+    ]
+
+
+def full_scans(conn, sql, params):
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    return plan, [d for d in plan if FULL_SCAN_RE.match(d)]
+
+
+def main():
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else DB_PATH
+    conn = sqlite3.connect(db_path)
+    failures = 0
+    for table in TABLES:
+        print(f"\n--- {table} ---")
+        for endpoint, sql, params in key_queries(table):
+            plan, scans = full_scans(conn, sql, params)
+            status = "FULL SCAN" if scans else "ok"
+            print(f"  [{status:9}] {endpoint}: {' | '.join(plan)}")
+            failures += bool(scans)
+    conn.close()
+
+    if failures:
+        print(f"\n{failures} key queries still do full table scans. Run build_indexes.py.")
+        sys.exit(1)
+    print("\nAll key queries use indexes.")
+
+
+if __name__ == "__main__":
+    main()